@@ -0,0 +1,238 @@
+import math
+import os
+import faiss
+import numpy as np
+
+# Configuration
+# "auto" picks by vector count; "flat", "hnsw" or "ivf" forces one index type
+ANN_INDEX = os.getenv("ANN_INDEX", "auto").lower()
+# Exact search up to this many vectors (brute force is fast and has perfect recall)
+ANN_FLAT_MAX_VECTORS = int(os.getenv("ANN_FLAT_MAX_VECTORS", 20000))
+# HNSW up to this many vectors; IVF beyond (HNSW graph memory grows with the corpus)
+ANN_HNSW_MAX_VECTORS = int(os.getenv("ANN_HNSW_MAX_VECTORS", 1000000))
+# HNSW: graph degree, build-time and query-time candidate list sizes
+ANN_HNSW_M = int(os.getenv("ANN_HNSW_M", 32))
+ANN_HNSW_EF_CONSTRUCTION = int(os.getenv("ANN_HNSW_EF_CONSTRUCTION", 80))
+ANN_HNSW_EF_SEARCH = int(os.getenv("ANN_HNSW_EF_SEARCH", 128))
+# IVF: inverted lists probed per query
+ANN_IVF_NPROBE = int(os.getenv("ANN_IVF_NPROBE", 16))
+# k-means needs ~39 training points per centroid to converge
+IVF_POINTS_PER_LIST = 39
+# IVF trained with too few lists for the corpus is retrained once it grows this much
+IVF_RETRAIN_GROWTH = 2
+# Training sample cap, so k-means stays fast on large corpora
+IVF_MAX_TRAINING_POINTS = 256 * 1024
+# Rough per-chunk cost of docstore ids and the position -> id map
+ID_OVERHEAD_BYTES = 200
+
+
+def choose_index_kind(count, kind=ANN_INDEX):
+    """
+    Index type for `count` vectors: "flat", "hnsw" or "ivf".
+    """
+    if kind == "auto":
+        if count <= ANN_FLAT_MAX_VECTORS:
+            kind = "flat"
+        elif count <= ANN_HNSW_MAX_VECTORS:
+            kind = "hnsw"
+        else:
+            kind = "ivf"
+    if kind == "ivf" and count < IVF_POINTS_PER_LIST:
+        # Too few vectors to train even one list
+        return "flat"
+    return kind
+
+
+def ivf_list_count(count):
+    """
+    Number of IVF lists for `count` vectors: ~4 * sqrt(n), bounded so every
+    list gets enough training points.
+    """
+    return max(1, min(int(4 * math.sqrt(count)), count // IVF_POINTS_PER_LIST))
+
+
+def index_kind(index):
+    """
+    Type of a FAISS index as named by choose_index_kind.
+    """
+    index = faiss.downcast_index(index)
+    if isinstance(index, faiss.IndexHNSW):
+        return "hnsw"
+    if isinstance(index, faiss.IndexIVF):
+        return "ivf"
+    return "flat"
+
+
+def configure_search(index):
+    """
+    Applies the query-time parameters (efSearch / nprobe) to `index`.
+    """
+    # The downcast view does not own the index: keep returning the original
+    typed = faiss.downcast_index(index)
+    if isinstance(typed, faiss.IndexHNSW):
+        typed.hnsw.efSearch = ANN_HNSW_EF_SEARCH
+    elif isinstance(typed, faiss.IndexIVF):
+        typed.nprobe = min(ANN_IVF_NPROBE, typed.nlist)
+    return index
+
+
+def _search_params(index, selector):
+    typed = faiss.downcast_index(index)
+    if isinstance(typed, faiss.IndexHNSW):
+        return faiss.SearchParametersHNSW(sel=selector, efSearch=typed.hnsw.efSearch)
+    if isinstance(typed, faiss.IndexIVF):
+        return faiss.SearchParametersIVF(sel=selector, nprobe=typed.nprobe)
+    return faiss.SearchParameters(sel=selector)
+
+
+def reconstruct(index, ids):
+    """
+    Stored vectors of `ids` (an IVF index gets a direct map on first use).
+    """
+    typed = faiss.downcast_index(index)
+    if isinstance(typed, faiss.IndexIVF) and typed.direct_map.type == faiss.DirectMap.NoMap:
+        typed.make_direct_map()
+    return index.reconstruct_batch(np.asarray(ids, dtype=np.int64))
+
+
+def search_index(index, vectors, k, exclude=None, include=None):
+    """
+    index.search(vectors, k) restricted inside the search (not by filtering
+    its results): ids in `exclude` are skipped and, if `include` is given,
+    only those ids are searched. A restriction to at most
+    ANN_FLAT_MAX_VECTORS ids is searched exactly over just their vectors;
+    larger ones go through an IDSelector. Uses the efSearch / nprobe already
+    set on `index`.
+    """
+    if include is not None:
+        include = np.asarray(include, dtype=np.int64)
+        if exclude is not None and len(exclude):
+            include = np.setdiff1d(include, np.asarray(exclude, dtype=np.int64))
+        if len(include) <= ANN_FLAT_MAX_VECTORS:
+            if not len(include):
+                return (np.full((len(vectors), k), np.inf, dtype=np.float32),
+                        np.full((len(vectors), k), -1, dtype=np.int64))
+            distances, rows = faiss.knn(vectors, reconstruct(index, include), k, metric=index.metric_type)
+            return distances, np.where(rows >= 0, include[np.maximum(rows, 0)], -1)
+        # SearchParameters do not own their selectors: keep it referenced here
+        selector = faiss.IDSelectorBatch(include)
+        return index.search(vectors, k, params=_search_params(index, selector))
+    if exclude is None or not len(exclude):
+        return index.search(vectors, k)
+    excluded = faiss.IDSelectorBatch(np.asarray(exclude, dtype=np.int64))
+    selector = faiss.IDSelectorNot(excluded)
+    return index.search(vectors, k, params=_search_params(index, selector))
+
+
+def build_index(vectors, kind):
+    """
+    Builds and fills an L2 index of `kind` over `vectors` (float32 array),
+    training it first if needed. Row i of `vectors` gets id i.
+    """
+    count, dim = vectors.shape
+    if kind == "flat":
+        index = faiss.IndexFlatL2(dim)
+    elif kind == "hnsw":
+        index = faiss.IndexHNSWFlat(dim, ANN_HNSW_M)
+        index.hnsw.efConstruction = ANN_HNSW_EF_CONSTRUCTION
+    elif kind == "ivf":
+        nlist = ivf_list_count(count)
+        index = faiss.IndexIVFFlat(faiss.IndexFlatL2(dim), dim, nlist)
+        sample = vectors
+        if count > IVF_MAX_TRAINING_POINTS:
+            rows = np.random.default_rng(0).choice(count, IVF_MAX_TRAINING_POINTS, replace=False)
+            sample = vectors[np.sort(rows)]
+        index.train(sample)
+    else:
+        raise ValueError(f"Unknown index type: {kind}")
+    if count:
+        index.add(vectors)
+    return configure_search(index)
+
+
+def all_vectors(index):
+    """
+    Every stored vector of `index`, in id order.
+    """
+    index = faiss.downcast_index(index)
+    if isinstance(index, faiss.IndexIVF):
+        index.make_direct_map()
+    return index.reconstruct_n(0, index.ntotal)
+
+
+def index_memory_bytes(index):
+    """
+    Approximate resident size of `index`: the stored vectors plus the HNSW
+    graph links or the IVF centroids and ids.
+    """
+    typed = faiss.downcast_index(index)
+    size = index.ntotal * index.d * 4
+    if isinstance(typed, faiss.IndexHNSW):
+        size += typed.hnsw.neighbors.size() * 4 + typed.hnsw.levels.size() * 4
+    elif isinstance(typed, faiss.IndexIVF):
+        size += typed.nlist * index.d * 4 + index.ntotal * 8
+    return size
+
+
+def store_memory_bytes(vector_store):
+    """
+    Approximate resident size of a FAISS store: its index, id maps and, for
+    in-memory docstores, the chunk texts (a columnar docstore keeps them on disk).
+    """
+    size = index_memory_bytes(vector_store.index) + ID_OVERHEAD_BYTES * vector_store.index.ntotal
+    size += sum(len(doc.page_content) for doc in getattr(vector_store.docstore, "_dict", {}).values())
+    return size
+
+
+def needs_rebuild(index, kind=ANN_INDEX):
+    """
+    Whether `index` no longer suits its size: a different type is due, or an
+    IVF index has far fewer lists than its corpus now warrants.
+    """
+    target = choose_index_kind(index.ntotal, kind)
+    current = index_kind(index)
+    if target != current:
+        return True
+    if current == "ivf":
+        return ivf_list_count(index.ntotal) >= IVF_RETRAIN_GROWTH * faiss.downcast_index(index).nlist
+    return False
+
+
+def rebuild_store_index(vector_store, kind=None):
+    """
+    Replaces the index of a LangChain FAISS store with a freshly built one of
+    `kind` (chosen by size if None) holding the same vectors in the same
+    order, so the store's position -> docstore id mapping stays valid.
+    """
+    vectors = all_vectors(vector_store.index)
+    vector_store.index = build_index(vectors, kind or choose_index_kind(len(vectors)))
+    return vector_store
+
+
+def tune_store_index(vector_store, kind=ANN_INDEX):
+    """
+    Rebuilds the store's index if the corpus has outgrown it. Returns True
+    if it was rebuilt.
+    """
+    if not needs_rebuild(vector_store.index, kind):
+        return False
+    old = index_kind(vector_store.index)
+    rebuild_store_index(vector_store, choose_index_kind(vector_store.index.ntotal, kind))
+    print(f"🔁 Rebuilt index: {old} -> {index_kind(vector_store.index)} ({vector_store.index.ntotal} vectors)")
+    return True
+
+
+def delete_from_store(vector_store, ids):
+    """
+    vector_store.delete(ids) for any index type. The store expects removal to
+    shift later vectors down by one, which only flat indexes do (HNSW cannot
+    remove at all, IVF keeps the old ids), so other indexes are rebuilt from
+    the remaining vectors instead.
+    """
+    kind = index_kind(vector_store.index)
+    if kind != "flat":
+        vector_store.index = build_index(all_vectors(vector_store.index), "flat")
+    vector_store.delete(ids)
+    if kind != "flat":
+        rebuild_store_index(vector_store)
+    return vector_store
@@ -0,0 +1,380 @@
+import os
+import re
+import shutil
+import threading
+from collections import OrderedDict
+from ann_index import store_memory_bytes
+from columnar_docstore import positions_where
+from embedding_registry import get_embeddings
+from index_snapshots import (
+    compact_segments, load_parts, load_tombstones, read_state, segment_path, should_compact, snapshot_path,
+    write_segment, write_tombstone,
+)
+from segmented_store import combine_stores
+
+# Configuration
+DB_DIR = "./faiss_index"
+EMBEDDING_MODEL = "all-MiniLM-L6-v2"
+# The default collection lives in DB_DIR (shared with ingest.py); others in COLLECTIONS_DIR/<name>
+DEFAULT_COLLECTION = "default"
+COLLECTIONS_DIR = os.getenv("COLLECTIONS_DIR", "./faiss_collections")
+# Loaded collections are evicted (least recently used first) above this size (0 disables)
+INDEX_MEMORY_BUDGET_MB = int(os.getenv("INDEX_MEMORY_BUDGET_MB", 1024))
+COLLECTION_NAME = re.compile(r"^[A-Za-z0-9_-]{1,64}$")
+
+
+class IndexStore:
+    """
+    Keeps the FAISS index resident in memory and shares it across requests.
+    It is loaded once (at startup or first use); when a writer publishes a
+    new snapshot, a background thread loads it while readers keep using the
+    previous index, and the reference is swapped once it is ready.
+
+    Uploads are appended as delta segments, so publishing one costs only the
+    size of the new document; the base and earlier segments already in
+    memory are reused. Deleted documents are tombstoned and skipped by
+    searches. Once INDEX_COMPACT_SEGMENTS segments or deletions pile up, they
+    are folded into a new base in the background.
+    """
+    def __init__(self, db_dir=DB_DIR, embeddings=None, on_resize=None):
+        self.db_dir = db_dir
+        # Zero-argument callable returning the Embeddings used to load the index
+        self.embeddings = embeddings or (lambda: get_embeddings(EMBEDDING_MODEL))
+        # Called with the change in memory_bytes() whenever the resident index changes
+        self.on_resize = on_resize
+        self.version = None
+        self.reloads = 0
+        self.compactions = 0
+        self._store = None
+        self._segments = 0
+        # Loaded base/segment stores by path, reused by the next reload
+        self._parts = {}
+        # Deleted docstore ids by tombstone name, likewise
+        self._tombstones = {}
+        # Approximate size of each loaded part by path, measured once when it is installed
+        self._part_sizes = {}
+        self._memory_bytes = 0
+        self._lock = threading.Lock()
+        # Serializes writers (appends, deletions, compaction pointer flips)
+        self._write_lock = threading.Lock()
+        self._loader = None
+        self._compactor = None
+
+    def get(self):
+        """
+        Returns the current vector store (None if nothing is indexed yet).
+        Never waits for a reload once an index is resident.
+        """
+        store = self._store
+        if store is None:
+            # Nothing to serve meanwhile: the first load blocks
+            with self._lock:
+                if self._store is None:
+                    parts, tombstones = {}, {}
+                    loaded = self._load(parts, tombstones)
+                    self._swap(loaded, parts, tombstones, self._measure(parts))
+                return self._store
+
+        state = read_state(self.db_dir)
+        if state is not None and state["version"] != self.version:
+            self._reload_in_background()
+        return store
+
+    def _load(self, parts, tombstones):
+        # Parts and tombstones already in `parts` / `tombstones` are not read again
+        base, segments, state = load_parts(self.db_dir, self.embeddings(), parts)
+        return base, segments, state, load_tombstones(self.db_dir, state, tombstones)
+
+    def _measure(self, parts):
+        # Sizes of `parts`; parts already resident are not measured again
+        resident, sizes = self._parts, self._part_sizes
+        measured = {}
+        for path, part in parts.items():
+            size = sizes.get(path) if resident.get(path) is part else None
+            measured[path] = store_memory_bytes(part) if size is None else size
+        return measured
+
+    def _swap(self, loaded, parts, tombstones, sizes):
+        # Callers hold self._lock
+        base, segments, state, deleted = loaded
+        version = state["version"] if state else None
+        if base is None or (self.version is not None and version is not None and version <= self.version):
+            return False
+        self._store = combine_stores(base, segments, deleted)
+        self._segments = len(segments)
+        self._parts = parts
+        self._tombstones = tombstones
+        # load_parts dropped the parts the new state no longer uses
+        self._part_sizes = {path: sizes[path] for path in parts}
+        self._set_memory_bytes(sum(self._part_sizes.values()))
+        self.version = version
+        return True
+
+    def _set_memory_bytes(self, size):
+        # Callers hold self._lock
+        change = size - self._memory_bytes
+        self._memory_bytes = size
+        if change and self.on_resize is not None:
+            self.on_resize(change)
+
+    def _reload_in_background(self):
+        with self._lock:
+            if self._loader is not None and self._loader.is_alive():
+                return
+            self._loader = threading.Thread(target=self._reload, name="index-reload", daemon=True)
+            self._loader.start()
+
+    def _reload(self):
+        parts, tombstones = dict(self._parts), dict(self._tombstones)
+        try:
+            loaded = self._load(parts, tombstones)
+            sizes = self._measure(parts)
+        except Exception as e:
+            print(f"Could not reload index from {self.db_dir}: {e}")
+            return
+        with self._lock:
+            # An append in this process may already have swapped in something newer
+            if self._swap(loaded, parts, tombstones, sizes):
+                self.reloads += 1
+
+    def wait_for_reload(self, timeout=None):
+        """
+        Blocks until a background reload or compaction (if any) has finished.
+        """
+        for thread in (self._compactor, self._loader):
+            if thread is not None:
+                thread.join(timeout)
+
+    def append(self, segment):
+        """
+        Publishes `segment` (a FAISS store of new chunks only) as a delta
+        segment and makes it searchable in this process right away. Returns
+        the segment name.
+        """
+        with self._write_lock:
+            name = write_segment(segment, self.db_dir)
+            path = segment_path(self.db_dir, name)
+            if not os.path.isdir(path):
+                # The first write to an empty index became its base
+                path = snapshot_path(self.db_dir, name)
+            self._install({path: segment})
+        if should_compact(self.db_dir):
+            self._compact_in_background()
+        return name
+
+    def delete_document(self, source):
+        """
+        Deletes the chunks of document `source` (their metadata["source"]) by
+        writing a tombstone of their ids: searches skip them right away and
+        the next compaction removes them from the index. Costs the size of
+        the document, not of the index. Returns the number of chunks deleted.
+        """
+        with self._write_lock:
+            current = self.get()
+            if current is None:
+                return 0
+            deleted = getattr(current, "deleted", frozenset())
+            ids = []
+            for part in getattr(current, "parts", [current]):
+                for position in positions_where(part, "source", source):
+                    doc_id = part.index_to_docstore_id[position]
+                    if doc_id not in deleted:
+                        ids.append(doc_id)
+            if not ids:
+                return 0
+            write_tombstone(self.db_dir, ids, source, self.embeddings())
+            self._install({})
+        if should_compact(self.db_dir):
+            self._compact_in_background()
+        return len(ids)
+
+    def _install(self, new_parts):
+        # Every other part is already resident, so this reads no index files
+        parts, tombstones = dict(self._parts), dict(self._tombstones)
+        parts.update(new_parts)
+        loaded = self._load(parts, tombstones)
+        sizes = self._measure(parts)
+        with self._lock:
+            self._swap(loaded, parts, tombstones, sizes)
+
+    def _compact_in_background(self):
+        with self._lock:
+            if self._compactor is not None and self._compactor.is_alive():
+                return
+            self._compactor = threading.Thread(target=self._compact, name="index-compact", daemon=True)
+            self._compactor.start()
+
+    def _compact(self):
+        try:
+            if compact_segments(self.db_dir, self.embeddings(), lock=self._write_lock) is not None:
+                self.compactions += 1
+                self._reload()
+        except Exception as e:
+            print(f"Could not compact index segments in {self.db_dir}: {e}")
+
+    def memory_bytes(self):
+        """
+        Approximate resident size of the loaded index (0 if not loaded).
+        Parts are measured once, when they are loaded, so this is cheap.
+        """
+        return self._memory_bytes
+
+    def unload(self):
+        """
+        Drops the resident index; the next get() loads it again. Requests
+        already holding it keep using it until they finish.
+        """
+        with self._lock:
+            self._store = None
+            self._parts = {}
+            self._tombstones = {}
+            self._part_sizes = {}
+            self._set_memory_bytes(0)
+            self._segments = 0
+            self.version = None
+
+    def drop(self):
+        """
+        Unloads the index and deletes all of its files.
+        """
+        with self._write_lock:
+            self.unload()
+            shutil.rmtree(self.db_dir, ignore_errors=True)
+
+    def stats(self):
+        with self._lock:
+            return {"db_dir": self.db_dir, "version": self.version, "loaded": self._store is not None,
+                    "segments": self._segments, "reloads": self.reloads, "compactions": self.compactions}
+
+
+class IndexCollections:
+    """
+    Named collections, each an IndexStore over its own on-disk shard. A
+    collection is loaded on its first query; when the loaded collections
+    exceed `memory_budget` bytes, the least recently used ones are unloaded,
+    so a server can host many more collections than fit in memory.
+    """
+    def __init__(self, db_dir=DB_DIR, collections_dir=COLLECTIONS_DIR,
+                 memory_budget=INDEX_MEMORY_BUDGET_MB * 1024 * 1024, embeddings=None):
+        self.db_dir = db_dir
+        self.collections_dir = collections_dir
+        self.memory_budget = memory_budget
+        self.embeddings = embeddings
+        self.evictions = 0
+        # Least recently used first
+        self._stores = OrderedDict()
+        # Sum of memory_bytes() of all stores, kept up to date by their on_resize
+        self._memory_bytes = 0
+        self._lock = threading.Lock()
+
+    def path(self, name):
+        """
+        Shard directory of collection `name`. Raises ValueError for names
+        that are not [A-Za-z0-9_-]{1,64}.
+        """
+        if not COLLECTION_NAME.match(name or ""):
+            raise ValueError(f"Invalid collection name: {name!r}")
+        if name == DEFAULT_COLLECTION:
+            return self.db_dir
+        return os.path.join(self.collections_dir, name)
+
+    def store(self, name=DEFAULT_COLLECTION):
+        """
+        The IndexStore of collection `name` (nothing is loaded yet).
+        """
+        path = self.path(name)
+        with self._lock:
+            store = self._stores.get(name)
+            if store is None:
+                store = self._stores[name] = IndexStore(path, self.embeddings, self._resized)
+            self._stores.move_to_end(name)
+            return store
+
+    def get(self, name=DEFAULT_COLLECTION):
+        """
+        The vector store of collection `name` (None if it is empty), loading
+        it if needed and evicting others to stay within the memory budget.
+        """
+        store = self.store(name)
+        vector_store = store.get()
+        self._enforce_budget(store)
+        return vector_store
+
+    def append(self, name, segment):
+        """
+        Adds `segment` to collection `name` (see IndexStore.append).
+        """
+        store = self.store(name)
+        version = store.append(segment)
+        self._enforce_budget(store)
+        return version
+
+    def _resized(self, change):
+        with self._lock:
+            self._memory_bytes += change
+
+    def _enforce_budget(self, keep):
+        # Runs on every query: only walks the stores when over budget
+        if self.memory_budget <= 0 or self._memory_bytes <= self.memory_budget:
+            return
+        with self._lock:
+            stores = list(self._stores.values())
+        for store in stores:
+            if self._memory_bytes <= self.memory_budget:
+                break
+            size = store.memory_bytes()
+            if store is keep or size == 0:
+                continue
+            store.unload()
+            self.evictions += 1
+            print(f"Evicted index {store.db_dir} ({size / 2**20:.1f} MB) from memory")
+
+    def delete_document(self, name, source):
+        """
+        Deletes document `source` from collection `name` (see
+        IndexStore.delete_document).
+        """
+        return self.store(name).delete_document(source)
+
+    def names(self):
+        """
+        Collections that have an index on disk.
+        """
+        names = []
+        if os.path.isdir(self.db_dir) and os.listdir(self.db_dir):
+            names.append(DEFAULT_COLLECTION)
+        if os.path.isdir(self.collections_dir):
+            for name in sorted(os.listdir(self.collections_dir)):
+                if COLLECTION_NAME.match(name) and name != DEFAULT_COLLECTION:
+                    names.append(name)
+        return names
+
+    def delete(self, name):
+        """
+        Deletes collection `name` from memory and disk. Returns False if it
+        did not exist. Raises ValueError for the default collection, whose
+        index in DB_DIR is shared with ingest.py.
+        """
+        if name == DEFAULT_COLLECTION:
+            raise ValueError("The default collection cannot be deleted.")
+        store = self.store(name)
+        existed = os.path.isdir(store.db_dir)
+        store.drop()
+        with self._lock:
+            self._stores.pop(name, None)
+        return existed
+
+    def stats(self):
+        with self._lock:
+            stores = list(self._stores.items())
+        loaded = {name: store.memory_bytes() for name, store in stores if store.stats()["loaded"]}
+        return {
+            "memory_budget_bytes": self.memory_budget,
+            "memory_bytes": self._memory_bytes,
+            "loaded": loaded,
+            "evictions": self.evictions,
+        }
+
+
+# Shared by the chat and ingest routes
+collections = IndexCollections()
@@ -0,0 +1,124 @@
+import os
+import threading
+import traceback
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+# Configuration
+INGEST_JOB_WORKERS = int(os.getenv("INGEST_JOB_WORKERS", 2))
+INGEST_MAX_PENDING = int(os.getenv("INGEST_MAX_PENDING", 32))
+# Finished jobs kept around for status polling
+JOB_HISTORY = 500
+
+
+class QueueFullError(Exception):
+    """Raised when too many jobs are already waiting to run."""
+
+
+class Job:
+    """
+    Status of one background job, with per-stage progress counters.
+    Updated from a worker thread and read by the status endpoint.
+    """
+    def __init__(self, filename, stages):
+        self.id = uuid.uuid4().hex
+        self.filename = filename
+        self.status = "queued"
+        self.stage = None
+        self.stages = OrderedDict((name, {"status": "pending"}) for name in stages)
+        self.result = None
+        self.error = None
+        self.created_at = datetime.now().isoformat()
+        self.updated_at = self.created_at
+        self._lock = threading.Lock()
+
+    def _set(self, name, status=None, **progress):
+        with self._lock:
+            stage = self.stages.setdefault(name, {"status": "pending"})
+            if status:
+                stage["status"] = status
+            stage.update(progress)
+            if status == "running":
+                self.stage = name
+            self.updated_at = datetime.now().isoformat()
+
+    def start_stage(self, name, **progress):
+        self._set(name, "running", **progress)
+
+    def update_stage(self, name, **progress):
+        self._set(name, **progress)
+
+    def finish_stage(self, name, **progress):
+        self._set(name, "done", **progress)
+
+    def set_status(self, status, error=None):
+        with self._lock:
+            self.status = status
+            if error is not None:
+                self.error = error
+                if self.stage:
+                    self.stages[self.stage]["status"] = "failed"
+            self.updated_at = datetime.now().isoformat()
+
+    def to_dict(self):
+        with self._lock:
+            return {
+                "job_id": self.id,
+                "filename": self.filename,
+                "status": self.status,
+                "stage": self.stage,
+                "stages": {name: dict(stage) for name, stage in self.stages.items()},
+                "result": self.result,
+                "error": self.error,
+                "created_at": self.created_at,
+                "updated_at": self.updated_at,
+            }
+
+
+class JobQueue:
+    """
+    Runs blocking work (PDF extraction, embedding, index writes) on a
+    bounded thread pool so async request handlers return immediately.
+    """
+    def __init__(self, workers=INGEST_JOB_WORKERS, max_pending=INGEST_MAX_PENDING, history=JOB_HISTORY):
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="ingest")
+        self.max_pending = max_pending
+        self.history = history
+        self.jobs = OrderedDict()
+        self._lock = threading.Lock()
+
+    def submit(self, filename, stages, fn, *args):
+        """
+        Queues fn(job, *args) and returns the Job. The function's return
+        value becomes job.result; an exception marks the job as failed.
+        """
+        with self._lock:
+            pending = sum(1 for job in self.jobs.values() if job.status in ("queued", "running"))
+            if pending >= self.max_pending:
+                raise QueueFullError(f"{pending} jobs already pending; try again later.")
+            job = Job(filename, stages)
+            self.jobs[job.id] = job
+            self._trim()
+        self.executor.submit(self._run, job, fn, args)
+        return job
+
+    def get(self, job_id):
+        with self._lock:
+            return self.jobs.get(job_id)
+
+    def _run(self, job, fn, args):
+        job.set_status("running")
+        try:
+            job.result = fn(job, *args)
+            job.set_status("done")
+        except Exception as e:
+            traceback.print_exc()
+            job.set_status("failed", error=str(e))
+
+    def _trim(self):
+        # Drop the oldest finished jobs once history is over its limit
+        finished = [job_id for job_id, job in self.jobs.items() if job.status in ("done", "failed")]
+        for job_id in finished[:max(0, len(self.jobs) - self.history)]:
+            del self.jobs[job_id]
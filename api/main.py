@@ -1,20 +1,39 @@
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from contextlib import asynccontextmanager
 import os
 import uvicorn
 from dotenv import load_dotenv
 
 # Import Routes
-from api.routes import ingest, chat
+from api.routes import ingest, chat, documents, collections as collection_routes
+from embedding_registry import EMBEDDING_WARMUP, embedding_registry
+from query_cache import query_cache
+from api.index_store import EMBEDDING_MODEL, collections
 
 # Load Environment
 load_dotenv()
 
+@asynccontextmanager
+async def lifespan(app):
+    # Load the shared embedding model and the default collection once, before the first request
+    if EMBEDDING_WARMUP:
+        try:
+            embedding_registry.warm_up(EMBEDDING_MODEL)
+        except Exception as e:
+            print(f"Could not warm up embedding model: {e}")
+    try:
+        collections.get()
+    except Exception as e:
+        print(f"Could not load index: {e}")
+    yield
+
 # Initialize App
 app = FastAPI(
     title="Lumina API",
     description="Backend for Lumina Intelligent Doc Reader",
-    version="4.0.0"
+    version="4.0.0",
+    lifespan=lifespan
 )
 
 # CORS (Allow Mobile App to Connect)
@@ -29,6 +48,8 @@ app.add_middleware(
 # Include Routers
 app.include_router(ingest.router, prefix="/api/v1", tags=["Ingestion"])
 app.include_router(chat.router, prefix="/api/v1", tags=["Chat"])
+app.include_router(collection_routes.router, prefix="/api/v1", tags=["Collections"])
+app.include_router(documents.router, prefix="/api/v1", tags=["Documents"])
 
 # Routes
 @app.get("/")
@@ -39,5 +60,14 @@ async def root():
 async def health_check():
     return {"status": "healthy"}
 
+@app.get("/diagnostics")
+async def diagnostics():
+    """
+    Load time and memory use of the embedding models in this process, query
+    cache counters and memory use of the loaded collections.
+    """
+    return {"embeddings": embedding_registry.stats(), "query_cache": query_cache.stats(),
+            "index": collections.stats()}
+
 if __name__ == "__main__":
     uvicorn.run("api.main:app", host="0.0.0.0", port=8000, reload=True)
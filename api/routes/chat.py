@@ -1,19 +1,19 @@
 from fastapi import APIRouter, HTTPException
 from pydantic import BaseModel
-from langchain_community.vectorstores import FAISS
-from langchain_community.embeddings import HuggingFaceEmbeddings
+from typing import List, Optional
+from api.index_store import DEFAULT_COLLECTION, collections
 from bot import get_rag_chain
-import os
 
 router = APIRouter()
 
-# Configuration
-DB_DIR = "./faiss_index"
-EMBEDDING_MODEL = "all-MiniLM-L6-v2"
-
 class ChatRequest(BaseModel):
     query: str
     history: list = [] # Future support for history
+    collection: str = DEFAULT_COLLECTION
+    # Only search these documents (filenames) and/or this inclusive page range (first page is 1)
+    sources: Optional[List[str]] = None
+    page_from: Optional[int] = None
+    page_to: Optional[int] = None
 
 @router.post("/chat")
 async def chat_endpoint(request: ChatRequest):
@@ -23,20 +23,26 @@ async def chat_endpoint(request: ChatRequest):
 
     try:
         print("--- DEBUG: Entering Chat Endpoint ---")
-        # 1. Load Vector Store
-        if not os.path.exists(DB_DIR):
-             raise HTTPException(status_code=404, detail="Knowledge Base not found. Please upload a document first.")
-             
-        embeddings = HuggingFaceEmbeddings(model_name=EMBEDDING_MODEL)
+        pages = None
+        if request.page_from is not None or request.page_to is not None:
+            if request.page_from is not None and request.page_to is not None and request.page_from > request.page_to:
+                raise HTTPException(status_code=400, detail="page_from must not be after page_to.")
+            pages = (request.page_from, request.page_to)
+
+        # 1. Get the collection's resident Vector Store (loaded on first use,
+        #    reloaded only when ingest publishes a new version)
         try:
-            vector_store = FAISS.load_local(DB_DIR, embeddings, allow_dangerous_deserialization=True)
-            print("--- DEBUG: Vector Store Loaded ---")
+            vector_store = collections.get(request.collection)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
         except Exception as e:
             raise HTTPException(status_code=500, detail=f"Failed to load knowledge base: {str(e)}")
+        if vector_store is None:
+             raise HTTPException(status_code=404, detail="Knowledge Base not found. Please upload a document first.")
 
         # 2. Get Chain
         try:
-            chain = get_rag_chain(vector_store)
+            chain = get_rag_chain(vector_store, request.sources, pages)
             print("--- DEBUG: Chain Created ---")
         except ValueError as e:
              raise HTTPException(status_code=500, detail=str(e)) # Likely Missing API Key
@@ -55,6 +61,8 @@ async def chat_endpoint(request: ChatRequest):
             "citations": [] 
         }
 
+    except HTTPException:
+        raise
     except Exception as e:
         import traceback
         print("!!! EXCEPTION IN CHAT ENDPOINT !!!")
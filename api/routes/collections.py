@@ -0,0 +1,24 @@
+from fastapi import APIRouter, HTTPException
+from api.index_store import collections
+
+router = APIRouter()
+
+@router.get("/collections")
+async def list_collections():
+    """
+    Collections with an index on disk, and which of them are loaded.
+    """
+    return {"collections": collections.names(), "memory": collections.stats()}
+
+@router.delete("/collections/{name}")
+async def delete_collection(name: str):
+    """
+    Deletes a collection's index and uploads. Other collections are untouched.
+    """
+    try:
+        existed = collections.delete(name)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if not existed:
+        raise HTTPException(status_code=404, detail="Collection not found.")
+    return {"message": f"Collection {name} deleted"}
@@ -0,0 +1,45 @@
+from fastapi import APIRouter, HTTPException
+import os
+from api.index_store import DEFAULT_COLLECTION, collections
+from api.routes import ingest
+
+router = APIRouter()
+
+def uploaded_file(collection, source):
+    """
+    Path of the saved upload that chunks with metadata["source"] == `source`
+    came from. API uploads are named by their path inside the upload dir;
+    ingest.py names ./docs files by their path ("docs/a.pdf"), so those are
+    taken relative to DOCS_DIR. Raises ValueError for a path outside the
+    upload dir.
+    """
+    root = os.path.realpath(ingest.upload_dir(collection))
+    relative = source
+    if collection == DEFAULT_COLLECTION:
+        inside_docs = os.path.relpath(os.path.normpath(source), os.path.normpath(ingest.DOCS_DIR))
+        if inside_docs != os.pardir and not inside_docs.startswith(os.pardir + os.sep):
+            relative = inside_docs
+    path = os.path.realpath(os.path.join(root, relative))
+    if os.path.commonpath([root, path]) != root:
+        raise ValueError(f"Document path is outside the upload directory: {source!r}")
+    return path
+
+@router.delete("/documents/{source:path}")
+async def delete_document(source: str, collection: str = DEFAULT_COLLECTION):
+    """
+    Removes one uploaded document (by its source path, e.g. "a.pdf" or
+    "docs/a.pdf") from a collection. Its chunks stop showing up in answers
+    right away; the index space is reclaimed by the next background
+    compaction.
+    """
+    try:
+        uploaded = uploaded_file(collection, source)
+        chunks = collections.delete_document(collection, source)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if not chunks:
+        raise HTTPException(status_code=404, detail="Document not found.")
+    # Keep ingest.py (which syncs ./docs) from indexing it again
+    if os.path.isfile(uploaded):
+        os.remove(uploaded)
+    return {"source": source, "collection": collection, "chunks_deleted": chunks}
@@ -1,61 +1,125 @@
 from fastapi import APIRouter, UploadFile, File, HTTPException
-import shutil
 import os
-from pdf_processor import PDFProcessor
-from langchain_community.vectorstores import FAISS
-from langchain_community.embeddings import HuggingFaceEmbeddings
+from pdf_processor import PDFProcessor, batched, map_pdf
+from ingest_cache import IngestCache, add_to_store, spool_upload
+from api.jobs import JobQueue, QueueFullError
+from api.index_store import DEFAULT_COLLECTION, EMBEDDING_MODEL, collections
+from embedding_registry import embedding_registry, get_embeddings
 
 router = APIRouter()
 
 # Configuration
 DOCS_DIR = "./docs"
-DB_DIR = "./faiss_index"
-EMBEDDING_MODEL = "all-MiniLM-L6-v2"
+INGEST_STAGES = ["extract", "embed", "index"]
 
-@router.post("/ingest")
-async def ingest_document(file: UploadFile = File(...)):
+# Chunks + vectors of previously seen uploads, keyed by file hash
+ingest_cache = IngestCache()
+
+# Background ingestion: extraction/embedding run off the event loop
+ingest_jobs = JobQueue()
+
+def upload_dir(collection):
+    """
+    Where uploads to `collection` are kept: ./docs for the default
+    collection (synced by ingest.py), inside the shard for the others.
+    """
+    if collection == DEFAULT_COLLECTION:
+        return DOCS_DIR
+    return os.path.join(collections.path(collection), "uploads")
+
+def run_ingest_job(job, file_path, filename, digest, collection=DEFAULT_COLLECTION):
     """
-    Uploads a PDF, saves it, and adds it to the Vector DB.
+    Extracts, embeds and indexes one saved PDF, reporting progress on `job`.
+    Runs on the ingest worker pool.
+    """
+    embeddings = get_embeddings(EMBEDDING_MODEL)
+    # Vectors are only reused from the same model and backend
+    model = embedding_registry.cache_name(EMBEDDING_MODEL)
+
+    cached = ingest_cache.get(digest, model, source=filename)
+    if cached is not None:
+        # Identical file seen before: reuse its chunks and vectors
+        documents, vectors = cached
+        job.finish_stage("extract", cached=True)
+        job.finish_stage("embed", cached=True, chunks=len(documents))
+        segment = add_to_store(None, documents, vectors, embeddings)
+    else:
+        # Chunks are embedded and added to the segment in bounded batches as
+        # pages are extracted; no other copy of them is kept
+        processor = PDFProcessor()
+        segment = None
+        chunk_count = 0
+        job.start_stage("extract", pages=0)
+        job.start_stage("embed", chunks=0)
+        # Memory-mapped view of the saved file instead of re-reading it
+        with map_pdf(file_path) as pdf_view:
+            for batch in batched(processor.iter_chunks(pdf_view, filename)):
+                job.update_stage("extract", pages=batch[-1].metadata["page"])
+                batch_vectors = embeddings.embed_documents([chunk.page_content for chunk in batch])
+                segment = add_to_store(segment, batch, batch_vectors, embeddings)
+                chunk_count += len(batch)
+                job.update_stage("embed", chunks=chunk_count)
+        job.finish_stage("extract")
+        job.finish_stage("embed")
+
+    if segment is None:
+        raise ValueError("No text extracted from PDF.")
+    chunk_count = segment.index.ntotal
+
+    if cached is None:
+        try:
+            ingest_cache.put_store(digest, model, segment)
+        except Exception as e:
+            print(f"Could not write ingest cache: {e}")
+
+    # Update/Create Vector Store
+    job.start_stage("index")
+    # Only the new chunks are written, as a delta segment; chat requests keep
+    # reading the resident index meanwhile and see the segment once published
+    collections.append(collection, segment)
+    job.finish_stage("index", chunks_added=chunk_count)
+
+    return {"filename": filename, "collection": collection, "chunks_added": chunk_count}
+
+@router.post("/ingest", status_code=202)
+async def ingest_document(file: UploadFile = File(...), collection: str = DEFAULT_COLLECTION):
+    """
+    Uploads a PDF, saves it, and queues it for indexing into the Vector DB
+    (the given collection's shard). Returns a job ID to poll at GET /jobs/{job_id}.
     """
     try:
-        # 1. Save File Locally
-        file_path = os.path.join(DOCS_DIR, file.filename)
-        with open(file_path, "wb") as buffer:
-            shutil.copyfileobj(file.file, buffer)
-            
-        # 2. Process PDF
-        # Re-open the file for processing to ensure clean read
-        with open(file_path, "rb") as f:
-            processor = PDFProcessor()
-            chunks = processor.process_pdf(f, file.filename)
-            
-        if not chunks:
-            raise HTTPException(status_code=400, detail="No text extracted from PDF.")
-
-        # 3. Update/Create Vector Store
-        embeddings = HuggingFaceEmbeddings(model_name=EMBEDDING_MODEL)
-        
-        if os.path.exists(DB_DIR):
-            # Load existing
-            try:
-                vector_store = FAISS.load_local(DB_DIR, embeddings, allow_dangerous_deserialization=True)
-                vector_store.add_documents(chunks)
-            except:
-                # If load fails (corrupt or old version), create new
-                vector_store = FAISS.from_documents(chunks, embeddings)
-        else:
-            # Create new
-            vector_store = FAISS.from_documents(chunks, embeddings)
-            
-        # Save updated index
-        vector_store.save_local(DB_DIR)
-        
+        target_dir = upload_dir(collection)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    try:
+        # 1. Save File Locally (streamed in fixed-size blocks, hashed on the way)
+        os.makedirs(target_dir, exist_ok=True)
+        file_path = os.path.join(target_dir, file.filename)
+        size, digest = await spool_upload(file, file_path)
+
+        # 2. Process PDF and update the Vector Store in the background
+        job = ingest_jobs.submit(file.filename, INGEST_STAGES, run_ingest_job, file_path, file.filename, digest,
+                                 collection)
+
         return {
-            "status": "success", 
-            "filename": file.filename, 
-            "chunks_added": len(chunks),
-            "message": "Document indexed successfully."
+            "status": "queued",
+            "job_id": job.id,
+            "filename": file.filename,
+            "collection": collection,
+            "message": "Document queued for indexing."
         }
 
+    except QueueFullError as e:
+        raise HTTPException(status_code=503, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/jobs/{job_id}")
+async def get_job(job_id: str):
+    """
+    Status and per-stage progress of an ingestion job.
+    """
+    job = ingest_jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found.")
+    return job.to_dict()
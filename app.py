@@ -4,7 +4,7 @@ from bot import chat_with_bot
 from pdf_processor import PDFProcessor
 import os
 from langchain_community.vectorstores import FAISS
-from langchain_community.embeddings import HuggingFaceEmbeddings
+from embedding_registry import get_embeddings
 
 # -----------------------------------------------------------------------------
 # PAGE CONFIGURATION
@@ -23,12 +23,12 @@ st.set_page_config(
 def load_embeddings():
     """Load and cache the embedding model to boost performance."""
     try:
-        return HuggingFaceEmbeddings(
-            model_name="all-MiniLM-L6-v2",
+        return get_embeddings(
+            "all-MiniLM-L6-v2",
             model_kwargs={'local_files_only': True}
         )
     except Exception:
-        return HuggingFaceEmbeddings(model_name="all-MiniLM-L6-v2")
+        return get_embeddings("all-MiniLM-L6-v2")
 
 # Initialize Retrieval
 if "retriever" not in st.session_state:
@@ -7,6 +7,7 @@ from langchain_core.prompts import ChatPromptTemplate
 from langchain_core.output_parsers import StrOutputParser
 from langchain_core.runnables import RunnablePassthrough, RunnableParallel
 from .expert_tools import expert_tools
+from .query_cache import CachedQueryRetriever
 from dotenv import load_dotenv
 
 # Load environment variables
@@ -49,12 +50,14 @@ SYSTEM_PROMPT = """You are LUMINA, an elite AI Document Intelligence Analyst wit
 def format_docs(docs):
     return "\n\n".join(doc.page_content for doc in docs)
 
-def get_rag_chain(vector_store):
+def get_rag_chain(vector_store, sources=None, pages=None):
     if "GROQ_API_KEY" not in os.environ:
          raise ValueError("GROQ_API_KEY not found. Required for Chat.")
     
     llm = ChatGroq(model=LLM_MODEL, temperature=0.7)
-    retriever = vector_store.as_retriever(search_kwargs={"k": 5})
+    # Repeated questions reuse their cached query vector; sources/pages
+    # ((first, last) page numbers) restrict the chunks that are searched
+    retriever = CachedQueryRetriever(vector_store=vector_store, k=5, sources=sources, pages=pages)
     
     # Create a simple RAG chain without agents
     prompt = ChatPromptTemplate.from_messages([
@@ -75,12 +78,12 @@ def get_rag_chain(vector_store):
     
     return chain
 
-def chat_with_bot(query, vector_store):
+def chat_with_bot(query, vector_store, sources=None, pages=None):
     try:
         if not vector_store:
             return "System Error: Database not initialized."
 
-        chain = get_rag_chain(vector_store)
+        chain = get_rag_chain(vector_store, sources, pages)
         
         # Simple invocation - chain expects just the query string
         result = chain.invoke(query)
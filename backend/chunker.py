@@ -0,0 +1,143 @@
+import re
+from collections import deque
+from langchain_core.documents import Document
+
+# Same separator ladder as RecursiveCharacterTextSplitter
+DEFAULT_SEPARATORS = ["\n\n", "\n", " ", ""]
+
+
+class OffsetTextSplitter:
+    """
+    Drop-in replacement for RecursiveCharacterTextSplitter on the ingest hot
+    path. It runs the same recursive split/merge algorithm (same chunk_size /
+    chunk_overlap windows, same chunk boundaries), but over (start, end)
+    character offsets into the page text: substrings are only created when a
+    chunk is emitted as a Document. start_index is the chunk's true offset.
+
+    By default chunk_size counts characters. Pass a `length_function`
+    (e.g. from token_counter) to chunk by token budget instead; lengths are
+    then measured on the candidate pieces, as LangChain does.
+    """
+    def __init__(self, chunk_size=1000, chunk_overlap=200, length_function=None, separators=None):
+        if chunk_overlap > chunk_size:
+            raise ValueError(f"chunk_overlap ({chunk_overlap}) is larger than chunk_size ({chunk_size}).")
+        self.chunk_size = chunk_size
+        self.chunk_overlap = chunk_overlap
+        self.length_function = length_function
+        self.separators = list(separators or DEFAULT_SEPARATORS)
+        self._patterns = {sep: re.compile(re.escape(sep)) for sep in self.separators if sep}
+
+    def split_documents(self, documents):
+        """
+        Splits Documents into chunks, adding start_index to the metadata.
+        """
+        chunks = []
+        for doc in documents:
+            text = doc.page_content
+            for start, end in self.split_spans(text):
+                metadata = dict(doc.metadata)
+                metadata["start_index"] = start
+                chunks.append(Document(page_content=text[start:end], metadata=metadata))
+        return chunks
+
+    def split_text(self, text):
+        return [text[start:end] for start, end in self.split_spans(text)]
+
+    def split_spans(self, text):
+        """
+        Returns the (start, end) offsets of every chunk of `text`.
+        """
+        if self.length_function is None and len(text) < self.chunk_size:
+            # Short page: the merge step would keep every piece in one chunk
+            span = self._strip(text, 0, len(text))
+            return [span] if span else []
+        return self._split(text, 0, len(text), self.separators)
+
+    def _length(self, text, start, end):
+        if self.length_function is None:
+            return end - start
+        return self.length_function(text[start:end])
+
+    def _split(self, text, start, end, separators):
+        # Pick the first separator present in this span
+        separator = separators[-1]
+        new_separators = []
+        for i, sep in enumerate(separators):
+            if not sep:
+                separator = sep
+                break
+            if self._patterns[sep].search(text, start, end):
+                separator = sep
+                new_separators = separators[i + 1:]
+                break
+
+        # Split before each separator occurrence (separator kept at the start)
+        if separator:
+            cuts = [match.start() for match in self._patterns[separator].finditer(text, start, end)]
+            bounds = [start] + cuts + [end]
+            splits = [(a, b) for a, b in zip(bounds, bounds[1:]) if b > a]
+        else:
+            splits = [(i, i + 1) for i in range(start, end)]
+
+        # Merge small pieces into windows, recursing into pieces that are too big
+        final_spans = []
+        good_splits = []
+        for a, b in splits:
+            length = self._length(text, a, b)
+            if length < self.chunk_size:
+                good_splits.append((a, b, length))
+                continue
+            if good_splits:
+                final_spans.extend(self._merge(text, good_splits))
+                good_splits = []
+            if not new_separators:
+                final_spans.append((a, b))
+            else:
+                final_spans.extend(self._split(text, a, b, new_separators))
+        if good_splits:
+            final_spans.extend(self._merge(text, good_splits))
+        return final_spans
+
+    def _merge(self, text, splits):
+        spans = []
+        current = deque()
+        total = 0
+        for a, b, length in splits:
+            if total + length > self.chunk_size and current:
+                span = self._strip(text, current[0][0], current[-1][1])
+                if span:
+                    spans.append(span)
+                # Keep at most chunk_overlap worth of trailing pieces
+                while total > self.chunk_overlap or (total + length > self.chunk_size and total > 0):
+                    total -= current.popleft()[2]
+            current.append((a, b, length))
+            total += length
+        if current:
+            span = self._strip(text, current[0][0], current[-1][1])
+            if span:
+                spans.append(span)
+        return spans
+
+    @staticmethod
+    def _strip(text, start, end):
+        while start < end and text[start].isspace():
+            start += 1
+        while end > start and text[end - 1].isspace():
+            end -= 1
+        return (start, end) if end > start else None
+
+
+def token_counter(model_name="sentence-transformers/all-MiniLM-L6-v2"):
+    """
+    Returns a length function counting tokens with the embedding model's
+    tokenizer, for OffsetTextSplitter(length_function=...). Requires the
+    `transformers` package (installed with sentence-transformers).
+    """
+    from transformers import AutoTokenizer
+
+    tokenizer = AutoTokenizer.from_pretrained(model_name)
+
+    def count(text):
+        return len(tokenizer.encode(text, add_special_tokens=False))
+
+    return count
@@ -0,0 +1,171 @@
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+from langchain_core.embeddings import Embeddings
+
+# Configuration
+# Most texts encoded in one forward pass (0 disables micro-batching)
+EMBED_MICROBATCH_MAX_SIZE = int(os.getenv("EMBED_MICROBATCH_MAX_SIZE", 64))
+# Longest a request waits for concurrent requests to join its batch
+EMBED_MICROBATCH_WAIT_MS = float(os.getenv("EMBED_MICROBATCH_WAIT_MS", 5))
+
+
+class _Request:
+    def __init__(self, kind, texts):
+        self.kind = kind
+        self.texts = texts
+        # Texts handed to forward passes so far, and their vectors
+        self.taken = 0
+        self.vectors = []
+        self.future = Future()
+
+
+class MicroBatchingEmbeddings(Embeddings):
+    """
+    Embeddings wrapper that merges concurrent embed_query/embed_documents
+    calls from different threads into one model call. A single worker
+    thread takes the waiting requests, then keeps collecting requests for up
+    to `max_wait_ms` (or until `max_batch_size` texts) while other callers
+    are still waiting, runs one forward pass and hands each caller its own
+    vectors. A lone caller is dispatched at once.
+
+    Queries have their own queue and are taken before documents, and
+    document requests larger than `max_batch_size` are encoded over several
+    passes, so a chat query never waits behind more than one pass of an
+    ingest batch.
+
+    `queries_as_documents` says the model encodes queries exactly like
+    documents (true for HuggingFaceEmbeddings), so queries can join the same
+    forward pass; otherwise each query goes through embed_query on its own.
+    """
+    def __init__(self, embeddings, max_batch_size=EMBED_MICROBATCH_MAX_SIZE, max_wait_ms=EMBED_MICROBATCH_WAIT_MS,
+                 queries_as_documents=True):
+        self.embeddings = embeddings
+        self.queries_as_documents = queries_as_documents
+        self.model_name = getattr(embeddings, "model_name", type(embeddings).__name__)
+        self.max_batch_size = max(max_batch_size, 1)
+        self.max_wait = max_wait_ms / 1000
+        self.batches = 0
+        self.requests = 0
+        self.texts = 0
+        self._queries = deque()
+        self._documents = deque()
+        self._waiting = 0
+        self._lock = threading.Lock()
+        # Signalled when a request is queued
+        self._queued = threading.Condition(self._lock)
+        self._worker = None
+
+    def embed_documents(self, texts):
+        if not texts:
+            return []
+        return self._submit("documents", list(texts))
+
+    def embed_query(self, text):
+        return self._submit("query", [text])[0]
+
+    def _submit(self, kind, texts):
+        request = _Request(kind, texts)
+        with self._queued:
+            if self._worker is None:
+                self._worker = threading.Thread(target=self._run, name="embed-batcher", daemon=True)
+                self._worker.start()
+            self._waiting += 1
+            (self._queries if kind == "query" else self._documents).append(request)
+            self._queued.notify()
+        try:
+            return request.future.result()
+        finally:
+            with self._lock:
+                self._waiting -= 1
+
+    def _take(self, batch, size):
+        # Callers hold self._lock. Adds queued queries, then slices of queued
+        # documents, to `batch` as (request, start, stop) up to max_batch_size
+        # texts; returns the new size.
+        while self._queries and size < self.max_batch_size:
+            request = self._queries.popleft()
+            batch.append((request, 0, 1))
+            size += 1
+        while self._documents and size < self.max_batch_size:
+            request = self._documents[0]
+            if request.future.done():
+                # An earlier slice failed: the caller already has the error
+                self._documents.popleft()
+                continue
+            start = request.taken
+            stop = min(len(request.texts), start + self.max_batch_size - size)
+            request.taken = stop
+            if stop == len(request.texts):
+                self._documents.popleft()
+            batch.append((request, start, stop))
+            size += stop - start
+        return size
+
+    def _collect(self):
+        with self._queued:
+            # Block for the first request, then gather concurrent ones
+            while not self._queries and not self._documents:
+                self._queued.wait()
+            batch = []
+            size = self._take(batch, 0)
+            deadline = time.monotonic() + self.max_wait
+            while size < self.max_batch_size:
+                timeout = deadline - time.monotonic()
+                others_waiting = self._waiting > len({id(request) for request, _, _ in batch})
+                # Nobody else to wait for: only take what is already queued
+                if not others_waiting or timeout <= 0 or not self._queued.wait(timeout):
+                    break
+                size = self._take(batch, size)
+            return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            self.batches += 1
+            self.requests += sum(1 for request, start, _ in batch if start == 0)
+            self.texts += sum(stop - start for _, start, stop in batch)
+            if self.queries_as_documents:
+                self._encode(batch)
+            else:
+                for item in batch:
+                    self._encode([item])
+
+    def _encode(self, group):
+        texts = [text for request, start, stop in group for text in request.texts[start:stop]]
+        try:
+            if len(group) == 1 and group[0][0].kind == "query":
+                vectors = [self.embeddings.embed_query(texts[0])]
+            else:
+                vectors = self.embeddings.embed_documents(texts)
+        except Exception as e:
+            for request, _, _ in group:
+                if not request.future.done():
+                    request.future.set_exception(e)
+            return
+
+        offset = 0
+        for request, start, stop in group:
+            if request.future.done():
+                # An earlier slice of this request failed
+                offset += stop - start
+                continue
+            request.vectors.extend(vectors[offset:offset + stop - start])
+            offset += stop - start
+            if stop == len(request.texts):
+                request.future.set_result(request.vectors)
+
+    def stats(self):
+        """
+        Number of forward passes and how many requests/texts they merged.
+        """
+        return {
+            "max_batch_size": self.max_batch_size,
+            "max_wait_ms": self.max_wait * 1000,
+            "batches": self.batches,
+            "requests": self.requests,
+            "texts": self.texts,
+            "avg_requests_per_batch": round(self.requests / self.batches, 2) if self.batches else None,
+        }
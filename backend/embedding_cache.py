@@ -0,0 +1,186 @@
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+import unicodedata
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+# Configuration
+EMBED_CACHE_PATH = os.getenv("EMBED_CACHE_PATH", os.path.join(".embedding_cache", "embeddings.sqlite3"))
+# 0 disables the cache
+EMBED_CACHE_MAX_MB = int(os.getenv("EMBED_CACHE_MAX_MB", 256))
+# Eviction frees space down to this fraction of the cap, so it runs rarely
+EVICT_TO = 0.9
+# SQLite limits the number of bound parameters per statement
+LOOKUP_BATCH = 500
+
+
+def normalize_text(text):
+    """
+    Canonical form of a chunk for cache keys: Unicode NFC, whitespace runs
+    collapsed. The tokenizer ignores these differences, so the vectors match.
+    """
+    return " ".join(unicodedata.normalize("NFC", text).split())
+
+
+def text_key(model_name, text):
+    """
+    Cache key of `text` embedded with `model_name`.
+    """
+    return hashlib.sha256(f"{model_name}\0{normalize_text(text)}".encode("utf-8")).hexdigest()
+
+
+class EmbeddingCache:
+    """
+    Persistent SQLite cache of chunk vectors, keyed by (model, normalized text
+    hash). Boilerplate pages and overlapping chunks repeat across documents;
+    their vectors are computed once and reused by every later ingest.
+    Total size is capped; the least recently used vectors are evicted first.
+    """
+    def __init__(self, path=EMBED_CACHE_PATH, max_bytes=EMBED_CACHE_MAX_MB * 1024 * 1024):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._conn = None
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def _connect(self):
+        # Opened on first use, so importing this module never touches the disk
+        if self._conn is None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            conn = sqlite3.connect(self.path, check_same_thread=False, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS embeddings ("
+                "key TEXT PRIMARY KEY, vector BLOB NOT NULL, size INTEGER NOT NULL, last_used REAL NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS embeddings_last_used ON embeddings (last_used)")
+            self._bytes = conn.execute("SELECT COALESCE(SUM(size), 0) FROM embeddings").fetchone()[0]
+            self._conn = conn
+        return self._conn
+
+    def get_many(self, keys):
+        """
+        Returns {key: vector} for the keys found in the cache.
+        """
+        found = {}
+        unique = list(dict.fromkeys(keys))
+        with self._lock:
+            conn = self._connect()
+            for i in range(0, len(unique), LOOKUP_BATCH):
+                batch = unique[i:i + LOOKUP_BATCH]
+                rows = conn.execute(
+                    f"SELECT key, vector FROM embeddings WHERE key IN ({','.join('?' * len(batch))})", batch
+                ).fetchall()
+                for key, blob in rows:
+                    found[key] = np.frombuffer(blob, dtype=np.float32).tolist()
+            if found:
+                # Mark as recently used for LRU eviction
+                now = time.time()
+                with conn:
+                    conn.executemany("UPDATE embeddings SET last_used = ? WHERE key = ?",
+                                     [(now, key) for key in found])
+            self.hits += sum(1 for key in keys if key in found)
+            self.misses += sum(1 for key in keys if key not in found)
+        return found
+
+    def put_many(self, items):
+        """
+        Stores (key, vector) pairs, then evicts old vectors if the cache is
+        over its size cap.
+        """
+        now = time.time()
+        rows = []
+        for key, vector in items:
+            blob = np.asarray(vector, dtype=np.float32).tobytes()
+            rows.append((key, blob, len(blob), now))
+        with self._lock:
+            conn = self._connect()
+            with conn:
+                conn.executemany("INSERT OR REPLACE INTO embeddings VALUES (?, ?, ?, ?)", rows)
+            self._bytes += sum(row[2] for row in rows)
+            if self._bytes > self.max_bytes:
+                self._evict(conn)
+
+    def _evict(self, conn):
+        # Other processes may share the file: recount before deleting
+        self._bytes = conn.execute("SELECT COALESCE(SUM(size), 0) FROM embeddings").fetchone()[0]
+        target = int(self.max_bytes * EVICT_TO)
+        excess = self._bytes - target
+        if excess <= 0:
+            return
+        keys, freed = [], 0
+        for key, size in conn.execute("SELECT key, size FROM embeddings ORDER BY last_used"):
+            if freed >= excess:
+                break
+            keys.append((key,))
+            freed += size
+        with conn:
+            conn.executemany("DELETE FROM embeddings WHERE key = ?", keys)
+        self._bytes -= freed
+        self.evictions += len(keys)
+
+    def stats(self):
+        """
+        Hit/miss counters (this process) and current size of the cache.
+        """
+        with self._lock:
+            lookups = self.hits + self.misses
+            entries = 0
+            if self._conn is not None:
+                entries = self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+            return {
+                "path": self.path,
+                "entries": entries,
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else None,
+                "evictions": self.evictions,
+            }
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+
+class CachedEmbeddings(Embeddings):
+    """
+    Embeddings wrapper that looks chunks up in an EmbeddingCache before
+    calling the model; only unseen texts are embedded, once each, in one
+    batch. Queries are passed straight through.
+    """
+    def __init__(self, embeddings, model_name, cache):
+        self.embeddings = embeddings
+        self.model_name = model_name
+        self.cache = cache
+
+    def embed_documents(self, texts):
+        keys = [text_key(self.model_name, text) for text in texts]
+        vectors = self.cache.get_many(keys)
+
+        missing = {}
+        for key, text in zip(keys, texts):
+            if key not in vectors and key not in missing:
+                missing[key] = text
+        if missing:
+            new_vectors = self.embeddings.embed_documents(list(missing.values()))
+            new_items = list(zip(missing, new_vectors))
+            self.cache.put_many(new_items)
+            # Same float32 values a later cache hit returns
+            vectors.update((key, np.asarray(vector, dtype=np.float32).tolist()) for key, vector in new_items)
+
+        return [vectors[key] for key in keys]
+
+    def embed_query(self, text):
+        return self.embeddings.embed_query(text)
@@ -0,0 +1,152 @@
+import os
+import sys
+import threading
+import time
+from datetime import datetime
+from langchain_community.embeddings import HuggingFaceEmbeddings
+from .embedding_batcher import EMBED_MICROBATCH_MAX_SIZE, MicroBatchingEmbeddings
+from .embedding_cache import EMBED_CACHE_MAX_MB, CachedEmbeddings, EmbeddingCache
+from .onnx_embeddings import EMBEDDING_BACKEND, ONNX_MODEL_DIR, OnnxEmbeddings
+
+# Load and warm embedding models when the server starts (0 = on first use)
+EMBEDDING_WARMUP = os.getenv("EMBEDDING_WARMUP", "1") != "0"
+WARMUP_TEXT = "Lumina warm-up"
+
+
+def _rss_bytes():
+    """
+    Resident memory of this process in bytes, or None if unavailable.
+    """
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        pass
+    try:
+        import resource
+        # Peak RSS: kilobytes on Linux, bytes on macOS
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if sys.platform == "darwin" else peak * 1024
+    except (ImportError, OSError):
+        return None
+
+
+class EmbeddingRegistry:
+    """
+    Process-wide cache of embedding models. Each model is loaded once, warmed
+    with a dummy encode, and the same instance is handed to every caller, so
+    requests never pay the sentence-transformers load time.
+    With an EmbeddingCache, models are wrapped in CachedEmbeddings so chunk
+    vectors already computed (by any process) are not embedded again. With
+    micro_batch_size > 0, concurrent calls are merged by a
+    MicroBatchingEmbeddings service in front of the model.
+    backend="onnx" serves models from an int8 ONNX export in onnx_model_dir,
+    falling back to HuggingFaceEmbeddings if it cannot be loaded.
+    """
+    def __init__(self, cache=None, micro_batch_size=0, backend="hf", onnx_model_dir=ONNX_MODEL_DIR):
+        self.cache = cache
+        self.backend = backend
+        self.onnx_model_dir = onnx_model_dir
+        self.micro_batch_size = micro_batch_size
+        self._batchers = {}
+        self._models = {}
+        self._stats = {}
+        self._lock = threading.Lock()
+
+    def get(self, model_name, **kwargs):
+        """
+        Returns the shared embeddings for `model_name`, loading it on first
+        use. Extra kwargs are passed to HuggingFaceEmbeddings on that load.
+        """
+        model = self._models.get(model_name)
+        if model is not None:
+            return model
+        with self._lock:
+            if model_name not in self._models:
+                self._models[model_name] = self._load(model_name, kwargs)
+            return self._models[model_name]
+
+    def warm_up(self, *model_names):
+        """
+        Loads and warms the given models now (e.g. at server startup).
+        """
+        for model_name in model_names:
+            self.get(model_name)
+
+    def stats(self):
+        """
+        Load time, warm-up time and memory use of every loaded model, and
+        embedding cache counters.
+        """
+        with self._lock:
+            models = {name: dict(stats) for name, stats in self._stats.items()}
+            for name, batcher in self._batchers.items():
+                models[name]["micro_batching"] = batcher.stats()
+        cache = self.cache.stats() if self.cache is not None else None
+        return {"models": models, "process_rss_bytes": _rss_bytes(), "cache": cache}
+
+    def _load(self, model_name, kwargs):
+        rss_before = _rss_bytes()
+        start = time.perf_counter()
+        model, backend = self._create(model_name, kwargs)
+        loaded = time.perf_counter()
+        # First encode initialises lazy weights/kernels
+        model.embed_query(WARMUP_TEXT)
+        warmed = time.perf_counter()
+        rss_after = _rss_bytes()
+
+        self._stats[model_name] = {
+            "backend": backend,
+            "load_seconds": round(loaded - start, 3),
+            "warmup_seconds": round(warmed - loaded, 3),
+            "memory_bytes": rss_after - rss_before if rss_before is not None and rss_after is not None else None,
+            "loaded_at": datetime.now().isoformat(),
+        }
+        print(f"🧠 Loaded embedding model {model_name} in {warmed - start:.2f}s")
+        if self.micro_batch_size > 0:
+            # Both backends encode queries exactly like documents
+            model = MicroBatchingEmbeddings(model, max_batch_size=self.micro_batch_size, queries_as_documents=True)
+            self._batchers[model_name] = model
+        if self.cache is not None:
+            return CachedEmbeddings(model, self.cache_name(model_name), self.cache)
+        return model
+
+    def cache_name(self, model_name):
+        """
+        Name vectors of `model_name` are cached under: the model name, plus
+        the backend that serves it unless that is HuggingFace. ONNX int8
+        vectors differ slightly from torch ones, so they are kept apart.
+        Models not loaded yet are named after the configured backend.
+        """
+        stats = self._stats.get(model_name)
+        if stats is not None:
+            backend = stats["backend"]
+        else:
+            backend = "onnx-int8" if self.backend == "onnx" else "hf"
+        return model_name if backend == "hf" else f"{model_name}@{backend}"
+
+    def _create(self, model_name, kwargs):
+        if self.backend == "onnx":
+            try:
+                model = OnnxEmbeddings(model_dir=self.onnx_model_dir, model_name=model_name)
+                # Corrupt or incompatible exports may load and only fail on the first encode
+                model.embed_query(WARMUP_TEXT)
+                return model, "onnx-int8"
+            except Exception as e:
+                print(f"⚠️ ONNX backend unavailable ({e}); using HuggingFace for {model_name}")
+        return HuggingFaceEmbeddings(model_name=model_name, **kwargs), "hf"
+
+
+# Shared by every route and script in this process
+embedding_registry = EmbeddingRegistry(
+    cache=EmbeddingCache() if EMBED_CACHE_MAX_MB > 0 else None,
+    micro_batch_size=EMBED_MICROBATCH_MAX_SIZE,
+    backend=EMBEDDING_BACKEND,
+)
+
+
+def get_embeddings(model_name, **kwargs):
+    """
+    Shortcut for embedding_registry.get().
+    """
+    return embedding_registry.get(model_name, **kwargs)
@@ -0,0 +1,416 @@
+import json
+import os
+import shutil
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from langchain_community.vectorstores import FAISS
+from .ann_index import delete_from_store
+from .ingest_cache import merge_stores
+from .columnar_docstore import has_columnar_docstore, load_store, save_store
+
+try:
+    import fcntl
+except ImportError:  # Windows: writers are only serialized within this process
+    fcntl = None
+
+# Configuration
+# Published snapshots kept on disk besides the current one (older ones are deleted)
+INDEX_KEEP_VERSIONS = int(os.getenv("INDEX_KEEP_VERSIONS", 2))
+# Delta segments (or document deletions) allowed before they are compacted into a new base snapshot
+INDEX_COMPACT_SEGMENTS = int(os.getenv("INDEX_COMPACT_SEGMENTS", 8))
+# Layout: <db_dir>/CURRENT describes the live index: a base snapshot in
+# <db_dir>/versions/<base>/ plus delta segments in <db_dir>/segments/<name>/,
+# minus the chunks listed in <db_dir>/tombstones/<name>.json
+CURRENT_FILE = "CURRENT"
+# Held by writers (any process) while they read and rewrite CURRENT
+LOCK_FILE = "LOCK"
+VERSIONS_DIR = "versions"
+SEGMENTS_DIR = "segments"
+TOMBSTONES_DIR = "tombstones"
+# Unfinished snapshot directories of crashed writers are removed after this long
+STALE_TMP_SECONDS = 3600
+# Unreferenced segments are kept this long for readers still loading an older state
+SEGMENT_GRACE_SECONDS = 60
+# Attempts to load the current snapshot while writers keep replacing it
+LOAD_RETRIES = 3
+
+
+def new_version():
+    """
+    Snapshot name that sorts by publish time.
+    """
+    return f"{time.time_ns():020d}-{uuid.uuid4().hex[:8]}"
+
+
+def read_state(db_dir):
+    """
+    The CURRENT pointer of db_dir as {"version", "base", "segments",
+    "tombstones"}, or None.
+    """
+    try:
+        with open(os.path.join(db_dir, CURRENT_FILE), encoding="utf-8") as f:
+            content = f.read().strip()
+    except OSError:
+        return None
+    if not content:
+        return None
+    if not content.startswith("{"):
+        # Pointer written before delta segments existed: just a base version
+        return {"version": content, "base": content, "segments": [], "tombstones": []}
+    state = json.loads(content)
+    state.setdefault("tombstones", [])
+    return state
+
+
+# Fallback for platforms without fcntl
+_local_state_lock = threading.Lock()
+
+
+@contextmanager
+def state_lock(db_dir):
+    """
+    Exclusive lock on the CURRENT pointer of db_dir, shared by all processes
+    and threads. Writers hold it from read_state to write_state so that no
+    publish is lost; it is never held while an index is saved.
+    """
+    os.makedirs(db_dir, exist_ok=True)
+    if fcntl is None:
+        with _local_state_lock:
+            yield
+        return
+    with open(os.path.join(db_dir, LOCK_FILE), "a") as f:
+        fcntl.flock(f, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
+
+
+def write_state(db_dir, base, segments, tombstones=()):
+    """
+    Atomically points db_dir at `base` + `segments` - `tombstones`. Returns
+    the new version. Writers that derive the new state from the current one
+    hold state_lock around both.
+    """
+    version = new_version()
+    pointer = os.path.join(db_dir, CURRENT_FILE)
+    tmp_pointer = f"{pointer}.{os.getpid()}.tmp"
+    with open(tmp_pointer, "w", encoding="utf-8") as f:
+        json.dump({"version": version, "base": base, "segments": list(segments),
+                   "tombstones": list(tombstones)}, f)
+    os.replace(tmp_pointer, pointer)
+    return version
+
+
+def current_version(db_dir):
+    """
+    Version named by the CURRENT pointer of db_dir, or None.
+    """
+    state = read_state(db_dir)
+    return state["version"] if state else None
+
+
+def snapshot_path(db_dir, version):
+    return os.path.join(db_dir, VERSIONS_DIR, version)
+
+
+def segment_path(db_dir, name):
+    return os.path.join(db_dir, SEGMENTS_DIR, name)
+
+
+def tombstone_path(db_dir, name):
+    return os.path.join(db_dir, TOMBSTONES_DIR, f"{name}.json")
+
+
+def current_path(db_dir):
+    """
+    Directory holding the live base index files of db_dir, or None if nothing
+    is indexed. Indexes saved before snapshots existed live in db_dir itself.
+    """
+    state = read_state(db_dir)
+    if state is not None:
+        return snapshot_path(db_dir, state["base"])
+    if os.path.exists(os.path.join(db_dir, "index.faiss")):
+        return db_dir
+    return None
+
+
+def _save(vector_store, parent, name):
+    # Write in a private directory, then rename it into place
+    os.makedirs(parent, exist_ok=True)
+    tmp_dir = os.path.join(parent, f".{name}.tmp")
+    os.makedirs(tmp_dir)
+    save_store(vector_store, tmp_dir)
+    os.replace(tmp_dir, os.path.join(parent, name))
+
+
+def _load(path, embeddings):
+    if has_columnar_docstore(path):
+        return load_store(path, embeddings)
+    # Written by FAISS.save_local before the columnar docstore existed
+    return FAISS.load_local(path, embeddings, allow_dangerous_deserialization=True)
+
+
+def load_parts(db_dir, embeddings, loaded=None):
+    """
+    Loads the current base store and delta segments of db_dir. Returns
+    (base, segments, state); base is None if nothing is indexed yet.
+    `loaded` maps paths to stores a reader already holds; those parts are
+    reused instead of read again, and the map is updated.
+    """
+    loaded = {} if loaded is None else loaded
+    for attempt in range(LOAD_RETRIES):
+        state = read_state(db_dir)
+        path = current_path(db_dir)
+        if path is None:
+            return None, [], None
+        paths = [path] + [segment_path(db_dir, name) for name in (state or {}).get("segments", [])]
+        try:
+            stores = [loaded[p] if p in loaded else _load(p, embeddings) for p in paths]
+        except (OSError, RuntimeError):
+            # Parts may have been collected after newer publishes: follow the pointer again
+            if attempt == LOAD_RETRIES - 1 or read_state(db_dir) == state:
+                raise
+            continue
+        # Only keep what the current state uses
+        loaded.clear()
+        loaded.update(zip(paths, stores))
+        return stores[0], stores[1:], state
+    return None, [], None
+
+
+def load_tombstones(db_dir, state, loaded=None):
+    """
+    Docstore ids deleted by the tombstones of `state`, as a set. `loaded`
+    maps tombstone names to id lists already read (files never change) and
+    is updated like in load_parts.
+    """
+    loaded = {} if loaded is None else loaded
+    names = state["tombstones"] if state else []
+    for name in names:
+        if name not in loaded:
+            with open(tombstone_path(db_dir, name), encoding="utf-8") as f:
+                loaded[name] = json.load(f)["ids"]
+    for name in set(loaded) - set(names):
+        del loaded[name]
+    return {doc_id for name in names for doc_id in loaded[name]}
+
+
+def _fold(db_dir, base, segments, state):
+    # One FAISS store: segments merged into `base`, tombstoned chunks removed
+    for segment in segments:
+        base = merge_stores(base, segment)
+    deleted = load_tombstones(db_dir, state)
+    if base is not None and deleted:
+        present = [doc_id for doc_id in base.index_to_docstore_id.values() if doc_id in deleted]
+        if present:
+            base = delete_from_store(base, present)
+    return base
+
+
+def load_snapshot(db_dir, embeddings):
+    """
+    Loads the current index of db_dir as one FAISS store (delta segments
+    folded into a copy of the base, deleted documents removed), for writers.
+    Returns (vector_store, version), or (None, None) if nothing is indexed yet.
+    """
+    base, segments, state = load_parts(db_dir, embeddings)
+    return _fold(db_dir, base, segments, state), state["version"] if state else None
+
+
+def write_snapshot(vector_store, db_dir, keep=INDEX_KEEP_VERSIONS):
+    """
+    Saves vector_store as a new immutable base snapshot of db_dir, then flips
+    the CURRENT pointer to it (without segments) atomically. Readers see
+    either the previous or the new index, never a partly written one.
+    Returns the new version.
+    """
+    base = new_version()
+    _save(vector_store, os.path.join(db_dir, VERSIONS_DIR), base)
+    with state_lock(db_dir):
+        version = write_state(db_dir, base, [])
+    _collect_quietly(db_dir, keep)
+    return version
+
+
+def _migrate_legacy(db_dir, embeddings):
+    # An index saved in db_dir before snapshots existed becomes the first base
+    # snapshot. It is unpickled this once and saved with the columnar
+    # docstore, so later loads need no pickle; the originals stay (see
+    # collect_snapshots). Callers hold state_lock. Returns the new state, or
+    # None if there is no such index.
+    if not os.path.exists(os.path.join(db_dir, "index.faiss")):
+        return None
+    base = new_version()
+    _save(_load(db_dir, embeddings), os.path.join(db_dir, VERSIONS_DIR), base)
+    write_state(db_dir, base, [])
+    print(f"📦 Moved the index in {db_dir} into snapshot {base}")
+    return read_state(db_dir)
+
+
+def write_segment(vector_store, db_dir):
+    """
+    Publishes vector_store (the chunks of one upload) as a delta segment on
+    top of the current index of db_dir, writing only its own files. The
+    first write to an empty db_dir becomes the base instead. Returns the
+    name of the new segment (or base snapshot).
+    """
+    name = new_version()
+    _save(vector_store, os.path.join(db_dir, SEGMENTS_DIR), name)
+    # Segments other writers published while this one was saved are kept
+    with state_lock(db_dir):
+        state = read_state(db_dir) or _migrate_legacy(db_dir, vector_store.embedding_function)
+        if state is None:
+            os.makedirs(os.path.join(db_dir, VERSIONS_DIR), exist_ok=True)
+            os.replace(segment_path(db_dir, name), snapshot_path(db_dir, name))
+            write_state(db_dir, name, [])
+        else:
+            write_state(db_dir, state["base"], state["segments"] + [name], state["tombstones"])
+    return name
+
+
+def write_tombstone(db_dir, ids, source=None, embeddings=None):
+    """
+    Marks the chunks with docstore `ids` (one document's) as deleted in the
+    current index of db_dir, writing only their ids. Readers filter them out
+    of searches; compact_segments removes them from the index. `embeddings`
+    is only used to migrate an index saved before snapshots existed. Returns
+    the new version, or None if nothing is indexed.
+    """
+    if read_state(db_dir) is None and not os.path.exists(os.path.join(db_dir, "index.faiss")):
+        return None
+    name = new_version()
+    path = tombstone_path(db_dir, name)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump({"source": source, "ids": list(ids)}, f)
+    os.replace(tmp_path, path)
+    with state_lock(db_dir):
+        state = read_state(db_dir) or _migrate_legacy(db_dir, embeddings)
+        if state is None:
+            os.remove(path)
+            return None
+        return write_state(db_dir, state["base"], state["segments"], state["tombstones"] + [name])
+
+
+def should_compact(db_dir, max_segments=None):
+    """
+    Whether db_dir has piled up enough delta segments or deletions to
+    compact them.
+    """
+    if max_segments is None:
+        max_segments = INDEX_COMPACT_SEGMENTS
+    state = read_state(db_dir)
+    if state is None:
+        return False
+    return max(len(state["segments"]), len(state["tombstones"])) >= max(max_segments, 1)
+
+
+def compact_segments(db_dir, embeddings, lock=None, keep=INDEX_KEEP_VERSIONS):
+    """
+    Folds the current delta segments of db_dir into a new base snapshot and
+    drops the chunks of deleted documents from it. The slow part (load,
+    merge, save) runs without `lock` (a lock of the caller's writers) or
+    state_lock; only the pointer flip takes them, and segments and deletions
+    published meanwhile are kept on top of the new base. Returns the new
+    version, or None if there was nothing to do.
+    """
+    base, segments, state = load_parts(db_dir, embeddings)
+    if not segments and not (state and state["tombstones"]):
+        return None
+    base = _fold(db_dir, base, segments, state)
+    new_base = new_version()
+    _save(base, os.path.join(db_dir, VERSIONS_DIR), new_base)
+
+    if lock is not None:
+        lock.acquire()
+    try:
+        with state_lock(db_dir):
+            latest = read_state(db_dir)
+            if latest is None or latest["base"] != state["base"]:
+                # Someone else replaced the base: this merge is stale
+                shutil.rmtree(snapshot_path(db_dir, new_base), ignore_errors=True)
+                return None
+            newer = [name for name in latest["segments"] if name not in state["segments"]]
+            # Deletions published meanwhile may still name chunks of the new base
+            deletions = [name for name in latest["tombstones"] if name not in state["tombstones"]]
+            version = write_state(db_dir, new_base, newer, deletions)
+    finally:
+        if lock is not None:
+            lock.release()
+    print(f"🗜️ Compacted {len(segments)} segments and {len(state['tombstones'])} deletions into {new_base}")
+    _collect_quietly(db_dir, keep)
+    return version
+
+
+def _collect_quietly(db_dir, keep):
+    try:
+        collect_snapshots(db_dir, keep)
+    except OSError as e:
+        print(f"⚠️ Could not remove old index snapshots: {e}")
+
+
+def collect_snapshots(db_dir, keep=INDEX_KEEP_VERSIONS):
+    """
+    Deletes all but the current and `keep` newest other base snapshots of
+    db_dir, segments and tombstones no longer referenced, and leftovers of
+    crashed writers. Returns the removed snapshot, segment and tombstone names.
+    """
+    state = read_state(db_dir)
+    now = time.time()
+    removed = []
+
+    versions_dir = os.path.join(db_dir, VERSIONS_DIR)
+    if os.path.isdir(versions_dir):
+        versions = []
+        for name in _list_live(versions_dir, now):
+            if state is None or name != state["base"]:
+                versions.append(name)
+        # Newest first; readers in other processes may still be loading these
+        for name in sorted(versions, reverse=True)[keep:]:
+            shutil.rmtree(os.path.join(versions_dir, name), ignore_errors=True)
+            removed.append(name)
+
+    segments_dir = os.path.join(db_dir, SEGMENTS_DIR)
+    if os.path.isdir(segments_dir):
+        referenced = set(state["segments"]) if state else set()
+        for name in _list_live(segments_dir, now):
+            path = os.path.join(segments_dir, name)
+            # A segment not referenced yet may be about to be published
+            if name not in referenced and now - os.path.getmtime(path) > SEGMENT_GRACE_SECONDS:
+                shutil.rmtree(path, ignore_errors=True)
+                removed.append(name)
+
+    tombstones_dir = os.path.join(db_dir, TOMBSTONES_DIR)
+    if os.path.isdir(tombstones_dir):
+        referenced = set(state["tombstones"]) if state else set()
+        for filename in os.listdir(tombstones_dir):
+            path = os.path.join(tombstones_dir, filename)
+            name = filename[:-len(".json")]
+            # Same grace as segments: a reader may still be loading an older state
+            if filename.endswith(".json") and name not in referenced \
+                    and now - os.path.getmtime(path) > SEGMENT_GRACE_SECONDS:
+                os.remove(path)
+                removed.append(name)
+            elif filename.endswith(".tmp") and now - os.path.getmtime(path) > STALE_TMP_SECONDS:
+                os.remove(path)
+    # Index files of the pre-snapshot layout in db_dir itself are left alone:
+    # once CURRENT exists they are never read again, and they may be tracked
+    # files of a checkout
+    return removed
+
+
+def _list_live(directory, now):
+    # Published entries of a directory; stale temp dirs are removed on the way
+    names = []
+    for name in os.listdir(directory):
+        path = os.path.join(directory, name)
+        if name.startswith("."):
+            if name.endswith(".tmp") and now - os.path.getmtime(path) > STALE_TMP_SECONDS:
+                shutil.rmtree(path, ignore_errors=True)
+            continue
+        names.append(name)
+    return names
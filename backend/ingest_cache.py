@@ -0,0 +1,178 @@
+import hashlib
+import json
+import os
+import threading
+import numpy as np
+from langchain_core.documents import Document
+from langchain_community.vectorstores import FAISS
+from .ann_index import all_vectors, tune_store_index
+
+# Configuration
+CACHE_DIR = os.getenv("INGEST_CACHE_DIR", ".ingest_cache")
+CACHE_MAX_MB = int(os.getenv("INGEST_CACHE_MAX_MB", 512))
+# Read size when streaming uploads to disk
+UPLOAD_BLOCK_SIZE = 1024 * 1024
+
+
+def file_digest(file_stream, block_size=UPLOAD_BLOCK_SIZE):
+    """
+    Returns the SHA-256 hex digest of a binary stream, read in blocks.
+    The stream is rewound so it can be processed afterwards.
+    """
+    file_stream.seek(0)
+    digest = hashlib.sha256()
+    for block in iter(lambda: file_stream.read(block_size), b""):
+        digest.update(block)
+    file_stream.seek(0)
+    return digest.hexdigest()
+
+
+async def spool_upload(upload, dest_path, block_size=UPLOAD_BLOCK_SIZE):
+    """
+    Streams an UploadFile to `dest_path` in fixed-size blocks, hashing as it
+    goes, so the upload is never held in memory in full.
+    Returns (bytes_written, SHA-256 hex digest).
+    """
+    digest = hashlib.sha256()
+    size = 0
+    with open(dest_path, "wb") as out:
+        while True:
+            block = await upload.read(block_size)
+            if not block:
+                break
+            digest.update(block)
+            out.write(block)
+            size += len(block)
+    return size, digest.hexdigest()
+
+
+def add_to_store(vector_store, documents, vectors, embeddings, ids=None):
+    """
+    Adds pre-computed vectors to a FAISS store (creating it if needed),
+    so no embedding model call is made. The index is rebuilt as another
+    type (flat/HNSW/IVF) once the corpus outgrows it. Returns the store.
+    """
+    text_embeddings = list(zip([doc.page_content for doc in documents], vectors))
+    metadatas = [doc.metadata for doc in documents]
+    if vector_store is None:
+        vector_store = FAISS.from_embeddings(text_embeddings, embeddings, metadatas=metadatas, ids=ids)
+    else:
+        vector_store.add_embeddings(text_embeddings, metadatas=metadatas, ids=ids)
+    tune_store_index(vector_store)
+    return vector_store
+
+
+def merge_stores(vector_store, other):
+    """
+    Adds every vector of the FAISS store `other` (with its documents and
+    docstore ids) to `vector_store`; returns `other` itself if there is no
+    `vector_store` yet. Unlike FAISS.merge_from this works for every index
+    type.
+    """
+    if vector_store is None:
+        return other
+    ids, documents, vectors = store_contents(other)
+    return add_to_store(vector_store, documents, vectors, vector_store.embeddings, ids=ids)
+
+
+def store_contents(vector_store):
+    """
+    (docstore ids, documents, vectors) of every chunk of a FAISS store, in
+    index order. The vectors are read back from the index as one float32
+    array, not as lists of Python floats.
+    """
+    ids = [vector_store.index_to_docstore_id[i] for i in range(vector_store.index.ntotal)]
+    documents = [vector_store.docstore.search(doc_id) for doc_id in ids]
+    return ids, documents, all_vectors(vector_store.index)
+
+
+class IngestCache:
+    """
+    Content-addressed on-disk cache of extracted chunks and their vectors.
+    Entries are keyed by the SHA-256 of the uploaded PDF and the embedding
+    model (see EmbeddingRegistry.cache_name) that produced the vectors, so
+    re-uploading an identical file skips extraction, scrubbing and embedding
+    entirely, and vectors of different models or backends never mix.
+    Total size is capped; the least recently used entries are evicted first.
+    """
+    def __init__(self, cache_dir=CACHE_DIR, max_bytes=CACHE_MAX_MB * 1024 * 1024):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+
+    def _path(self, digest, model):
+        key = hashlib.sha256(f"{model}\n{digest}".encode("utf-8")).hexdigest()
+        return os.path.join(self.cache_dir, f"{key}.npz")
+
+    def get(self, digest, model, source=None):
+        """
+        Returns (documents, vectors) for an upload cached with embedding
+        model `model`, or None on a miss. If `source` is given it replaces
+        the cached chunks' source metadata, since the same bytes may be
+        re-uploaded under a different filename.
+        """
+        path = self._path(digest, model)
+        with self._lock:
+            if not os.path.exists(path):
+                return None
+            try:
+                with np.load(path, allow_pickle=False) as entry:
+                    vectors = entry["vectors"]
+                    chunks = json.loads(str(entry["chunks"]))
+                # Mark as recently used for LRU eviction
+                os.utime(path)
+            except Exception as e:
+                print(f"⚠️ Dropping unreadable ingest cache entry {digest} ({model}): {e}")
+                os.remove(path)
+                return None
+
+        documents = []
+        for chunk in chunks:
+            metadata = chunk["metadata"]
+            if source is not None:
+                metadata["source"] = source
+            documents.append(Document(page_content=chunk["page_content"], metadata=metadata))
+        return documents, vectors
+
+    def put(self, digest, model, documents, vectors):
+        """
+        Stores the chunks and vectors (embedded with `model`) for an upload,
+        then evicts old entries until the cache is back under its size cap.
+        """
+        chunks = [{"page_content": doc.page_content, "metadata": doc.metadata} for doc in documents]
+        path = self._path(digest, model)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with self._lock:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            with open(tmp_path, "wb") as f:
+                np.savez(
+                    f,
+                    vectors=np.asarray(vectors, dtype=np.float32),
+                    chunks=np.array(json.dumps(chunks)),
+                )
+            os.replace(tmp_path, path)
+            self._evict()
+
+    def put_store(self, digest, model, vector_store):
+        """
+        Stores the chunks and vectors of an upload from the FAISS store they
+        were indexed into, so ingest never keeps its own copy of them.
+        """
+        _, documents, vectors = store_contents(vector_store)
+        self.put(digest, model, documents, vectors)
+
+    def _evict(self):
+        entries = []
+        for name in os.listdir(self.cache_dir):
+            if not name.endswith(".npz"):
+                continue
+            stat = os.stat(os.path.join(self.cache_dir, name))
+            entries.append((stat.st_mtime, stat.st_size, name))
+
+        total = sum(size for _, size, _ in entries)
+        # Oldest first; never evict the entry that was just written
+        for _, size, name in sorted(entries)[:-1]:
+            if total <= self.max_bytes:
+                break
+            os.remove(os.path.join(self.cache_dir, name))
+            total -= size
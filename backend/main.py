@@ -1,11 +1,26 @@
-from fastapi import FastAPI, UploadFile, File, HTTPException
+from fastapi import FastAPI, UploadFile, File, Form, HTTPException
 from pydantic import BaseModel
+from typing import List, Optional
 import uvicorn
 import shutil
 import os
-import io
+import tempfile
+import threading
+from contextlib import asynccontextmanager
 
-app = FastAPI(title="Lumina API Brain")
+
+@asynccontextmanager
+async def lifespan(app):
+    # Load the embedding model once, before the first upload/chat request
+    if IMPORTS_OK and EMBEDDING_WARMUP:
+        try:
+            embedding_registry.warm_up(EMBEDDING_MODEL)
+        except Exception as e:
+            print(f"⚠️ Could not warm up embedding model: {e}")
+    yield
+
+
+app = FastAPI(title="Lumina API Brain", lifespan=lifespan)
 
 # Add health check immediately
 @app.get("/")
@@ -25,10 +40,13 @@ app.add_middleware(
 
 # Try to import backend modules
 try:
-    from .pdf_processor import PDFProcessor
+    from .pdf_processor import PDFProcessor, batched, map_pdf
+    from .ingest_cache import IngestCache, add_to_store, spool_upload, store_contents
     from .bot import chat_with_bot, DB_DIR, EMBEDDING_MODEL
-    from langchain_community.vectorstores import FAISS
-    from langchain_community.embeddings import HuggingFaceEmbeddings
+    from .embedding_registry import EMBEDDING_WARMUP, embedding_registry, get_embeddings
+    from .query_cache import query_cache
+    from .index_snapshots import compact_segments, load_snapshot, should_compact, write_segment
+    from .session_indexes import SessionIndexes
     IMPORTS_OK = True
 except Exception as e:
     print(f"⚠️ Warning: Could not import backend modules: {e}")
@@ -39,78 +57,167 @@ except Exception as e:
     EMBEDDING_MODEL = "all-MiniLM-L6-v2"
 
 
-# Global Vector Store (In-Memory for now, or loaded from disk)
-vector_store = None
+# The default session keeps using the index saved in DB_DIR; other sessions are in memory only
+DEFAULT_SESSION = "default"
+
+# Per-session vector stores, expired when idle and evicted under a memory cap
+sessions = SessionIndexes() if IMPORTS_OK else None
+
+# Chunks + vectors of previously seen uploads, keyed by file hash
+ingest_cache = IngestCache() if IMPORTS_OK else None
+
+# Serializes segment writes with the pointer flip of a background compaction
+index_lock = threading.Lock()
+# Held while a compaction runs, so only one runs at a time
+compaction_lock = threading.Lock()
+
+
+def compact_in_background(embeddings):
+    """
+    Folds the delta segments on disk into a new base snapshot in a thread.
+    """
+    if not compaction_lock.acquire(blocking=False):
+        return
+
+    def run():
+        try:
+            compact_segments(DB_DIR, embeddings, lock=index_lock)
+        except Exception as e:
+            print(f"⚠️ Could not compact index segments: {e}")
+        finally:
+            compaction_lock.release()
+
+    threading.Thread(target=run, name="index-compact", daemon=True).start()
+
+
+def session_store(session_id):
+    """
+    The vector store of `session_id`, or None. The default session is
+    loaded from DB_DIR when it is not in memory (at first use or after it
+    expired).
+    """
+    if sessions is None:
+        return None
+    vector_store = sessions.get(session_id)
+    if vector_store is None and session_id == DEFAULT_SESSION and os.path.exists(DB_DIR):
+        try:
+            vector_store = load_snapshot(DB_DIR, get_embeddings(EMBEDDING_MODEL))[0]
+        except Exception as e:
+            print(f"⚠️ Could not load vector store: {e}")
+        if vector_store is not None:
+            sessions.put(session_id, vector_store)
+            print("✅ Loaded existing Vector Store.")
+    return vector_store
 
-# Initialize Vector Store if exists (only if imports worked)
-if IMPORTS_OK and os.path.exists(DB_DIR):
-    try:
-        embeddings = HuggingFaceEmbeddings(model_name=EMBEDDING_MODEL)
-        vector_store = FAISS.load_local(DB_DIR, embeddings, allow_dangerous_deserialization=True)
-        print("✅ Loaded existing Vector Store.")
-    except Exception as e:
-        print(f"⚠️ Could not load vector store: {e}")
 
 class ChatRequest(BaseModel):
     message: str
     session_id: str = "default"
+    # Only search these documents (filenames) and/or this inclusive page range (first page is 1)
+    sources: Optional[List[str]] = None
+    page_from: Optional[int] = None
+    page_to: Optional[int] = None
 
 @app.get("/")
 def health_check():
     return {"status": "Lumina Brain is active"}
 
+@app.get("/diagnostics")
+def diagnostics():
+    """
+    Load time and memory use of the embedding models in this process, and
+    query cache counters.
+    """
+    if not IMPORTS_OK:
+        raise HTTPException(status_code=503, detail="Backend modules not loaded.")
+    return {"embeddings": embedding_registry.stats(), "query_cache": query_cache.stats(), "sessions": sessions.stats()}
+
 @app.post("/upload")
-async def upload_pdf(file: UploadFile = File(...)):
-    global vector_store
+async def upload_pdf(file: UploadFile = File(...), session_id: str = Form(DEFAULT_SESSION)):
+    upload_path = None
     try:
         print(f"📄 Receiving file: {file.filename}")
         print(f"📊 Content type: {file.content_type}")
         
-        # Read file into bytes
-        content = await file.read()
-        print(f"✅ File read: {len(content)} bytes")
-        file_stream = io.BytesIO(content)
+        # Stream upload to a temp file in fixed-size blocks, hashing as we go
+        fd, upload_path = tempfile.mkstemp(suffix=".pdf")
+        os.close(fd)
+        size, digest = await spool_upload(file, upload_path)
+        print(f"✅ File read: {size} bytes")
+        embeddings = get_embeddings(EMBEDDING_MODEL)
+        # Vectors are only reused from the same model and backend
+        model = embedding_registry.cache_name(EMBEDDING_MODEL)
         
-        # Process PDF
-        processor = PDFProcessor()
-        print(f"🔄 Processing PDF...")
-        chunks = processor.process_pdf(file_stream, file.filename)
-        print(f"✅ Extracted {len(chunks)} chunks")
+        cached = ingest_cache.get(digest, model, source=file.filename)
+        if cached is not None:
+            # Identical file seen before: reuse its chunks and vectors
+            documents, vectors = cached
+            new_vs = add_to_store(None, documents, vectors, embeddings)
+            print(f"⚡ Ingest cache hit ({digest[:12]}): {len(documents)} chunks")
+        else:
+            # Process PDF and embed in bounded batches as pages are extracted;
+            # the chunks and vectors are only kept in the new store
+            processor = PDFProcessor()
+            print(f"🔄 Processing PDF and creating embeddings...")
+            new_vs = None
+            # Memory-mapped view: the PDF is never copied into process memory
+            with map_pdf(upload_path) as pdf_view:
+                for batch in batched(processor.iter_chunks(pdf_view, file.filename)):
+                    batch_vectors = embeddings.embed_documents([chunk.page_content for chunk in batch])
+                    new_vs = add_to_store(new_vs, batch, batch_vectors, embeddings)
         
-        if not chunks:
+        if new_vs is None:
             raise HTTPException(status_code=400, detail="No text found in PDF.")
+        chunk_count = new_vs.index.ntotal
+        print(f"✅ Extracted {chunk_count} chunks")
+
+        if cached is None:
+            try:
+                ingest_cache.put_store(digest, model, new_vs)
+            except Exception as e:
+                print(f"⚠️ Could not write ingest cache: {e}")
             
-        # Create/Update Vector Store
-        print(f"🧠 Creating embeddings...")
-        embeddings = HuggingFaceEmbeddings(model_name=EMBEDDING_MODEL)
-        
-        if vector_store is None:
-            vector_store = FAISS.from_documents(chunks, embeddings)
-            print(f"✅ Created new vector store")
+        # Create/Update the session's Vector Store
+        if session_store(session_id) is None:
+            sessions.put(session_id, new_vs)
+            print(f"✅ Created new vector store for session {session_id}")
         else:
-            new_vs = FAISS.from_documents(chunks, embeddings)
-            vector_store.merge_from(new_vs)
-            print(f"✅ Merged into existing vector store")
-            
-        # Save to disk
-        os.makedirs(DB_DIR, exist_ok=True)
-        vector_store.save_local(DB_DIR)
-        print(f"💾 Saved to {DB_DIR}")
+            # Re-add the vectors rather than merge_from, which only flat indexes support
+            _, documents, vectors = store_contents(new_vs)
+            sessions.add(session_id, documents, vectors, embeddings)
+            print(f"✅ Merged into vector store of session {session_id}")
+
+        if session_id == DEFAULT_SESSION:
+            # Save only the new chunks, as a delta segment on top of the saved index
+            with index_lock:
+                segment = write_segment(new_vs, DB_DIR)
+            print(f"💾 Saved to {DB_DIR} (segment {segment})")
+            if should_compact(DB_DIR):
+                compact_in_background(embeddings)
         
-        return {"message": f"Successfully uploaded {file.filename}", "chunks": len(chunks)}
+        return {"message": f"Successfully uploaded {file.filename}", "chunks": chunk_count}
     except Exception as e:
         print(f"❌ Error: {str(e)}")
         import traceback
         traceback.print_exc()
         raise HTTPException(status_code=500, detail=str(e))
+    finally:
+        if upload_path and os.path.exists(upload_path):
+            os.remove(upload_path)
 
 @app.post("/chat")
 async def chat(request: ChatRequest):
-    global vector_store
+    vector_store = session_store(request.session_id)
     if not vector_store:
         raise HTTPException(status_code=400, detail="Brain is empty. Send a PDF first.")
     
-    response = chat_with_bot(request.message, vector_store)
+    pages = None
+    if request.page_from is not None or request.page_to is not None:
+        if request.page_from is not None and request.page_to is not None and request.page_from > request.page_to:
+            raise HTTPException(status_code=400, detail="page_from must not be after page_to.")
+        pages = (request.page_from, request.page_to)
+
+    response = chat_with_bot(request.message, vector_store, request.sources, pages)
     
     # response is normally dict {'answer': ..., 'context': ...} or string error
     if isinstance(response, str):
@@ -119,12 +226,11 @@ async def chat(request: ChatRequest):
     return {"answer": response.get('answer', 'No answer generated.'), "citations": response.get('context', [])}
 
 @app.delete("/session")
-async def delete_session():
-    global vector_store
+async def delete_session(session_id: str = DEFAULT_SESSION):
     try:
-        vector_store = None
-        # Optionally delete from disk
-        if os.path.exists(DB_DIR):
+        sessions.delete(session_id)
+        # The default session is also saved on disk
+        if session_id == DEFAULT_SESSION and os.path.exists(DB_DIR):
             shutil.rmtree(DB_DIR)
         return {"message": "Session cleared"}
     except Exception as e:
@@ -0,0 +1,129 @@
+import os
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+# Configuration
+# "hf" (sentence-transformers on torch) or "onnx" (int8 ONNX graph, falls back to "hf")
+EMBEDDING_BACKEND = os.getenv("EMBEDDING_BACKEND", "hf").lower()
+# Directory holding model.onnx + tokenizer.json, as written by export_quantized()
+ONNX_MODEL_DIR = os.getenv("ONNX_MODEL_DIR", "./onnx_model")
+ONNX_MODEL_FILE = "model.onnx"
+TOKENIZER_FILE = "tokenizer.json"
+# all-MiniLM-L6-v2 truncates inputs at 256 word pieces
+MAX_SEQ_LENGTH = 256
+ONNX_BATCH_SIZE = 32
+
+
+def mean_pool(token_embeddings, attention_mask):
+    """
+    Sentence vectors as sentence-transformers computes them for MiniLM:
+    mean over non-padding tokens, then L2-normalized.
+    """
+    mask = attention_mask[..., None].astype(np.float32)
+    summed = (token_embeddings * mask).sum(axis=1)
+    pooled = summed / np.clip(mask.sum(axis=1), 1e-9, None)
+    norms = np.linalg.norm(pooled, axis=1, keepdims=True)
+    return pooled / np.clip(norms, 1e-12, None)
+
+
+class OnnxEmbeddings(Embeddings):
+    """
+    CPU embeddings from an int8-quantized ONNX export of a sentence-transformers
+    model, loaded from local files. No torch import, so cold start is fast.
+    Requires the `onnxruntime` and `tokenizers` packages.
+    """
+    def __init__(self, model_dir=ONNX_MODEL_DIR, model_name=None, batch_size=ONNX_BATCH_SIZE, threads=None):
+        import onnxruntime
+        from tokenizers import Tokenizer
+
+        model_path = os.path.join(model_dir, ONNX_MODEL_FILE)
+        tokenizer_path = os.path.join(model_dir, TOKENIZER_FILE)
+        for path in (model_path, tokenizer_path):
+            if not os.path.exists(path):
+                raise FileNotFoundError(f"ONNX model file not found: {path}")
+
+        options = onnxruntime.SessionOptions()
+        if threads:
+            options.intra_op_num_threads = threads
+        self.session = onnxruntime.InferenceSession(model_path, options, providers=["CPUExecutionProvider"])
+        self.input_names = {i.name for i in self.session.get_inputs()}
+
+        self.tokenizer = Tokenizer.from_file(tokenizer_path)
+        self.tokenizer.enable_truncation(max_length=MAX_SEQ_LENGTH)
+        self.tokenizer.enable_padding()
+        self.model_name = model_name or os.path.basename(os.path.normpath(model_dir))
+        self.batch_size = batch_size
+
+    def _encode(self, texts):
+        encodings = self.tokenizer.encode_batch(texts)
+        input_ids = np.array([e.ids for e in encodings], dtype=np.int64)
+        attention_mask = np.array([e.attention_mask for e in encodings], dtype=np.int64)
+        feeds = {"input_ids": input_ids, "attention_mask": attention_mask}
+        if "token_type_ids" in self.input_names:
+            feeds["token_type_ids"] = np.zeros_like(input_ids)
+        token_embeddings = self.session.run(None, feeds)[0]
+        return mean_pool(token_embeddings, attention_mask)
+
+    def embed_documents(self, texts):
+        # Same newline handling as HuggingFaceEmbeddings
+        texts = [text.replace("\n", " ") for text in texts]
+        vectors = []
+        for i in range(0, len(texts), self.batch_size):
+            vectors.extend(self._encode(texts[i:i + self.batch_size]).tolist())
+        return vectors
+
+    def embed_query(self, text):
+        return self.embed_documents([text])[0]
+
+
+def cosine_parity(embeddings, reference, texts):
+    """
+    Cosine similarity between `embeddings` and `reference` vectors of the
+    same texts. Returns {"min", "mean"}; MiniLM int8 should stay above ~0.98.
+    """
+    a = np.asarray(embeddings.embed_documents(texts), dtype=np.float32)
+    b = np.asarray(reference.embed_documents(texts), dtype=np.float32)
+    cosines = (a * b).sum(axis=1) / (np.linalg.norm(a, axis=1) * np.linalg.norm(b, axis=1))
+    return {"min": float(cosines.min()), "mean": float(cosines.mean())}
+
+
+def export_quantized(model_name, model_dir=ONNX_MODEL_DIR):
+    """
+    One-off export of a Hugging Face sentence-transformers model to
+    `model_dir`: fp32 ONNX graph, dynamically quantized to int8, plus its
+    tokenizer.json. Needs torch and transformers (only here, not at serve
+    time) and onnxruntime.
+    """
+    import torch
+    from onnxruntime.quantization import QuantType, quantize_dynamic
+    from transformers import AutoModel, AutoTokenizer
+
+    hub_name = model_name if "/" in model_name else f"sentence-transformers/{model_name}"
+    os.makedirs(model_dir, exist_ok=True)
+    tokenizer = AutoTokenizer.from_pretrained(hub_name)
+    model = AutoModel.from_pretrained(hub_name).eval()
+
+    sample = tokenizer(["export sample"], return_tensors="pt")
+    names = [name for name in ("input_ids", "attention_mask", "token_type_ids") if name in sample]
+    axes = {name: {0: "batch", 1: "sequence"} for name in names}
+    fp32_path = os.path.join(model_dir, "model.fp32.onnx")
+    torch.onnx.export(
+        model, tuple(sample[name] for name in names), fp32_path,
+        input_names=names, output_names=["last_hidden_state"],
+        dynamic_axes={**axes, "last_hidden_state": {0: "batch", 1: "sequence"}},
+        opset_version=14,
+    )
+    quantize_dynamic(fp32_path, os.path.join(model_dir, ONNX_MODEL_FILE), weight_type=QuantType.QInt8)
+    os.remove(fp32_path)
+    tokenizer.backend_tokenizer.save(os.path.join(model_dir, TOKENIZER_FILE))
+    return model_dir
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Export an int8-quantized ONNX embedding model.")
+    parser.add_argument("--model", default="all-MiniLM-L6-v2")
+    parser.add_argument("--out", default=ONNX_MODEL_DIR)
+    args = parser.parse_args()
+    print(f"Exported to {export_quantized(args.model, args.out)}")
@@ -1,66 +1,184 @@
+import io
+import mmap
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
 import pdfplumber
-from langchain_text_splitters import RecursiveCharacterTextSplitter
 from langchain_core.documents import Document
+from .chunker import OffsetTextSplitter
 from .security_layer import PIIScrubber
 
+# Parallel extraction settings
+# Number of worker processes used for page extraction (1 = always serial).
+# Serial by default: the API servers already run several threads per upload,
+# and each parallel upload would start its own pool on top of them.
+PDF_WORKERS = int(os.getenv("PDF_WORKERS", 1))
+# Documents with fewer pages than this are processed serially; spawning
+# workers costs more than it saves on small files.
+PARALLEL_MIN_PAGES = int(os.getenv("PDF_PARALLEL_MIN_PAGES", 32))
+# Number of chunks embedded and inserted into the vector store at a time
+CHUNK_BATCH_SIZE = int(os.getenv("INGEST_BATCH_SIZE", 64))
+
+
+def batched(iterable, size=CHUNK_BATCH_SIZE):
+    """
+    Groups an iterable into lists of at most `size` items, lazily.
+    """
+    batch = []
+    for item in iterable:
+        batch.append(item)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+class MappedPDF(mmap.mmap):
+    """
+    Read-only memory map of a PDF on disk. pdfplumber reads pages straight
+    from the OS page cache instead of an in-memory copy of the upload, and
+    `name` holds the file path so worker processes can reopen the same file.
+    """
+
+
+@contextmanager
+def map_pdf(path):
+    """
+    Opens the PDF at `path` as a MappedPDF for the duration of the block.
+    """
+    with open(path, "rb") as f:
+        view = MappedPDF(f.fileno(), 0, access=mmap.ACCESS_READ)
+    view.name = path
+    try:
+        yield view
+    finally:
+        view.close()
+
+
+def _extract_page_range(source, start, stop):
+    """
+    Worker entry point: extracts and scrubs pages [start, stop) of a PDF.
+    `source` is either the raw PDF bytes or a path on disk.
+    Returns a list of (page_number, clean_text) for pages that have text.
+    """
+    scrubber = PIIScrubber()
+    pdf_input = io.BytesIO(source) if isinstance(source, bytes) else source
+    results = []
+    with pdfplumber.open(pdf_input) as pdf:
+        for i in range(start, stop):
+            page = pdf.pages[i]
+            text = page.extract_text()
+            page.close()
+            if text:
+                results.append((i + 1, scrubber.scrub(text)))
+    return results
+
+
+def _page_ranges(page_count, parts):
+    """
+    Splits [0, page_count) into at most `parts` contiguous, ordered ranges.
+    """
+    parts = max(1, min(parts, page_count))
+    size, extra = divmod(page_count, parts)
+    ranges = []
+    start = 0
+    for part in range(parts):
+        stop = start + size + (1 if part < extra else 0)
+        ranges.append((start, stop))
+        start = stop
+    return ranges
+
+
 class PDFProcessor:
     """
     Handles PDF extraction and PII scrubbing in-memory.
+
+    Large documents are extracted in parallel across `workers` processes,
+    each handling a contiguous page range; the output is identical to the
+    serial path.
     """
-    def __init__(self):
+    def __init__(self, workers=None, parallel_min_pages=None):
         self.scrubber = PIIScrubber()
-        self.text_splitter = RecursiveCharacterTextSplitter(
-            chunk_size=1000,
-            chunk_overlap=200,
-            length_function=len,
-            add_start_index=True,
-        )
+        # Offset-based splitter: same 1000/200 windows as LangChain's
+        # RecursiveCharacterTextSplitter, without the intermediate strings
+        self.text_splitter = OffsetTextSplitter(chunk_size=1000, chunk_overlap=200)
+        self.workers = PDF_WORKERS if workers is None else workers
+        self.parallel_min_pages = PARALLEL_MIN_PAGES if parallel_min_pages is None else parallel_min_pages
 
     def process_pdf(self, file_stream, filename):
         """
         Reads a PDF file stream (BytesIO), extracts text/tables, scrubs PII, 
         and returns a list of LangChain Documents.
+
+        Single pass: every page is extracted, scrubbed and split exactly once,
+        and each chunk is tagged with the page it came from (for citations).
         """
-        raw_text = ""
-        
-        # 1. Extract Text using PDFPlumber (Better for tables)
-        with pdfplumber.open(file_stream) as pdf:
-            for i, page in enumerate(pdf.pages):
-                # Extract text
-                text = page.extract_text()
-                if text:
-                    # Scrub PII immediately
-                    clean_text = self.scrubber.scrub(text)
-                    raw_text += f"\n\n--- Page {i+1} ---\n{clean_text}"
-                
-                # Future: Extract tables and format as Markdown here
-                # tables = page.extract_tables() ...
-
-        if not raw_text.strip():
+        final_chunks = list(self.iter_chunks(file_stream, filename))
+
+        if not final_chunks:
             return None
 
-        # 2. Create Base Document
-        doc = Document(page_content=raw_text, metadata={"source": filename})
-
-        # 3. Split into Chunks
-        chunks = self.text_splitter.split_documents([doc])
-        
-        # Add page numbers to chunks (approximate, since we concatenated)
-        # For a truly accurate page number, we'd split page-by-page.
-        # Let's refine this to be page-based for better citations.
-        
-        final_chunks = []
+        return final_chunks
+
+    def iter_chunks(self, file_stream, filename):
+        """
+        Generator version of process_pdf: yields page-tagged chunks as soon as
+        each page is processed, so callers can embed and index in bounded
+        batches instead of holding the whole document in memory.
+        """
+        for page_number, clean_text in self._iter_clean_pages(file_stream):
+            yield from self._split_page(clean_text, filename, page_number)
+
+    def _iter_clean_pages(self, file_stream):
+        """
+        Yields (page_number, clean_text) in page order, for pages with text.
+        Picks the serial or the process-pool path based on page count.
+        """
+        # Extract Text using PDFPlumber (Better for tables)
         with pdfplumber.open(file_stream) as pdf:
-             for i, page in enumerate(pdf.pages):
-                text = page.extract_text()
-                if not text: continue
-                
-                clean_text = self.scrubber.scrub(text)
-                page_doc = Document(
-                    page_content=clean_text, 
-                    metadata={"source": filename, "page": i+1}
-                )
-                page_chunks = self.text_splitter.split_documents([page_doc])
-                final_chunks.extend(page_chunks)
+            page_count = len(pdf.pages)
+            if self.workers <= 1 or page_count < self.parallel_min_pages:
+                for i, page in enumerate(pdf.pages):
+                    text = page.extract_text()
+                    # Drop pdfplumber's per-page object cache so memory stays flat
+                    page.close()
+                    if text:
+                        yield i + 1, self.scrubber.scrub(text)
 
-        return final_chunks
+                    # Future: Extract tables and format as Markdown here
+                    # tables = page.extract_tables() ...
+                return
+
+        source = self._worker_source(file_stream)
+        ranges = _page_ranges(page_count, self.workers)
+        # Spawned, not forked: forking a process that runs threads can deadlock the children
+        with ProcessPoolExecutor(max_workers=len(ranges), mp_context=multiprocessing.get_context("spawn")) as executor:
+            futures = [executor.submit(_extract_page_range, source, start, stop) for start, stop in ranges]
+            # Consume in submission order so chunk order matches the serial path
+            for future in futures:
+                yield from future.result()
+
+    def _worker_source(self, file_stream):
+        """
+        Returns something a worker process can open: the file path when the
+        stream is backed by a file on disk, otherwise the raw bytes.
+        """
+        path = getattr(file_stream, "name", None)
+        if isinstance(path, str) and os.path.isfile(path):
+            return path
+        if isinstance(file_stream, io.BytesIO):
+            return file_stream.getvalue()
+        file_stream.seek(0)
+        return file_stream.read()
+
+    def _split_page(self, clean_text, filename, page_number):
+        """
+        Splits one scrubbed page of text into page-tagged chunks.
+        """
+        page_doc = Document(
+            page_content=clean_text,
+            metadata={"source": filename, "page": page_number}
+        )
+        return self.text_splitter.split_documents([page_doc])
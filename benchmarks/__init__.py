@@ -0,0 +1,4 @@
+"""
+Micro-benchmarks for LUMINA's ingest and retrieval hot paths.
+Run from the repository root, e.g. `python -m benchmarks.bench_chunker`.
+"""
@@ -0,0 +1,111 @@
+"""
+Benchmark: recall@k vs query latency of flat, HNSW and IVF indexes.
+
+    python -m benchmarks.bench_ann [--vectors 50000] [--k 5]
+    python -m benchmarks.bench_ann --index-dir ./faiss_index   # our own corpus
+
+Builds each index type over the same vectors (synthetic clustered vectors,
+or those of an existing snapshot), then sweeps the query-time parameter
+(efSearch for HNSW, nprobe for IVF) and reports build time, mean query
+latency and recall@k against exact (flat) search. Queries are held-out
+vectors perturbed with noise, like paraphrased questions.
+"""
+import argparse
+import time
+import faiss
+import numpy as np
+from ann_index import all_vectors, build_index, choose_index_kind, ivf_list_count
+
+HNSW_EF_SEARCH = [16, 32, 64, 128, 256]
+IVF_NPROBE = [1, 4, 16, 64]
+
+
+def make_vectors(count, dim, clusters=256, seed=0):
+    """
+    Clustered unit vectors, closer to sentence embeddings than uniform noise.
+    """
+    rng = np.random.default_rng(seed)
+    centers = rng.standard_normal((clusters, dim)).astype(np.float32)
+    vectors = centers[rng.integers(0, clusters, count)] + 0.35 * rng.standard_normal((count, dim)).astype(np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def load_vectors(index_dir):
+    from index_snapshots import current_path
+
+    path = current_path(index_dir)
+    if path is None:
+        raise SystemExit(f"No index found in {index_dir}")
+    return all_vectors(faiss.read_index(f"{path}/index.faiss")).astype(np.float32)
+
+
+def make_queries(vectors, count, seed=1):
+    rng = np.random.default_rng(seed)
+    picked = vectors[rng.integers(0, len(vectors), count)]
+    queries = picked + 0.1 * rng.standard_normal(picked.shape).astype(np.float32)
+    return queries / np.linalg.norm(queries, axis=1, keepdims=True)
+
+
+def search(index, queries, k):
+    start = time.perf_counter()
+    for query in queries:
+        # One query at a time, as the chat endpoint searches
+        _, ids = index.search(query[None, :], k)
+    latency = (time.perf_counter() - start) / len(queries)
+    _, ids = index.search(queries, k)
+    return ids, latency
+
+
+def recall(ids, truth):
+    k = truth.shape[1]
+    return float(np.mean([len(set(found) & set(expected)) / k for found, expected in zip(ids, truth)]))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--vectors", type=int, default=50000)
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--index-dir", help="Benchmark the vectors of an existing index instead.")
+    args = parser.parse_args()
+
+    if args.index_dir:
+        vectors = load_vectors(args.index_dir)
+    else:
+        vectors = make_vectors(args.vectors, args.dim)
+    queries = make_queries(vectors, args.queries)
+    print(f"{len(vectors)} vectors x {vectors.shape[1]} dims, {len(queries)} queries, "
+          f"auto choice: {choose_index_kind(len(vectors), kind='auto')}")
+
+    print(f"{'index':<8} {'param':<14} {'build(s)':>9} {'latency(ms)':>12} {f'recall@{args.k}':>10}")
+    results = {}
+    for kind in ("flat", "hnsw", "ivf"):
+        if kind == "ivf" and choose_index_kind(len(vectors), kind="ivf") != "ivf":
+            continue
+        start = time.perf_counter()
+        index = build_index(vectors, kind)
+        build = time.perf_counter() - start
+        typed = faiss.downcast_index(index)
+
+        if kind == "flat":
+            settings = [("exact", None)]
+        elif kind == "hnsw":
+            settings = [(f"efSearch={ef}", ef) for ef in HNSW_EF_SEARCH]
+        else:
+            settings = [(f"nprobe={n}", n) for n in IVF_NPROBE if n <= ivf_list_count(len(vectors))]
+
+        for label, value in settings:
+            if kind == "hnsw":
+                typed.hnsw.efSearch = value
+            elif kind == "ivf":
+                typed.nprobe = value
+            ids, latency = search(index, queries, args.k)
+            if kind == "flat":
+                results["truth"] = ids
+            print(f"{kind:<8} {label:<14} {build:>9.2f} {latency * 1000:>12.3f} "
+                  f"{recall(ids, results['truth']):>10.3f}")
+
+
+if __name__ == "__main__":
+    main()
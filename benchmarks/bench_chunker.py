@@ -0,0 +1,64 @@
+"""
+Benchmark: OffsetTextSplitter vs LangChain's RecursiveCharacterTextSplitter.
+
+    python -m benchmarks.bench_chunker [--pages 300] [--repeat 5]
+
+Splits synthetic contract-like pages with both splitters (1000/200), checks
+that they produce identical chunks, and reports time and pages/sec.
+"""
+import argparse
+import random
+import time
+from langchain_core.documents import Document
+from langchain_text_splitters import RecursiveCharacterTextSplitter
+from chunker import OffsetTextSplitter
+
+VOCAB = ["agreement", "party", "shall", "terms", "liability", "clause",
+         "section", "payment", "notice", "termination", "indemnify", "herein"]
+
+
+def make_pages(count, seed=0):
+    rng = random.Random(seed)
+    pages = []
+    for page in range(count):
+        lines = []
+        for line in range(60):
+            lines.append(f"{page + 1}.{line + 1} " + " ".join(rng.choice(VOCAB) for _ in range(rng.randint(6, 18))))
+            if line % 10 == 9:
+                lines.append("")
+        pages.append(Document(page_content="\n".join(lines), metadata={"source": "bench.pdf", "page": page + 1}))
+    return pages
+
+
+def best_of(splitter, pages, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        chunks = splitter.split_documents(pages)
+        best = min(best, time.perf_counter() - start)
+    return best, chunks
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--pages", type=int, default=300)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    pages = make_pages(args.pages)
+    langchain = RecursiveCharacterTextSplitter(chunk_size=1000, chunk_overlap=200, length_function=len, add_start_index=True)
+    offset = OffsetTextSplitter(chunk_size=1000, chunk_overlap=200)
+
+    ref_time, ref_chunks = best_of(langchain, pages, args.repeat)
+    new_time, new_chunks = best_of(offset, pages, args.repeat)
+
+    identical = [(c.page_content, c.metadata) for c in ref_chunks] == [(c.page_content, c.metadata) for c in new_chunks]
+    print(f"{args.pages} pages, {len(ref_chunks)} chunks, identical output: {identical}")
+    print(f"{'splitter':<32} {'best(s)':>9} {'pages/sec':>11}")
+    print(f"{'RecursiveCharacterTextSplitter':<32} {ref_time:>9.4f} {args.pages / ref_time:>11.0f}")
+    print(f"{'OffsetTextSplitter':<32} {new_time:>9.4f} {args.pages / new_time:>11.0f}")
+    print(f"speed-up: {ref_time / new_time:.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+"""
+Benchmark: columnar docstore vs FAISS.save_local's pickled index.pkl.
+
+    python -m benchmarks.bench_docstore [--chunks 50000] [--k 5]
+
+Saves the same synthetic contract chunks (random vectors) both ways, then
+opens each in a fresh process and reports size on disk, load time, resident
+memory added by the load and the latency of a top-k search.
+"""
+import argparse
+import multiprocessing
+import os
+import tempfile
+import time
+import numpy as np
+from langchain_core.embeddings import FakeEmbeddings
+from langchain_community.vectorstores import FAISS
+from benchmarks.bench_chunker import make_pages
+from chunker import OffsetTextSplitter
+from columnar_docstore import load_store, save_store
+from embedding_registry import _rss_bytes
+from ingest_cache import add_to_store
+
+DIM = 384
+
+
+def make_store(count):
+    splitter = OffsetTextSplitter(chunk_size=1000, chunk_overlap=200)
+    chunks = splitter.split_documents(make_pages(count // 6 + 1))[:count]
+    vectors = np.random.default_rng(0).standard_normal((len(chunks), DIM)).astype(np.float32).tolist()
+    return add_to_store(None, chunks, vectors, FakeEmbeddings(size=DIM))
+
+
+def dir_size(path):
+    return sum(os.path.getsize(os.path.join(path, name)) for name in os.listdir(path))
+
+
+def measure(kind, path, k, results):
+    # Runs in a fresh process so memory use is not shared with the builder
+    rss = _rss_bytes()
+    start = time.perf_counter()
+    if kind == "pickle":
+        store = FAISS.load_local(path, FakeEmbeddings(size=DIM), allow_dangerous_deserialization=True)
+    else:
+        store = load_store(path, FakeEmbeddings(size=DIM))
+    load = time.perf_counter() - start
+    loaded_rss = _rss_bytes()
+
+    queries = np.random.default_rng(1).standard_normal((50, DIM)).astype(np.float32)
+    start = time.perf_counter()
+    for query in queries:
+        store.similarity_search_by_vector(query.tolist(), k=k)
+    search = (time.perf_counter() - start) / len(queries)
+    results[kind] = (load, (loaded_rss - rss) if rss and loaded_rss else None, search)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--chunks", type=int, default=50000)
+    parser.add_argument("--k", type=int, default=5)
+    args = parser.parse_args()
+
+    store = make_store(args.chunks)
+    context = multiprocessing.get_context("spawn")
+    results = context.Manager().dict()
+    with tempfile.TemporaryDirectory() as tmp:
+        paths = {"pickle": os.path.join(tmp, "pickle"), "columnar": os.path.join(tmp, "columnar")}
+        store.save_local(paths["pickle"])
+        save_store(store, paths["columnar"])
+        del store
+
+        for kind, path in paths.items():
+            process = context.Process(target=measure, args=(kind, path, args.k, results))
+            process.start()
+            process.join()
+
+        print(f"{args.chunks} chunks, {DIM}-dim vectors (index.faiss is the same size for both)")
+        print(f"{'docstore':<10} {'disk(MB)':>9} {'load(s)':>8} {'+RSS(MB)':>9} {f'top-{args.k}(ms)':>10}")
+        for kind, path in paths.items():
+            load, rss, search = results[kind]
+            rss_mb = f"{rss / 2**20:>9.1f}" if rss is not None else f"{'n/a':>9}"
+            print(f"{kind:<10} {dir_size(path) / 2**20:>9.1f} {load:>8.3f} {rss_mb} {search * 1000:>10.3f}")
+
+
+if __name__ == "__main__":
+    main()
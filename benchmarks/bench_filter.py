@@ -0,0 +1,76 @@
+"""
+Benchmark: search scoped to one document vs the whole corpus.
+
+    python -m benchmarks.bench_filter [--documents 500] [--chunks 100] [--k 5]
+
+Saves a corpus of synthetic documents (random vectors, `--chunks` chunks
+each) with the columnar docstore, then times a top-k search over all of it,
+filtered_search restricted to one source (and to a page range), LangChain's
+post-filter (`filter=` with fetch_k) and, for reference, a store holding
+just that document.
+"""
+import argparse
+import tempfile
+import time
+import numpy as np
+from langchain_core.documents import Document
+from langchain_core.embeddings import FakeEmbeddings
+from columnar_docstore import load_store, save_store
+from ingest_cache import add_to_store
+from segmented_store import filtered_search
+
+DIM = 384
+
+
+def make_store(documents, chunks, seed=0):
+    rng = np.random.default_rng(seed)
+    docs = [Document(page_content=f"doc {d} chunk {c}", metadata={"source": f"doc-{d}.pdf", "page": c // 4 + 1})
+            for d in range(documents) for c in range(chunks)]
+    vectors = rng.standard_normal((len(docs), DIM)).astype(np.float32)
+    return add_to_store(None, docs, vectors.tolist(), FakeEmbeddings(size=DIM)), docs, vectors
+
+
+def timed(fn, queries):
+    start = time.perf_counter()
+    for query in queries:
+        fn(query)
+    return (time.perf_counter() - start) / len(queries) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--documents", type=int, default=500)
+    parser.add_argument("--chunks", type=int, default=100)
+    parser.add_argument("--queries", type=int, default=50)
+    parser.add_argument("--k", type=int, default=5)
+    args = parser.parse_args()
+
+    store, docs, vectors = make_store(args.documents, args.chunks)
+    source = f"doc-{args.documents // 2}.pdf"
+    rows = [i for i, doc in enumerate(docs) if doc.metadata["source"] == source]
+    alone = add_to_store(None, [docs[i] for i in rows], vectors[rows].tolist(), FakeEmbeddings(size=DIM))
+    queries = vectors[np.random.default_rng(1).choice(rows, args.queries)].tolist()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        save_store(store, tmp)
+        corpus = load_store(tmp, FakeEmbeddings(size=DIM))
+        k = args.k
+        results = [
+            ("whole corpus", timed(lambda q: corpus.similarity_search_by_vector(q, k=k), queries)),
+            ("filtered_search(source)", timed(lambda q: filtered_search(corpus, q, k, {source}), queries)),
+            ("filtered_search(source, pages 2-5)",
+             timed(lambda q: filtered_search(corpus, q, k, {source}, (2, 5)), queries)),
+            ("post-filter (fetch_k=1000)", timed(
+                lambda q: corpus.similarity_search_by_vector(q, k=k, filter={"source": source}, fetch_k=1000),
+                queries)),
+            ("document alone", timed(lambda q: alone.similarity_search_by_vector(q, k=k), queries)),
+        ]
+
+    print(f"{len(docs)} chunks in {args.documents} documents, {DIM}-dim vectors, top-{args.k}")
+    print(f"{'search':<36} {'ms/query':>9}")
+    for name, latency in results:
+        print(f"{name:<36} {latency:>9.3f}")
+
+
+if __name__ == "__main__":
+    main()
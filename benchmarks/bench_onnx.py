@@ -0,0 +1,72 @@
+"""
+Benchmark: int8 ONNX embeddings vs the HuggingFace (torch) model.
+
+    python -m onnx_embeddings --out ./onnx_model      # one-off export
+    python -m benchmarks.bench_onnx [--texts 512] [--check]
+
+Embeds synthetic contract chunks with both backends, reports the cosine
+similarity between their vectors (accuracy parity), cold-start time and
+texts/sec. With --check, exits non-zero if the minimum cosine similarity
+is below --min-cosine.
+"""
+import argparse
+import sys
+import time
+from langchain_community.embeddings import HuggingFaceEmbeddings
+from benchmarks.bench_chunker import make_pages
+from onnx_embeddings import ONNX_MODEL_DIR, OnnxEmbeddings, cosine_parity
+from chunker import OffsetTextSplitter
+
+
+def make_texts(count):
+    splitter = OffsetTextSplitter(chunk_size=1000, chunk_overlap=200)
+    texts = []
+    pages = 1
+    while len(texts) < count:
+        texts = [chunk.page_content for chunk in splitter.split_documents(make_pages(pages))]
+        pages *= 2
+    return texts[:count]
+
+
+def throughput(embeddings, texts, batch_size):
+    start = time.perf_counter()
+    for i in range(0, len(texts), batch_size):
+        embeddings.embed_documents(texts[i:i + batch_size])
+    return len(texts) / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--model", default="all-MiniLM-L6-v2")
+    parser.add_argument("--model-dir", default=ONNX_MODEL_DIR)
+    parser.add_argument("--texts", type=int, default=512)
+    parser.add_argument("--batch-size", type=int, default=64)
+    parser.add_argument("--check", action="store_true", help="Fail if parity is below --min-cosine.")
+    parser.add_argument("--min-cosine", type=float, default=0.98)
+    args = parser.parse_args()
+
+    texts = make_texts(args.texts)
+
+    start = time.perf_counter()
+    reference = HuggingFaceEmbeddings(model_name=args.model)
+    reference.embed_query("warm-up")
+    hf_cold = time.perf_counter() - start
+
+    start = time.perf_counter()
+    onnx = OnnxEmbeddings(model_dir=args.model_dir, model_name=args.model)
+    onnx.embed_query("warm-up")
+    onnx_cold = time.perf_counter() - start
+
+    parity = cosine_parity(onnx, reference, texts)
+    print(f"{len(texts)} chunks, cosine vs torch: min {parity['min']:.4f}, mean {parity['mean']:.4f}")
+    print(f"{'backend':<12} {'cold start(s)':>14} {'texts/sec':>11}")
+    print(f"{'hf (torch)':<12} {hf_cold:>14.2f} {throughput(reference, texts, args.batch_size):>11.1f}")
+    print(f"{'onnx int8':<12} {onnx_cold:>14.2f} {throughput(onnx, texts, args.batch_size):>11.1f}")
+
+    if args.check and parity["min"] < args.min_cosine:
+        print(f"Parity check failed: min cosine {parity['min']:.4f} < {args.min_cosine}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
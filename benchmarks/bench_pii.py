@@ -0,0 +1,80 @@
+"""
+Benchmark: PIIScrubber vs the original one-re.sub-per-pattern scrubber.
+
+    python -m benchmarks.bench_pii [--size 20000] [--check]
+
+Runs both scrubbers on realistic text and on pathological inputs (long
+dotted, dashed and digit runs that made the old email pattern quadratic),
+checks that they produce identical output, and reports time per input.
+With --check, exits non-zero if outputs differ or any pathological input
+takes longer than --max-seconds (for CI).
+"""
+import argparse
+import re
+import sys
+import time
+from security_layer import PIIScrubber
+
+REFERENCE_PATTERNS = {
+    "email": r'\b[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Z|a-z]{2,}\b',
+    "phone": r'\b(\+\d{1,2}\s)?\(?\d{3}\)?[\s.-]?\d{3}[\s.-]?\d{4}\b',
+    "credit_card": r'\b(?:\d[ -]*?){13,16}\b',
+}
+
+
+def reference_scrub(text):
+    for pii_type, pattern in REFERENCE_PATTERNS.items():
+        text = re.sub(pattern, f"[REDACTED {pii_type.upper()}]", text)
+    return text
+
+
+def make_inputs(size):
+    line = ("Invoice 2023-0042: contact jane.roe@example.com or (555) 123-4567, "
+            "card 4111 1111 1111 1111, ref 12-34-56.\n")
+    table = "Account 0000 1234 5678 9012 3456 | 1,234.56 | 2023-11-02\n"
+    return {
+        "realistic text": (line * (size // len(line) + 1))[:size],
+        "financial table": (table * (size // len(table) + 1))[:size],
+        "dotted run": "a." * (size // 2),
+        "dashed digits": "1-" * (size // 2),
+        "dotted local part": "x@" + "a." * (size // 2),
+        "dotted domain": "a@" + "b." * (size // 2),
+        "digit run": "1" * size,
+        "spaced digits": "1 " * (size // 2),
+        "mixed run": "abc.def-" * (size // 8),
+    }
+
+
+def timed(fn, text):
+    start = time.perf_counter()
+    result = fn(text)
+    return time.perf_counter() - start, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--size", type=int, default=20000, help="Characters per input.")
+    parser.add_argument("--check", action="store_true", help="Fail on mismatches or slow inputs.")
+    parser.add_argument("--max-seconds", type=float, default=0.25, help="Time budget per input with --check.")
+    args = parser.parse_args()
+
+    scrubber = PIIScrubber()
+    failures = []
+    print(f"{'input':<20} {'reference(s)':>13} {'scrubber(s)':>12} {'identical':>10}")
+    for name, text in make_inputs(args.size).items():
+        ref_time, expected = timed(reference_scrub, text)
+        new_time, actual = timed(scrubber.scrub, text)
+        identical = actual == expected
+        print(f"{name:<20} {ref_time:>13.4f} {new_time:>12.4f} {str(identical):>10}")
+        if not identical:
+            failures.append(f"{name}: output differs from reference")
+        if new_time > args.max_seconds:
+            failures.append(f"{name}: {new_time:.3f}s > {args.max_seconds}s")
+
+    if args.check and failures:
+        print("\n".join(failures))
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
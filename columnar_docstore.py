@@ -0,0 +1,378 @@
+import json
+import mmap
+import os
+import threading
+import weakref
+import zlib
+import faiss
+import numpy as np
+from langchain_community.docstore.base import AddableMixin, Docstore
+from langchain_community.vectorstores import FAISS
+from langchain_core.documents import Document
+
+# File layout inside an index directory (next to index.faiss, no index.pkl)
+TEXTS_FILE = "docstore.texts"
+OFFSETS_FILE = "docstore.offsets.npy"
+META_FILE = "docstore.meta.json"
+COLUMN_FILE = "docstore.{}.npy"
+# Rows of each string column grouped by value, and where each value's rows start
+POSTINGS_FILE = "docstore.{}.postings.npy"
+STARTS_FILE = "docstore.{}.starts.npy"
+DOCSTORE_FORMAT = 1
+# Marks a missing value in int columns
+MISSING_INT = np.iinfo(np.int64).min
+TEXT_COMPRESSION_LEVEL = 6
+
+
+def _column_kind(values):
+    present = [value for value in values if value is not None]
+    # bool is an int subclass; keep it (and anything else) exact via JSON
+    if present and all(type(value) is int for value in present):
+        return "int"
+    if present and all(type(value) is str for value in present):
+        return "category"
+    return "json"
+
+
+def write_docstore(path, ids, documents):
+    """
+    Writes `documents` (in index position order, with docstore `ids`) to
+    `path` as columns: zlib-compressed texts with an offsets array, and one
+    array per metadata key (ints as int64, strings dictionary-encoded, with
+    posting lists so the rows of one value are found without a scan).
+    """
+    documents = list(documents)
+    offsets = [0]
+    with open(os.path.join(path, TEXTS_FILE), "wb") as f:
+        for doc in documents:
+            blob = zlib.compress(doc.page_content.encode("utf-8"), TEXT_COMPRESSION_LEVEL)
+            f.write(blob)
+            offsets.append(offsets[-1] + len(blob))
+    np.save(os.path.join(path, OFFSETS_FILE), np.asarray(offsets, dtype=np.int64))
+
+    keys = list(dict.fromkeys(key for doc in documents for key in doc.metadata))
+    columns = {}
+    for number, key in enumerate(keys):
+        values = [doc.metadata.get(key) for doc in documents]
+        kind = _column_kind(values)
+        column = {"key": key, "kind": kind}
+        if kind == "json":
+            column["values"] = values
+        else:
+            column["file"] = COLUMN_FILE.format(number)
+            if kind == "int":
+                array = np.asarray([MISSING_INT if value is None else value for value in values], dtype=np.int64)
+            else:
+                categories = list(dict.fromkeys(value for value in values if value is not None))
+                codes = {value: code for code, value in enumerate(categories)}
+                column["categories"] = categories
+                array = np.asarray([-1 if value is None else codes[value] for value in values], dtype=np.int32)
+                # Missing values (-1) sort first and are not part of any posting list
+                order = np.argsort(array, kind="stable")
+                starts = np.searchsorted(array[order], np.arange(len(categories) + 1))
+                column["postings"] = POSTINGS_FILE.format(number)
+                column["starts"] = STARTS_FILE.format(number)
+                np.save(os.path.join(path, column["postings"]), order.astype(np.int64))
+                np.save(os.path.join(path, column["starts"]), starts.astype(np.int64))
+            np.save(os.path.join(path, column["file"]), array)
+        columns[key] = column
+
+    with open(os.path.join(path, META_FILE), "w", encoding="utf-8") as f:
+        json.dump({"format": DOCSTORE_FORMAT, "ids": list(ids), "columns": list(columns.values())}, f)
+
+
+class ColumnarDocstore(Docstore, AddableMixin):
+    """
+    Read-mostly docstore over the files written by write_docstore. Texts and
+    numeric columns are memory-mapped, so opening is cheap and a chunk's text
+    is only read and decompressed when search() returns it (the top-k hits).
+    Documents added or deleted after opening are kept in memory until the
+    store is saved again.
+    """
+    def __init__(self, path):
+        with open(os.path.join(path, META_FILE), encoding="utf-8") as f:
+            meta = json.load(f)
+        if meta.get("format") != DOCSTORE_FORMAT:
+            raise ValueError(f"Unsupported docstore format in {path}: {meta.get('format')}")
+        self.ids = meta["ids"]
+        self._rows = {doc_id: row for row, doc_id in enumerate(self.ids)}
+        self._offsets = np.load(os.path.join(path, OFFSETS_FILE), mmap_mode="r")
+        self._texts = b""
+        with open(os.path.join(path, TEXTS_FILE), "rb") as f:
+            if os.fstat(f.fileno()).st_size:
+                self._texts = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        self._columns = []
+        for column in meta["columns"]:
+            if column["kind"] != "json":
+                column["array"] = np.load(os.path.join(path, column["file"]), mmap_mode="r")
+            if column["kind"] == "category":
+                column["codes"] = {value: code for code, value in enumerate(column["categories"])}
+            for name in ("postings", "starts"):
+                if name in column:
+                    column[name] = np.load(os.path.join(path, column[name]), mmap_mode="r")
+            self._columns.append(column)
+        self._added = {}
+        self._deleted = set()
+
+    def __len__(self):
+        return len(self._rows) - len(self._deleted) + len(self._added)
+
+    def _read(self, row):
+        # Same Document (with its id) that the in-memory docstore would return
+        start, end = int(self._offsets[row]), int(self._offsets[row + 1])
+        text = zlib.decompress(self._texts[start:end]).decode("utf-8")
+        metadata = {}
+        for column in self._columns:
+            if column["kind"] == "json":
+                value = column["values"][row]
+            else:
+                raw = int(column["array"][row])
+                if column["kind"] == "int":
+                    value = None if raw == MISSING_INT else raw
+                else:
+                    value = None if raw < 0 else column["categories"][raw]
+            if value is not None:
+                metadata[column["key"]] = value
+        return Document(id=self.ids[row], page_content=text, metadata=metadata)
+
+    def rows_where(self, key, value):
+        """
+        Saved rows whose metadata[key] equals `value` (ignoring documents
+        added or deleted since opening), as a sorted int64 array. String
+        columns answer from their posting list in O(matches).
+        """
+        column = next((column for column in self._columns if column["key"] == key), None)
+        if column is None or value is None:
+            return np.empty(0, dtype=np.int64)
+        if column["kind"] == "category":
+            code = column["codes"].get(value)
+            if code is None:
+                return np.empty(0, dtype=np.int64)
+            if "postings" in column:
+                rows = column["postings"][column["starts"][code]:column["starts"][code + 1]]
+                return np.sort(np.asarray(rows, dtype=np.int64))
+            return np.flatnonzero(column["array"] == code).astype(np.int64)
+        if column["kind"] == "int":
+            if type(value) is not int:
+                return np.empty(0, dtype=np.int64)
+            return np.flatnonzero(column["array"] == value).astype(np.int64)
+        return np.asarray([row for row, item in enumerate(column["values"]) if item == value], dtype=np.int64)
+
+    def rows_in_range(self, key, first=None, last=None, rows=None):
+        """
+        Saved rows (of `rows`, or all) whose int metadata[key] is within
+        [first, last]; None leaves that end open. Rows without the key never
+        match.
+        """
+        column = next((column for column in self._columns if column["key"] == key), None)
+        if rows is None:
+            rows = np.arange(len(self.ids), dtype=np.int64)
+        rows = np.asarray(rows, dtype=np.int64)
+        if column is None or column["kind"] == "category":
+            return np.empty(0, dtype=np.int64)
+        if column["kind"] == "int":
+            values = np.asarray(column["array"][rows])
+            keep = values != MISSING_INT
+        else:
+            values = [column["values"][row] for row in rows]
+            keep = np.asarray([type(value) is int for value in values], dtype=bool)
+            values = np.asarray([value if type(value) is int else 0 for value in values], dtype=np.int64)
+        if first is not None:
+            keep &= values >= first
+        if last is not None:
+            keep &= values <= last
+        return rows[keep]
+
+    def search(self, search):
+        if search in self._added:
+            return self._added[search]
+        row = self._rows.get(search)
+        if row is None or search in self._deleted:
+            return f"ID {search} not found."
+        return self._read(row)
+
+    def add(self, texts):
+        overlapping = set(texts).intersection(self._added)
+        overlapping.update(doc_id for doc_id in texts if doc_id in self._rows and doc_id not in self._deleted)
+        if overlapping:
+            raise ValueError(f"Tried to add ids that already exist: {overlapping}")
+        self._added.update(texts)
+
+    def delete(self, ids):
+        for doc_id in ids:
+            if doc_id in self._added:
+                del self._added[doc_id]
+            elif doc_id in self._rows:
+                self._deleted.add(doc_id)
+            else:
+                raise ValueError(f"ID {doc_id} not found.")
+
+
+def save_store(vector_store, path):
+    """
+    Saves a LangChain FAISS store to `path` as index.faiss plus a columnar
+    docstore (instead of save_local's pickled index.pkl).
+    """
+    os.makedirs(path, exist_ok=True)
+    faiss.write_index(vector_store.index, os.path.join(path, "index.faiss"))
+    ids = [vector_store.index_to_docstore_id[i] for i in range(vector_store.index.ntotal)]
+    write_docstore(path, ids, (vector_store.docstore.search(doc_id) for doc_id in ids))
+
+
+class PositionIndex:
+    """
+    Positions `start` and up of a LangChain FAISS store grouped by
+    metadata["source"], plus the int metadata["page"] of each, so filtered
+    searches never scan the docstore. Each chunk is read once; chunks added
+    to the store later are picked up by extend().
+    """
+    def __init__(self, mapping, start):
+        # The store's position -> docstore id dict; deletions replace it
+        self.mapping = mapping
+        self.start = start
+        self.end = start
+        self.by_source = {}
+        self.pages = np.empty(0, dtype=np.int64)
+        self.lock = threading.Lock()
+
+    def extend(self, vector_store):
+        end = vector_store.index.ntotal
+        if end <= self.end:
+            return
+        pages = []
+        for position in range(self.end, end):
+            doc = vector_store.docstore.search(self.mapping[position])
+            metadata = doc.metadata if isinstance(doc, Document) else {}
+            source = metadata.get("source")
+            if isinstance(source, str):
+                self.by_source.setdefault(source, []).append(position)
+            page = metadata.get("page")
+            pages.append(page if type(page) is int else MISSING_INT)
+        self.pages = np.concatenate([self.pages, np.asarray(pages, dtype=np.int64)])
+        self.end = end
+
+    def where_source(self, source):
+        return list(self.by_source.get(source, ()))
+
+    def matching(self, sources=None, pages=None):
+        if sources is None:
+            positions = np.arange(self.start, self.end, dtype=np.int64)
+        else:
+            positions = np.asarray(sorted(position for source in sources
+                                          for position in self.by_source.get(source, ())), dtype=np.int64)
+        if pages is not None:
+            values = self.pages[positions - self.start]
+            keep = values != MISSING_INT
+            first, last = pages
+            if first is not None:
+                keep &= values >= first
+            if last is not None:
+                keep &= values <= last
+            positions = positions[keep]
+        return positions.tolist()
+
+
+# PositionIndex of each store that has been filtered, dropped with the store
+_position_indexes = weakref.WeakKeyDictionary()
+_position_indexes_lock = threading.Lock()
+
+
+def position_index(vector_store, start=0):
+    """
+    The PositionIndex of `vector_store` from position `start`, built on
+    first use and brought up to date with chunks added since. Deleting from
+    the store (which renumbers positions) starts a new one.
+    """
+    with _position_indexes_lock:
+        index = _position_indexes.get(vector_store)
+        if index is None or index.mapping is not vector_store.index_to_docstore_id or index.start != start \
+                or vector_store.index.ntotal < index.end:
+            index = _position_indexes[vector_store] = PositionIndex(vector_store.index_to_docstore_id, start)
+    # Only requests filtering this store wait while it is read
+    with index.lock:
+        index.extend(vector_store)
+    return index
+
+
+def _saved_rows(docstore):
+    # Saved rows of a columnar docstore are index positions until something
+    # is deleted; documents added later follow them
+    if isinstance(docstore, ColumnarDocstore) and not docstore._deleted:
+        return len(docstore.ids)
+    return 0
+
+
+def positions_where(vector_store, key, value):
+    """
+    Index positions of the chunks of a LangChain FAISS store whose
+    metadata[key] equals `value`. A columnar docstore answers from its
+    posting lists; sources of other chunks come from the store's
+    PositionIndex, and other keys are scanned.
+    """
+    docstore = vector_store.docstore
+    mapping = vector_store.index_to_docstore_id
+    start = _saved_rows(docstore)
+    positions = docstore.rows_where(key, value).tolist() if start else []
+    if key == "source":
+        return positions + position_index(vector_store, start).where_source(value)
+    for position in range(start, vector_store.index.ntotal):
+        doc = docstore.search(mapping[position])
+        if isinstance(doc, Document) and doc.metadata.get(key) == value:
+            positions.append(position)
+    return positions
+
+
+def positions_matching(vector_store, sources=None, pages=None):
+    """
+    Index positions of the chunks of a LangChain FAISS store that come from
+    one of `sources` (filenames) and lie within `pages` ((first, last),
+    inclusive, either end None); None means any. A columnar docstore answers
+    from its posting lists and page column, other chunks from the store's
+    PositionIndex, so the cost follows the number of matching chunks when
+    sources are given.
+    """
+    docstore = vector_store.docstore
+    if sources is not None:
+        sources = set(sources)
+    start = _saved_rows(docstore)
+    positions = []
+    if start:
+        rows = None
+        if sources is not None:
+            rows = np.unique(np.concatenate(
+                [docstore.rows_where("source", source) for source in sources] or [np.empty(0, dtype=np.int64)]))
+        if pages is not None:
+            rows = docstore.rows_in_range("page", pages[0], pages[1], rows)
+        positions = (np.arange(start) if rows is None else rows).tolist()
+    return positions + position_index(vector_store, start).matching(sources, pages)
+
+
+def positions_of(vector_store, ids):
+    """
+    Index positions of the docstore `ids` held by a LangChain FAISS store.
+    A columnar docstore looks them up by id; others are scanned.
+    """
+    ids = set(ids)
+    docstore = vector_store.docstore
+    mapping = vector_store.index_to_docstore_id
+    if isinstance(docstore, ColumnarDocstore) and not docstore._deleted:
+        positions = [docstore._rows[doc_id] for doc_id in ids if doc_id in docstore._rows]
+        for position in range(len(docstore.ids), vector_store.index.ntotal):
+            if mapping[position] in ids:
+                positions.append(position)
+        return sorted(positions)
+    return [position for position, doc_id in mapping.items() if doc_id in ids]
+
+
+def has_columnar_docstore(path):
+    return os.path.exists(os.path.join(path, META_FILE))
+
+
+def load_store(path, embeddings):
+    """
+    Opens a store written by save_store. No pickle is involved; chunk texts
+    stay on disk until they are returned by a search.
+    """
+    index = faiss.read_index(os.path.join(path, "index.faiss"))
+    docstore = ColumnarDocstore(path)
+    return FAISS(embeddings, index, docstore, dict(enumerate(docstore.ids)))
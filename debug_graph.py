@@ -2,7 +2,7 @@
 import os
 import sys
 import traceback
-from langchain_community.vectorstores import FAISS
+from index_snapshots import load_snapshot
 from langchain_community.embeddings import HuggingFaceEmbeddings
 from bot import get_rag_chain, chat_with_bot
 from dotenv import load_dotenv
@@ -21,7 +21,7 @@ try:
         print("   FAILED: DB Directory does not exist! Please upload a doc first.")
         sys.exit(1)
         
-    vector_store = FAISS.load_local(DB_DIR, embeddings, allow_dangerous_deserialization=True)
+    vector_store = load_snapshot(DB_DIR, embeddings)[0]
     print("   Success.")
 
     print("2. Calling chat_with_bot...")
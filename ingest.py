@@ -1,8 +1,20 @@
 import os
-from langchain_community.document_loaders import PyPDFDirectoryLoader
-from langchain_text_splitters import RecursiveCharacterTextSplitter
-from langchain_community.vectorstores import FAISS
-from langchain_community.embeddings import HuggingFaceEmbeddings
+import json
+import time
+import uuid
+import argparse
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from langchain_community.document_loaders import PyPDFLoader
+from chunker import OffsetTextSplitter
+from embedding_registry import get_embeddings
+from ingest_cache import add_to_store, file_digest
+from columnar_docstore import positions_where
+from index_snapshots import (
+    compact_segments, load_snapshot, should_compact, write_segment, write_snapshot, write_tombstone,
+)
+from security_layer import scrub_batch
 from dotenv import load_dotenv
 
 # Load environment variables
@@ -12,42 +24,258 @@ load_dotenv()
 DOCS_DIR = "./docs"
 DB_DIR = "./faiss_index"
 EMBEDDING_MODEL = "all-MiniLM-L6-v2"
+# Tracks what is already indexed: path -> size, mtime, content hash, chunk IDs,
+# redaction counts
+MANIFEST_FILE = "manifest.json"
+MANIFEST_VERSION = 1
+# Chunks per embedding call; large batches keep the model busy
+EMBED_BATCH_SIZE = 256
 
-def ingest_documents():
-    # 1. Load Documents
-    print(f"Loading PDFs from {DOCS_DIR}...")
-    loader = PyPDFDirectoryLoader(DOCS_DIR)
-    documents = loader.load()
-    
-    if not documents:
-        return "No documents found in docs folder."
-
-    print(f"Loaded {len(documents)} documents.")
-
-    # 2. Split Text
-    print("Splitting text...")
-    text_splitter = RecursiveCharacterTextSplitter(
-        chunk_size=1000,
-        chunk_overlap=200,
-        length_function=len,
-        add_start_index=True,
-    )
-    chunks = text_splitter.split_documents(documents)
-    print(f"Created {len(chunks)} chunks.")
-
-    # 3. Create Vector Store
-    print(f"Creating Vector Store using {EMBEDDING_MODEL} (Local)...")
-    
+def load_and_split(path):
+    """
+    Loads one PDF, scrubs PII and splits it into chunks.
+    Runs in a worker process when ingesting with --workers.
+    Returns (path, page_count, chunks, redactions), where redactions counts
+    the PII redacted in the file per type. Pages are numbered from 1, like
+    the chunks of API uploads (PDFProcessor).
+    """
+    text_splitter = OffsetTextSplitter(chunk_size=1000, chunk_overlap=200)
+    pages, counts = scrub_batch(PyPDFLoader(path).load(), return_counts=True)
+    for page in pages:
+        # PyPDFLoader numbers pages from 0
+        page.metadata["page"] += 1
+    redactions = {}
+    for page_counts in counts:
+        for pii_type, count in page_counts.items():
+            redactions[pii_type] = redactions.get(pii_type, 0) + count
+    return path, len(pages), text_splitter.split_documents(pages), redactions
+
+def print_stats(stats):
+    """
+    Prints throughput per stage (pages/sec, chunks/sec).
+    """
+    print("Stage        time(s)   pages/sec   chunks/sec")
+    for stage, s in stats.items():
+        seconds = max(s["seconds"], 1e-9)
+        print(f"{stage:<10} {s['seconds']:>9.2f} {s['pages'] / seconds:>11.1f} {s['chunks'] / seconds:>12.1f}")
+
+def load_manifest(db_dir=DB_DIR):
+    """
+    Reads the ingest manifest, or returns an empty one if missing/unreadable.
+    """
+    path = os.path.join(db_dir, MANIFEST_FILE)
+    try:
+        with open(path, encoding="utf-8") as f:
+            manifest = json.load(f)
+        if manifest.get("version") == MANIFEST_VERSION:
+            return manifest
+    except (OSError, ValueError):
+        pass
+    return {"version": MANIFEST_VERSION, "embedding_model": EMBEDDING_MODEL, "files": {}}
+
+def save_manifest(manifest, db_dir=DB_DIR):
+    """
+    Writes the manifest atomically next to the index files.
+    """
+    path = os.path.join(db_dir, MANIFEST_FILE)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(tmp_path, path)
+
+def scan_documents(docs_dir=DOCS_DIR):
+    """
+    Lists the PDFs under docs_dir (recursively, skipping hidden files).
+    """
+    return sorted(str(p) for p in Path(docs_dir).glob("**/[!.]*.pdf") if p.is_file())
+
+def adopt_uploads(manifest, paths, vector_store, docs_dir=DOCS_DIR):
+    """
+    Adds manifest entries for PDFs in docs_dir that are already indexed but
+    not in the manifest: files uploaded through the API, whose chunks have
+    their path relative to docs_dir as source. Returns the adopted paths.
+    """
+    if vector_store is None:
+        return []
+    adopted = []
+    for path in paths:
+        if path in manifest["files"]:
+            continue
+        positions = positions_where(vector_store, "source", os.path.relpath(path, docs_dir))
+        if not positions:
+            continue
+        stat = os.stat(path)
+        with open(path, "rb") as f:
+            digest = file_digest(f)
+        manifest["files"][path] = {
+            "size": stat.st_size, "mtime": stat.st_mtime, "sha256": digest,
+            "chunk_ids": [vector_store.index_to_docstore_id[position] for position in positions],
+            "redactions": {},
+        }
+        adopted.append(path)
+    return adopted
+
+def plan_ingest(manifest, paths):
+    """
+    Compares files on disk against the manifest.
+    Returns (changed, deleted): changed is a list of (path, entry) for new or
+    modified files, with a fresh manifest entry (chunk IDs still empty);
+    deleted is a list of paths that are in the manifest but no longer on disk.
+    Files whose size and mtime match are skipped without hashing; files whose
+    content hash matches only get their stat refreshed.
+    """
+    known = manifest["files"]
+    changed = []
+    for path in paths:
+        stat = os.stat(path)
+        entry = known.get(path)
+        if entry and entry["size"] == stat.st_size and entry["mtime"] == stat.st_mtime:
+            continue
+
+        with open(path, "rb") as f:
+            digest = file_digest(f)
+        if entry and entry["sha256"] == digest:
+            entry["size"], entry["mtime"] = stat.st_size, stat.st_mtime
+            continue
+
+        changed.append((path, {"size": stat.st_size, "mtime": stat.st_mtime, "sha256": digest, "chunk_ids": []}))
+
+    on_disk = set(paths)
+    deleted = [path for path in known if path not in on_disk]
+    return changed, deleted
+
+def ingest_documents(rebuild=False, workers=1):
+    """
+    Incrementally syncs ./faiss_index with the PDFs in ./docs: only new or
+    changed files are loaded and embedded, and vectors of deleted or
+    replaced files are removed. Pass rebuild=True to start from scratch,
+    and workers > 1 to load/scrub/split files in parallel processes.
+
+    Incremental runs publish a tombstone and a delta segment on top of the
+    current index rather than replacing it, like uploads through the API.
+    """
     # Using HuggingFace (Local CPU) - No API Key required
-    embeddings = HuggingFaceEmbeddings(model_name=EMBEDDING_MODEL)
-    
-    # Create and Save FAISS index
-    if len(chunks) > 0:
-        vector_store = FAISS.from_documents(chunks, embeddings)
-        vector_store.save_local(DB_DIR)
-        return f"Ingestion complete. {len(documents)} documents loaded, {len(chunks)} chunks created."
+    embeddings = get_embeddings(EMBEDDING_MODEL)
+
+    # 1. Load manifest and existing index
+    manifest = load_manifest(DB_DIR)
+    vector_store = None
+    if not rebuild and manifest["files"] and manifest.get("embedding_model") == EMBEDDING_MODEL:
+        try:
+            vector_store = load_snapshot(DB_DIR, embeddings)[0]
+        except Exception as e:
+            print(f"Could not load existing index ({e}); rebuilding.")
+    if vector_store is None:
+        manifest = {"version": MANIFEST_VERSION, "embedding_model": EMBEDDING_MODEL, "files": {}}
+
+    # 2. Work out what changed since the last run
+    print(f"Scanning PDFs in {DOCS_DIR}...")
+    paths = scan_documents(DOCS_DIR)
+    adopted = adopt_uploads(manifest, paths, vector_store, DOCS_DIR)
+    if adopted:
+        print(f"{len(adopted)} uploaded through the API and already indexed.")
+    changed, deleted = plan_ingest(manifest, paths)
+    print(f"{len(changed)} new/changed, {len(deleted)} deleted, {len(paths) - len(changed)} unchanged.")
+
+    if not changed and not deleted:
+        if vector_store is None:
+            return "No documents found in docs folder."
+        # Persist refreshed mtimes of touched-but-identical files
+        save_manifest(manifest, DB_DIR)
+        return "Index is up to date."
+
+    # 3. Drop vectors of deleted and replaced files
+    stale_ids = []
+    for path in deleted:
+        stale_ids.extend(manifest["files"].pop(path)["chunk_ids"])
+    for path, _ in changed:
+        if path in manifest["files"]:
+            stale_ids.extend(manifest["files"][path]["chunk_ids"])
+    if stale_ids and vector_store is not None:
+        # Chunks deleted through the API are already gone from the loaded index
+        present = set(vector_store.index_to_docstore_id.values())
+        stale_ids = [doc_id for doc_id in stale_ids if doc_id in present]
+    if stale_ids and vector_store is not None:
+        print(f"Removing {len(stale_ids)} stale chunks.")
+
+    # 4. Load, scrub, split and embed only the new/changed files
+    # Whole files are spread across worker processes; their chunks are
+    # embedded in large batches and added to one store of new chunks here.
+    print(f"Embedding with {EMBEDDING_MODEL} (Local), {workers} worker(s)...")
+    stats = {stage: {"seconds": 0.0, "pages": 0, "chunks": 0} for stage in ("extract", "embed", "index")}
+    entries = dict(changed)
+    pending_chunks, pending_ids = [], []
+    new_store = None
+
+    def flush():
+        nonlocal new_store
+        if not pending_chunks:
+            return
+        start = time.perf_counter()
+        vectors = embeddings.embed_documents([chunk.page_content for chunk in pending_chunks])
+        stats["embed"]["seconds"] += time.perf_counter() - start
+        stats["embed"]["chunks"] += len(pending_chunks)
+
+        start = time.perf_counter()
+        new_store = add_to_store(new_store, pending_chunks, vectors, embeddings, ids=pending_ids)
+        stats["index"]["seconds"] += time.perf_counter() - start
+        stats["index"]["chunks"] += len(pending_chunks)
+        pending_chunks.clear()
+        pending_ids.clear()
+
+    started = time.perf_counter()
+    executor = None
+    if workers > 1:
+        # Spawned, not forked: the embedding model is already loaded and running threads
+        executor = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"))
+    try:
+        results = executor.map(load_and_split, entries) if executor else map(load_and_split, entries)
+        for path, page_count, chunks, redactions in results:
+            entry = entries[path]
+            entry["chunk_ids"] = [uuid.uuid4().hex for _ in chunks]
+            entry["redactions"] = redactions
+            manifest["files"][path] = entry
+            stats["extract"]["pages"] += page_count
+            stats["extract"]["chunks"] += len(chunks)
+            stats["embed"]["pages"] += page_count
+            stats["index"]["pages"] += page_count
+            print(f"  {path}: {page_count} pages, {len(chunks)} chunks")
+
+            pending_chunks.extend(chunks)
+            pending_ids.extend(entry["chunk_ids"])
+            if len(pending_chunks) >= EMBED_BATCH_SIZE:
+                flush()
+        flush()
+    finally:
+        if executor:
+            executor.shutdown()
+    # Extraction time is the wall time not spent embedding/indexing
+    stats["extract"]["seconds"] = time.perf_counter() - started - stats["embed"]["seconds"] - stats["index"]["seconds"]
+    total_chunks = stats["extract"]["chunks"]
+
+    # 5. Save index, then manifest (so a crash never records unsaved chunks)
+    if vector_store is None:
+        if new_store is None:
+            return "No chunks to ingest."
+        # New snapshot + pointer flip: running servers swap to it without seeing partial files
+        write_snapshot(new_store, DB_DIR)
     else:
-        return "No chunks to ingest."
+        # Deletions and new chunks go on top of the index as it is now, so
+        # segments the API published while this ran are kept
+        if stale_ids:
+            write_tombstone(DB_DIR, stale_ids, embeddings=embeddings)
+        if new_store is not None:
+            write_segment(new_store, DB_DIR)
+        if should_compact(DB_DIR):
+            compact_segments(DB_DIR, embeddings)
+    save_manifest(manifest, DB_DIR)
+    print_stats(stats)
+    return (f"Ingestion complete. {len(changed)} documents updated, {total_chunks} chunks created, "
+            f"{len(deleted)} documents removed.")
 
 if __name__ == "__main__":
-    ingest_documents()
+    parser = argparse.ArgumentParser(description="Sync the FAISS index with the PDFs in ./docs.")
+    parser.add_argument("--rebuild", action="store_true", help="Ignore the manifest and re-ingest everything.")
+    parser.add_argument("--workers", type=int, default=1, help="Processes used to load, scrub and split files.")
+    args = parser.parse_args()
+    print(ingest_documents(rebuild=args.rebuild, workers=args.workers))
@@ -5,6 +5,8 @@ import { StatusBar } from 'expo-status-bar';
 import axios from 'axios';
 
 const API_URL = 'http://192.168.0.107:8000';  // Your computer's IP for phone testing
+// Each app run gets its own document index on the server
+const SESSION_ID = `${Date.now().toString(36)}-${Math.random().toString(36).slice(2, 10)}`;
 
 export default function App() {
     const [currentTab, setCurrentTab] = useState('documents');
@@ -36,7 +38,7 @@ export default function App() {
         try {
             const response = await axios.post(`${API_URL}/chat`, {
                 message: userMsg.text,
-                session_id: 'default'
+                session_id: SESSION_ID
             });
 
             const botMsg = {
@@ -73,6 +75,7 @@ export default function App() {
     const uploadDocument = async (file) => {
         setLoading(true);
         const formData = new FormData();
+        formData.append('session_id', SESSION_ID);
 
         try {
             if (Platform.OS === 'web' && file.file) {
@@ -107,7 +110,7 @@ export default function App() {
 
     const clearSession = async () => {
         try {
-            await axios.delete(`${API_URL}/session`);
+            await axios.delete(`${API_URL}/session`, { params: { session_id: SESSION_ID } });
             setMessages([]);
             setFileName(null);
             setUploadedDocs([]);
@@ -0,0 +1,103 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any
+from langchain_core.retrievers import BaseRetriever
+from segmented_store import filtered_search
+
+# Configuration
+# Query vectors kept in memory (0 disables the cache)
+QUERY_CACHE_SIZE = int(os.getenv("QUERY_CACHE_SIZE", 1024))
+# Seconds a cached query vector stays valid
+QUERY_CACHE_TTL = int(os.getenv("QUERY_CACHE_TTL", 3600))
+
+
+class QueryEmbeddingCache:
+    """
+    Bounded in-process LRU cache of query vectors with a TTL, so repeated
+    questions skip the embedding model at retrieval time.
+    """
+    def __init__(self, max_size=QUERY_CACHE_SIZE, ttl=QUERY_CACHE_TTL):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.expired = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def embed_query(self, embeddings, query):
+        """
+        Returns the vector of `query` from `embeddings`, cached per model.
+        """
+        key = (getattr(embeddings, "model_name", type(embeddings).__name__), query)
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                expires_at, vector = entry
+                if expires_at > now:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return vector
+                del self._entries[key]
+                self.expired += 1
+            self.misses += 1
+
+        # Embed outside the lock so other queries are not blocked
+        vector = embeddings.embed_query(query)
+        if self.max_size <= 0:
+            return vector
+
+        with self._lock:
+            self._entries[key] = (now + self.ttl, vector)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+        return vector
+
+    def stats(self):
+        """
+        Hit/miss counters and current size of the cache.
+        """
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "max_size": self.max_size,
+                "ttl_seconds": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "expired": self.expired,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else None,
+            }
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+# Shared by every retriever in this process
+query_cache = QueryEmbeddingCache()
+
+
+class CachedQueryRetriever(BaseRetriever):
+    """
+    Similarity-search retriever over a vector store that embeds the query
+    through a QueryEmbeddingCache. Same results as
+    vector_store.as_retriever(search_kwargs={"k": k}), optionally restricted
+    to chunks from `sources` within `pages` (see filtered_search).
+    """
+    vector_store: Any
+    k: int = 4
+    cache: Any = None
+    sources: Any = None
+    pages: Any = None
+
+    def _get_relevant_documents(self, query, *, run_manager=None):
+        cache = self.cache or query_cache
+        vector = cache.embed_query(self.vector_store.embeddings, query)
+        if self.sources is None and self.pages is None:
+            return self.vector_store.similarity_search_by_vector(vector, k=self.k)
+        return [doc for doc, _ in filtered_search(self.vector_store, vector, self.k, self.sources, self.pages)]
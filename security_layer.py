@@ -1,43 +1,185 @@
+import multiprocessing
+import os
 import re
+from concurrent.futures import ProcessPoolExecutor
+from langchain_core.documents import Document
+
+# Batch scrubbing settings
+# Worker processes used by scrub_batch (1 = always in-process)
+SCRUB_WORKERS = int(os.getenv("SCRUB_WORKERS", 1))
+# Documents sent to a worker per task
+SCRUB_CHUNK_SIZE = int(os.getenv("SCRUB_CHUNK_SIZE", 64))
+
+# Characters allowed in the local part of an email (left of "@")
+EMAIL_LOCAL_CHARS = frozenset("ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789._%+-")
+# Domain part, matched once per "@" (right of "@")
+EMAIL_DOMAIN = re.compile(r'[A-Za-z0-9.-]+\.[A-Z|a-z]{2,}\b')
+PHONE = re.compile(r'\b(?:\+\d{1,2}\s)?\(?\d{3}\)?[\s.-]?\d{3}[\s.-]?\d{4}\b')
+# Same matches as (?:\d[ -]*?){13,16}, but every repetition is deterministic
+CREDIT_CARD = re.compile(r'\b\d(?:[ -]*\d){12,15}?\b')
+
+
+def _is_word(ch):
+    return ch.isalnum() or ch == "_"
+
+
+def _is_boundary(text, i):
+    """Same test as regex \\b at index i."""
+    before = i > 0 and _is_word(text[i - 1])
+    after = i < len(text) and _is_word(text[i])
+    return before != after
+
+
+def _find_emails(text):
+    """
+    Email spans, leftmost first, without backtracking: each "@" is examined
+    once, walking left over its local part and matching the domain after it.
+    """
+    spans = []
+    cursor = 0
+    at = text.find("@")
+    while at != -1:
+        start = at
+        while start > cursor and text[start - 1] in EMAIL_LOCAL_CHARS:
+            start -= 1
+        # The match starts at the first word boundary of the local part
+        begin = next((i for i in range(start, at) if _is_boundary(text, i)), None)
+        if begin is not None:
+            domain = EMAIL_DOMAIN.match(text, at + 1)
+            if domain:
+                spans.append((begin, domain.end(), "email"))
+                cursor = domain.end()
+        at = text.find("@", max(at + 1, cursor))
+    return spans
+
+
+def _find_in_gaps(text, taken, pattern, pii_type):
+    """
+    Matches of `pattern` in the text between already-redacted spans. Each gap
+    is scanned on its own, exactly as if the spans had been replaced by a
+    [REDACTED ...] token.
+    """
+    found = []
+    start = 0
+    for span_start, span_end, _ in taken + [(len(text), len(text), None)]:
+        if span_start > start:
+            gap = text[start:span_start]
+            found.extend((start + m.start(), start + m.end(), pii_type) for m in pattern.finditer(gap))
+        start = span_end
+    return found
+
 
 class PIIScrubber:
     """
     Experimental PII Redaction Layer.
     Removes Emails, Phone Numbers, and Credit Card patterns from text.
+
+    All patterns are compiled once, and every scanner runs in linear time
+    (no catastrophic backtracking on long digit or dotted runs). Types are
+    resolved in priority order email > phone > credit_card, and the output
+    is built in one pass.
     """
     
     def __init__(self):
-        # Regex patterns
+        # Regex patterns (reference definitions; scrub() uses the linear scanners above)
         self.patterns = {
             "email": r'\b[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Z|a-z]{2,}\b',
             "phone": r'\b(\+\d{1,2}\s)?\(?\d{3}\)?[\s.-]?\d{3}[\s.-]?\d{4}\b',
             # Generic Credit Card (simple check)
             "credit_card": r'\b(?:\d[ -]*?){13,16}\b'
         }
+        self.replacements = {pii_type: f"[REDACTED {pii_type.upper()}]" for pii_type in self.patterns}
+
+    def find_pii(self, text):
+        """
+        Returns sorted (start, end, pii_type) spans of all PII in `text`.
+        """
+        spans = _find_emails(text) if "@" in text else []
+        spans = sorted(spans + _find_in_gaps(text, spans, PHONE, "phone"))
+        return sorted(spans + _find_in_gaps(text, spans, CREDIT_CARD, "credit_card"))
 
     def scrub(self, text):
         """
         Replaces found PII with [REDACTED <Type>]
         """
-        scrubbed_text = text
-        for pii_type, pattern in self.patterns.items():
-            scrubbed_text = re.sub(pattern, f"[REDACTED {pii_type.upper()}]", scrubbed_text)
-        
-        return scrubbed_text
+        return self._redact(text, self.find_pii(text))
+
+    def scrub_with_counts(self, text):
+        """
+        Like scrub(), but also returns the number of redactions per type.
+        """
+        spans = self.find_pii(text)
+        counts = dict.fromkeys(self.patterns, 0)
+        for _, _, pii_type in spans:
+            counts[pii_type] += 1
+        return self._redact(text, spans), counts
+
+    def _redact(self, text, spans):
+        if not spans:
+            return text
+
+        parts = []
+        last = 0
+        for start, end, pii_type in spans:
+            parts.append(text[last:start])
+            parts.append(self.replacements[pii_type])
+            last = end
+        parts.append(text[last:])
+        return "".join(parts)
+
+
+# Scrubbers hold no per-call state, so one instance per process is shared
+_scrubber = PIIScrubber()
+
+
+def _scrub_texts(texts):
+    """
+    Worker entry point: scrubs a list of texts.
+    Returns a list of (clean_text, counts) in the same order.
+    """
+    return [_scrubber.scrub_with_counts(text) for text in texts]
+
+
+def scrub_batch(documents, workers=None, chunk_size=None, return_counts=False):
+    """
+    Scrubs a list of LangChain Documents, returning new Documents in the same
+    order (the inputs are left untouched). Large lists are split into chunks
+    of `chunk_size` documents and scrubbed across `workers` processes.
+    With return_counts=True, returns (documents, counts) where counts[i] is
+    the number of redactions per PII type in documents[i].
+    """
+    workers = SCRUB_WORKERS if workers is None else workers
+    chunk_size = chunk_size or SCRUB_CHUNK_SIZE
+    texts = [doc.page_content for doc in documents]
+
+    if workers <= 1 or len(texts) <= chunk_size:
+        results = _scrub_texts(texts)
+    else:
+        chunks = [texts[i:i + chunk_size] for i in range(0, len(texts), chunk_size)]
+        results = []
+        # Spawned, not forked: callers may already run threads (servers, embedding models)
+        context = multiprocessing.get_context("spawn")
+        with ProcessPoolExecutor(max_workers=min(workers, len(chunks)), mp_context=context) as executor:
+            # map() yields chunk results in submission order
+            for chunk_results in executor.map(_scrub_texts, chunks):
+                results.extend(chunk_results)
+
+    cleaned_docs = [
+        Document(page_content=clean_text, metadata=dict(doc.metadata))
+        for doc, (clean_text, _) in zip(documents, results)
+    ]
+    if return_counts:
+        return cleaned_docs, [counts for _, counts in results]
+    return cleaned_docs
+
 
 def clean_document_content(documents):
     """
     Helper to clean a list of LangChain Document objects properly.
+    Returns scrubbed copies; the original documents are not modified.
     """
-    scrubber = PIIScrubber()
-    cleaned_docs = []
-    
-    for doc in documents:
-        # Create a deep copy or new object to avoid mutating original if needed
-        doc.page_content = scrubber.scrub(doc.page_content)
-        cleaned_docs.append(doc)
-        
-    return cleaned_docs
+    return scrub_batch(documents)
+
 
 if __name__ == "__main__":
     # Test
@@ -0,0 +1,124 @@
+import faiss
+import numpy as np
+from langchain_community.vectorstores.utils import DistanceStrategy
+from langchain_core.vectorstores import VectorStore
+from ann_index import search_index
+from columnar_docstore import positions_matching, positions_of
+
+
+def search_store(vector_store, embedding, k, exclude=None, include=None):
+    """
+    (Document, score) pairs of the k nearest chunks of a LangChain FAISS
+    store, like its similarity_search_with_score_by_vector, skipping the
+    index positions in `exclude` (and searching only those in `include`,
+    if given) inside the index search.
+    """
+    vector = np.asarray([embedding], dtype=np.float32)
+    if vector_store._normalize_L2:
+        faiss.normalize_L2(vector)
+    scores, positions = search_index(vector_store.index, vector, k, exclude, include)
+    results = []
+    for score, position in zip(scores[0], positions[0]):
+        if position == -1:
+            continue
+        doc = vector_store.docstore.search(vector_store.index_to_docstore_id[int(position)])
+        results.append((doc, float(score)))
+    return results
+
+
+def _best(results, k, distance_strategy):
+    # L2 distances: lower is closer; inner product: higher is closer
+    reverse = distance_strategy == DistanceStrategy.MAX_INNER_PRODUCT
+    results.sort(key=lambda pair: pair[1], reverse=reverse)
+    return results[:k]
+
+
+class SegmentedStore(VectorStore):
+    """
+    Read-only view that searches a base FAISS store and its delta segments
+    (small FAISS stores of recent uploads) together. Each part is searched
+    for k results and the best k overall are returned, so results match a
+    single index holding all vectors (exactly for flat indexes).
+
+    Chunks whose docstore ids are in `deleted` (tombstones of deleted
+    documents) are skipped by the index search itself.
+    """
+    def __init__(self, base, segments, deleted=()):
+        self.base = base
+        self.segments = list(segments)
+        self.deleted = frozenset(deleted)
+        self._excluded = [positions_of(part, self.deleted) if self.deleted else [] for part in self.parts]
+
+    @property
+    def parts(self):
+        return [self.base] + self.segments
+
+    @property
+    def embeddings(self):
+        return self.base.embeddings
+
+    @property
+    def ntotal(self):
+        return sum(part.index.ntotal for part in self.parts) - sum(len(excluded) for excluded in self._excluded)
+
+    def similarity_search_with_score_by_vector(self, embedding, k=4, **kwargs):
+        results = []
+        for part, excluded in zip(self.parts, self._excluded):
+            if kwargs:
+                # LangChain's own search (metadata filters, fetch_k); tombstoned chunks are dropped afterwards
+                pairs = part.similarity_search_with_score_by_vector(embedding, k=k + len(excluded), **kwargs)
+                results.extend((doc, score) for doc, score in pairs if doc.id not in self.deleted)
+            else:
+                results.extend(search_store(part, embedding, k, excluded))
+        return _best(results, k, self.base.distance_strategy)
+
+    def similarity_search_by_vector(self, embedding, k=4, **kwargs):
+        return [doc for doc, _ in self.similarity_search_with_score_by_vector(embedding, k=k, **kwargs)]
+
+    def similarity_search_with_score(self, query, k=4, **kwargs):
+        return self.similarity_search_with_score_by_vector(self.embeddings.embed_query(query), k=k, **kwargs)
+
+    def similarity_search(self, query, k=4, **kwargs):
+        return [doc for doc, _ in self.similarity_search_with_score(query, k=k, **kwargs)]
+
+    def _select_relevance_score_fn(self):
+        return self.base._select_relevance_score_fn()
+
+    def add_texts(self, texts, metadatas=None, **kwargs):
+        raise NotImplementedError("SegmentedStore is read-only; publish a new segment instead.")
+
+    @classmethod
+    def from_texts(cls, texts, embedding, metadatas=None, **kwargs):
+        raise NotImplementedError("Build the base store with FAISS and wrap it in SegmentedStore.")
+
+
+def filtered_search(vector_store, embedding, k=4, sources=None, pages=None):
+    """
+    (Document, score) pairs of the k nearest chunks of `vector_store` (a
+    FAISS store or a SegmentedStore) among those from `sources` within
+    `pages` (see positions_matching). Only the matching chunks are searched,
+    so a question about one document in a large corpus costs about as much
+    as searching that document alone.
+    """
+    if isinstance(vector_store, SegmentedStore):
+        parts, base = list(zip(vector_store.parts, vector_store._excluded)), vector_store.base
+    else:
+        parts, base = [(vector_store, [])], vector_store
+    if sources is not None:
+        sources = set(sources)
+    results = []
+    for part, excluded in parts:
+        include = positions_matching(part, sources, pages)
+        if include:
+            results.extend(search_store(part, embedding, k, excluded, include))
+    return _best(results, k, base.distance_strategy)
+
+
+def combine_stores(base, segments, deleted=()):
+    """
+    `base` alone if there are no segments or deleted ids, else a
+    SegmentedStore over all of them.
+    """
+    if not segments and not deleted:
+        return base
+    return SegmentedStore(base, segments, deleted)
@@ -0,0 +1,264 @@
+import hashlib
+import os
+import shutil
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from ann_index import store_memory_bytes
+from columnar_docstore import load_store, save_store
+from ingest_cache import add_to_store
+
+# Configuration
+# Sessions idle for longer than this are dropped, from memory and disk (0 disables)
+SESSION_TTL_SECONDS = int(os.getenv("SESSION_TTL_SECONDS", 1800))
+# Session indexes kept in memory; least recently used ones are evicted above this (0 disables)
+SESSION_MEMORY_BUDGET_MB = int(os.getenv("SESSION_MEMORY_BUDGET_MB", 512))
+# Evicted sessions that have not expired are saved here and reloaded on their next
+# request (empty: evicted sessions are dropped)
+SESSION_SPILL_DIR = os.getenv("SESSION_SPILL_DIR", "")
+
+
+class SessionEntry:
+    def __init__(self, vector_store, last_used, embeddings=None):
+        self.store = vector_store
+        self.last_used = last_used
+        self.size = store_memory_bytes(vector_store) if vector_store is not None else 0
+        # Kept to reopen the store once it has been spilled
+        self.embeddings = embeddings or vector_store.embeddings
+        # Directory the store was spilled to (None while it is in memory)
+        self.path = None
+        # Set while the store is being written to the spill dir
+        self.spilling = False
+        # Serializes loading, spilling and adding to this session's store
+        self.lock = threading.Lock()
+
+
+class SessionIndexes:
+    """
+    One small in-memory FAISS store per chat session, so sessions never see
+    each other's documents. Sessions idle for `ttl` seconds expire; when the
+    stores in memory exceed `memory_budget` bytes, the least recently used
+    sessions are spilled to `spill_dir` (or dropped if it is not set).
+
+    The shared lock only guards the session table; spilling, reloading and
+    deleting files happen under the lock of the session concerned, so a
+    large session going to or coming back from disk never holds up requests
+    of other sessions.
+    """
+    def __init__(self, ttl=SESSION_TTL_SECONDS, memory_budget=SESSION_MEMORY_BUDGET_MB * 1024 * 1024,
+                 spill_dir=SESSION_SPILL_DIR):
+        self.ttl = ttl
+        self.memory_budget = memory_budget
+        self.spill_dir = spill_dir
+        self.expired = 0
+        self.evictions = 0
+        self.spills = 0
+        # Least recently used first
+        self._sessions = OrderedDict()
+        self._lock = threading.Lock()
+        self._remove_stale_spills()
+
+    def _remove_stale_spills(self):
+        # Spilled by an earlier process and idle for longer than the TTL by now
+        if not self.spill_dir or self.ttl <= 0 or not os.path.isdir(self.spill_dir):
+            return
+        now = time.time()
+        for name in os.listdir(self.spill_dir):
+            path = os.path.join(self.spill_dir, name)
+            if now - os.path.getmtime(path) > self.ttl:
+                shutil.rmtree(path, ignore_errors=True)
+
+    def spill_path(self, session_id):
+        # Session ids come from clients: never use them as a path directly
+        return os.path.join(self.spill_dir, hashlib.sha256(session_id.encode("utf-8")).hexdigest()[:32])
+
+    def get(self, session_id):
+        """
+        The vector store of `session_id`, or None if it has none (or it expired).
+        A spilled store is loaded back into memory.
+        """
+        with self._lock:
+            now = time.monotonic()
+            expired = self._expire(now)
+            entry = self._sessions.get(session_id)
+            if entry is not None:
+                entry.last_used = now
+                self._sessions.move_to_end(session_id)
+        self._remove(expired)
+        if entry is None:
+            return None
+        vector_store = entry.store
+        if vector_store is None:
+            vector_store = self._unspill(session_id, entry)
+        return vector_store
+
+    def put(self, session_id, vector_store):
+        """
+        Makes `vector_store` the index of `session_id`.
+        """
+        with self._lock:
+            now = time.monotonic()
+            expired = self._expire(now)
+            previous = self._sessions.pop(session_id, None)
+            self._sessions[session_id] = SessionEntry(vector_store, now)
+            victims = self._over_budget(session_id)
+        self._remove(expired + ([previous] if previous is not None else []))
+        self._spill(victims)
+
+    def add(self, session_id, documents, vectors, embeddings):
+        """
+        Adds embedded chunks to the index of `session_id`, creating it if
+        needed. Returns the session's vector store.
+        """
+        with self._lock:
+            now = time.monotonic()
+            expired = self._expire(now)
+            entry = self._sessions.get(session_id)
+            if entry is None:
+                # Claimed now, filled in below
+                entry = self._sessions[session_id] = SessionEntry(None, now, embeddings)
+            entry.last_used = now
+            self._sessions.move_to_end(session_id)
+        self._remove(expired)
+
+        with entry.lock:
+            vector_store, spilled = entry.store, entry.path
+            try:
+                if vector_store is None and spilled is not None:
+                    vector_store = load_store(spilled, entry.embeddings)
+                vector_store = add_to_store(vector_store, documents, vectors, embeddings)
+            except Exception:
+                with self._lock:
+                    # Never leave a claimed but empty session behind
+                    if entry.store is None and entry.path is None and self._sessions.get(session_id) is entry:
+                        del self._sessions[session_id]
+                raise
+            with self._lock:
+                entry.store, entry.path = vector_store, None
+                entry.size = store_memory_bytes(vector_store)
+                victims = self._over_budget(session_id)
+            if spilled is not None:
+                shutil.rmtree(spilled, ignore_errors=True)
+        self._spill(victims)
+        return vector_store
+
+    def _unspill(self, session_id, entry):
+        # Only requests of this session wait for the load. The files are
+        # unlinked once mapped, so a later spill writes a fresh copy.
+        victims = []
+        with entry.lock:
+            if entry.store is None and entry.path is not None:
+                vector_store = load_store(entry.path, entry.embeddings)
+                with self._lock:
+                    entry.store, spilled, entry.path = vector_store, entry.path, None
+                    entry.size = store_memory_bytes(vector_store)
+                    victims = self._over_budget(session_id)
+                shutil.rmtree(spilled, ignore_errors=True)
+            vector_store = entry.store
+        self._spill(victims)
+        return vector_store
+
+    def _spill(self, victims):
+        for session_id, entry in victims:
+            with entry.lock:
+                with self._lock:
+                    if self._sessions.get(session_id) is not entry:
+                        # Deleted or replaced since it was picked
+                        entry.spilling = False
+                        continue
+                # A fresh directory per spill: files of a deleted session with
+                # the same id may still be being removed
+                path = f"{self.spill_path(session_id)}-{uuid.uuid4().hex[:8]}"
+                try:
+                    save_store(entry.store, path)
+                except Exception as e:
+                    print(f"⚠️ Could not spill session index: {e}")
+                    shutil.rmtree(path, ignore_errors=True)
+                    with self._lock:
+                        entry.spilling = False
+                    continue
+                with self._lock:
+                    entry.spilling = False
+                    current = self._sessions.get(session_id) is entry
+                    if current:
+                        entry.store, entry.path = None, path
+                        self.spills += 1
+                if not current:
+                    # Deleted or replaced while it was being written
+                    shutil.rmtree(path, ignore_errors=True)
+
+    def delete(self, session_id):
+        """
+        Drops `session_id` from memory and disk. Returns False if it had no index.
+        """
+        with self._lock:
+            entry = self._sessions.pop(session_id, None)
+        if entry is None:
+            return False
+        self._remove([entry])
+        return True
+
+    def _remove(self, entries):
+        # Deletes the spilled files of entries already taken out of the table
+        for entry in entries:
+            with entry.lock:
+                if entry.path is not None:
+                    shutil.rmtree(entry.path, ignore_errors=True)
+                    entry.path = None
+
+    def _expire(self, now):
+        # Callers hold self._lock. Returns the expired entries, whose files
+        # are removed after the lock is released.
+        expired = []
+        if self.ttl <= 0:
+            return expired
+        for session_id, entry in list(self._sessions.items()):
+            # Ordered by last use: the rest were used more recently
+            if now - entry.last_used <= self.ttl:
+                break
+            expired.append(self._sessions.pop(session_id))
+            self.expired += 1
+        return expired
+
+    def _over_budget(self, keep):
+        # Callers hold self._lock. Drops least recently used stores until the
+        # budget is met, or (with a spill dir) marks them and returns them as
+        # (session_id, entry) pairs for _spill to write out after the lock
+        # is released.
+        victims = []
+        if self.memory_budget <= 0:
+            return victims
+        in_memory = [(session_id, entry) for session_id, entry in self._sessions.items()
+                     if entry.store is not None and not entry.spilling]
+        total = sum(entry.size for _, entry in in_memory)
+        for session_id, entry in in_memory:
+            if total <= self.memory_budget:
+                break
+            if session_id == keep:
+                continue
+            total -= entry.size
+            if self.spill_dir:
+                entry.spilling = True
+                victims.append((session_id, entry))
+            else:
+                del self._sessions[session_id]
+                self.evictions += 1
+        return victims
+
+    def stats(self):
+        with self._lock:
+            expired = self._expire(time.monotonic())
+            in_memory = [entry for entry in self._sessions.values() if entry.store is not None]
+            stats = {
+                "sessions": len(self._sessions),
+                "in_memory": len(in_memory),
+                "spilled": sum(1 for entry in self._sessions.values() if entry.path is not None),
+                "memory_bytes": sum(entry.size for entry in in_memory),
+                "memory_budget_bytes": self.memory_budget,
+                "expired": self.expired,
+                "evictions": self.evictions,
+                "spills": self.spills,
+            }
+        self._remove(expired)
+        return stats
@@ -35,6 +35,55 @@ def sample_pdf_bytes():
     return buffer.getvalue()
 
 
+@pytest.fixture
+def multi_page_pdf_bytes():
+    """Create a multi-page PDF in memory with distinct text on every page."""
+    buffer = io.BytesIO()
+    pdf = canvas.Canvas(buffer, pagesize=letter)
+
+    for page_number in range(1, 6):
+        y = 750
+        for line in range(40):
+            pdf.drawString(50, y, f"Page {page_number} clause {line}: the parties agree to the terms herein.")
+            y -= 16
+        pdf.showPage()
+
+    pdf.save()
+
+    buffer.seek(0)
+    return buffer.getvalue()
+
+
+@pytest.fixture
+def make_store():
+    """
+    Factory for small FAISS stores on 8-dimensional fake embeddings.
+    make_store(texts, metadata) adds one chunk per text; pass `documents`
+    instead to keep their own metadata. With `seed`, the vectors are
+    reproducible and the ids are "id-<seed>-<i>".
+    """
+    import numpy as np
+    from langchain_core.documents import Document
+    from langchain_core.embeddings import FakeEmbeddings
+    from backend.ingest_cache import add_to_store
+
+    embeddings = FakeEmbeddings(size=8)
+
+    def make(texts=(), metadata=None, documents=None, seed=None):
+        if documents is None:
+            documents = [Document(page_content=text, metadata=dict(metadata or {})) for text in texts]
+        if seed is None:
+            vectors = embeddings.embed_documents([doc.page_content for doc in documents])
+            ids = None
+        else:
+            rng = np.random.default_rng(seed)
+            vectors = rng.standard_normal((len(documents), 8)).astype(np.float32).tolist()
+            ids = [f"id-{seed}-{i}" for i in range(len(documents))]
+        return add_to_store(None, documents, vectors, embeddings, ids=ids)
+
+    return make
+
+
 @pytest.fixture
 def sample_pdf_file(sample_pdf_bytes, tmp_path):
     """Create a temporary PDF file for testing."""
@@ -0,0 +1,160 @@
+"""
+Tests for automatic flat/HNSW/IVF index selection.
+"""
+import numpy as np
+import pytest
+from unittest.mock import patch
+from langchain_core.documents import Document
+from langchain_core.embeddings import FakeEmbeddings
+from langchain_community.vectorstores import FAISS
+from backend import ann_index
+from backend.ann_index import choose_index_kind, delete_from_store, index_kind, ivf_list_count, search_index
+from backend.ingest_cache import add_to_store
+
+DIM = 16
+
+
+@pytest.fixture
+def small_thresholds():
+    """Flat up to 50 vectors, HNSW up to 200, IVF beyond."""
+    with patch.object(ann_index, "ANN_FLAT_MAX_VECTORS", 50), \
+            patch.object(ann_index, "ANN_HNSW_MAX_VECTORS", 200):
+        yield
+
+
+def make_batch(start, count):
+    rng = np.random.default_rng(start)
+    documents = [Document(page_content=f"chunk {i}", metadata={"n": i}) for i in range(start, start + count)]
+    return documents, rng.standard_normal((count, DIM)).astype(np.float32).tolist()
+
+
+def grow(vector_store, start, count):
+    documents, vectors = make_batch(start, count)
+    return add_to_store(vector_store, documents, vectors, FakeEmbeddings(size=DIM),
+                        ids=[f"id-{doc.metadata['n']}" for doc in documents]), vectors
+
+
+def assert_nearest_is_self(vector_store, vectors, first):
+    for offset, vector in enumerate(vectors):
+        found = vector_store.similarity_search_by_vector(vector, k=1)[0]
+        assert found.metadata["n"] == first + offset
+
+
+class TestChooseIndexKind:
+    """Test suite for choose_index_kind."""
+
+    def test_thresholds(self, small_thresholds):
+        assert choose_index_kind(10) == "flat"
+        assert choose_index_kind(50) == "flat"
+        assert choose_index_kind(51) == "hnsw"
+        assert choose_index_kind(201) == "ivf"
+
+    def test_forced_kind(self):
+        assert choose_index_kind(10, kind="hnsw") == "hnsw"
+        assert choose_index_kind(10000, kind="flat") == "flat"
+
+    def test_ivf_needs_training_points(self):
+        """Test that IVF falls back to flat when a single list cannot be trained."""
+        assert choose_index_kind(10, kind="ivf") == "flat"
+        assert ivf_list_count(400) == 10
+        assert ivf_list_count(1000000) == 4000
+
+
+class TestAutomaticRebuild:
+    """Test that add_to_store switches index types as the corpus grows."""
+
+    def test_flat_to_hnsw_to_ivf(self, small_thresholds):
+        vector_store, first = grow(None, 0, 40)
+        assert index_kind(vector_store.index) == "flat"
+
+        vector_store, second = grow(vector_store, 40, 40)
+        assert index_kind(vector_store.index) == "hnsw"
+        assert ann_index.faiss.downcast_index(vector_store.index).hnsw.efSearch == ann_index.ANN_HNSW_EF_SEARCH
+
+        vector_store, third = grow(vector_store, 80, 160)
+        assert index_kind(vector_store.index) == "ivf"
+        assert vector_store.index.ntotal == 240
+
+        # Positions still map to the right chunks after every rebuild
+        with patch.object(ann_index, "ANN_IVF_NPROBE", 1000):
+            ann_index.configure_search(vector_store.index)
+            assert_nearest_is_self(vector_store, first + second + third, 0)
+
+    def test_ivf_retrains_when_corpus_grows(self, small_thresholds):
+        with patch.object(ann_index, "ANN_HNSW_MAX_VECTORS", 0):
+            vector_store, _ = grow(None, 0, 100)
+            assert index_kind(vector_store.index) == "ivf"
+            nlist = ann_index.faiss.downcast_index(vector_store.index).nlist
+
+            vector_store, _ = grow(vector_store, 100, 400)
+
+        assert ann_index.faiss.downcast_index(vector_store.index).nlist > nlist
+
+    def test_index_type_survives_save_and_load(self, small_thresholds, tmp_path):
+        vector_store, vectors = grow(None, 0, 80)
+        vector_store.save_local(str(tmp_path))
+
+        loaded = FAISS.load_local(str(tmp_path), FakeEmbeddings(size=DIM), allow_dangerous_deserialization=True)
+
+        assert index_kind(loaded.index) == "hnsw"
+        assert ann_index.faiss.downcast_index(loaded.index).hnsw.efSearch == ann_index.ANN_HNSW_EF_SEARCH
+        assert_nearest_is_self(loaded, vectors, 0)
+
+
+class TestDeleteFromStore:
+    """Test suite for delete_from_store."""
+
+    @pytest.mark.parametrize("hnsw_max", [200, 0])
+    def test_delete_keeps_mapping(self, small_thresholds, hnsw_max):
+        """Test deletion from HNSW and IVF indexes."""
+        with patch.object(ann_index, "ANN_HNSW_MAX_VECTORS", hnsw_max), \
+                patch.object(ann_index, "ANN_IVF_NPROBE", 1000):
+            vector_store, vectors = grow(None, 0, 120)
+            kind = index_kind(vector_store.index)
+
+            delete_from_store(vector_store, [f"id-{i}" for i in range(0, 120, 3)])
+
+            assert index_kind(vector_store.index) == kind
+            assert vector_store.index.ntotal == 80
+            kept = [(i, vector) for i, vector in enumerate(vectors) if i % 3]
+            for i, vector in kept:
+                assert vector_store.similarity_search_by_vector(vector, k=1)[0].metadata["n"] == i
+
+
+class TestSearchIndex:
+    """Test suite for search_index restrictions."""
+
+    @pytest.mark.parametrize("hnsw_max", [200, 0])
+    @pytest.mark.parametrize("exact_max", [1000, 10])
+    def test_include_searches_only_those_ids(self, small_thresholds, hnsw_max, exact_max):
+        """Test restricted search on HNSW/IVF, exactly and through an IDSelector."""
+        with patch.object(ann_index, "ANN_HNSW_MAX_VECTORS", hnsw_max), \
+                patch.object(ann_index, "ANN_IVF_NPROBE", 1000):
+            vector_store, vectors = grow(None, 0, 120)
+        index = vector_store.index
+        include = np.arange(40, 80)
+        exclude = np.arange(40, 50)
+        queries = np.asarray(vectors[::10], dtype=np.float32)
+
+        with patch.object(ann_index, "ANN_FLAT_MAX_VECTORS", exact_max):
+            _, found = search_index(index, queries, 5, exclude=exclude, include=include)
+
+        allowed = np.asarray(vectors, dtype=np.float32)[50:80]
+        for query, row in zip(queries, found):
+            expected = 50 + np.argsort(((allowed - query) ** 2).sum(axis=1))[:5]
+            assert row.tolist() == expected.tolist()
+
+    def test_empty_include_finds_nothing(self):
+        vector_store, vectors = grow(None, 0, 10)
+
+        distances, found = search_index(vector_store.index, np.asarray(vectors[:2], dtype=np.float32), 3, include=[])
+
+        assert found.tolist() == [[-1] * 3] * 2
+
+    def test_fewer_matches_than_k(self):
+        vector_store, vectors = grow(None, 0, 10)
+
+        _, found = search_index(vector_store.index, np.asarray(vectors[:1], dtype=np.float32), 3, include=[4, 7])
+
+        assert sorted(found[0][:2].tolist()) == [4, 7]
+        assert found[0][2] == -1
@@ -28,25 +28,32 @@ class TestAPIEndpoints:
         assert "status" in data or "service" in data
     
     @patch('backend.main.PDFProcessor')
-    @patch('backend.main.HuggingFaceEmbeddings')
-    @patch('backend.main.FAISS')
-    def test_upload_pdf_endpoint(self, mock_faiss, mock_embeddings, mock_processor, 
-                                 fastapi_test_client, sample_pdf_bytes):
+    @patch('backend.main.get_embeddings')
+    @patch('backend.main.add_to_store')
+    @patch('backend.main.ingest_cache')
+    @patch('backend.main.write_segment', return_value="v1")
+    @patch('backend.main.sessions')
+    def test_upload_pdf_endpoint(self, mock_sessions, mock_write, mock_cache, mock_add_to_store, mock_embeddings,
+                                 mock_processor, fastapi_test_client, sample_pdf_bytes):
         """Test PDF upload endpoint."""
+        mock_cache.get.return_value = None
+        mock_sessions.get.return_value = None
+
         # Mock the processor
         mock_proc_instance = MagicMock()
-        mock_proc_instance.process_pdf.return_value = [
+        mock_proc_instance.iter_chunks.return_value = iter([
             MagicMock(page_content="Test content", metadata={"source": "test.pdf"})
-        ]
+        ])
         mock_processor.return_value = mock_proc_instance
         
         # Mock embeddings
         mock_emb_instance = MagicMock()
         mock_embeddings.return_value = mock_emb_instance
         
-        # Mock FAISS
+        # Mock the vector store
         mock_vs = MagicMock()
-        mock_faiss.from_documents.return_value = mock_vs
+        mock_vs.index.ntotal = 1
+        mock_add_to_store.return_value = mock_vs
         
         # Create file upload
         files = {"file": ("test.pdf", io.BytesIO(sample_pdf_bytes), "application/pdf")}
@@ -59,12 +66,38 @@ class TestAPIEndpoints:
         if response.status_code == 200:
             data = response.json()
             assert "message" in data or "chunks" in data
+
+    @patch('backend.main.PDFProcessor')
+    @patch('backend.main.get_embeddings')
+    @patch('backend.main.add_to_store')
+    @patch('backend.main.ingest_cache')
+    @patch('backend.main.write_segment', return_value="v1")
+    def test_upload_pdf_cache_hit_skips_processing(self, mock_write, mock_cache, mock_add_to_store, mock_embeddings,
+                                                   mock_processor, fastapi_test_client, sample_pdf_bytes, tmp_path):
+        """Test that re-uploading an identical PDF reuses cached chunks and vectors."""
+        cached_docs = [MagicMock(page_content="Cached content", metadata={"source": "test.pdf", "page": 1})]
+        mock_cache.get.return_value = (cached_docs, [[0.1] * 384])
+        mock_add_to_store.return_value = MagicMock()
+        mock_add_to_store.return_value.index.ntotal = 1
+
+        files = {"file": ("test.pdf", io.BytesIO(sample_pdf_bytes), "application/pdf")}
+        with patch('backend.main.DB_DIR', str(tmp_path / "db")), patch('backend.main.sessions') as mock_sessions:
+            mock_sessions.get.return_value = None
+            response = fastapi_test_client.post("/upload", files=files)
+
+        assert response.status_code == 200
+        assert response.json()["chunks"] == 1
+        mock_sessions.put.assert_called_once_with("default", mock_add_to_store.return_value)
+        mock_processor.assert_not_called()
+        mock_embeddings.return_value.embed_documents.assert_not_called()
+        mock_cache.put.assert_not_called()
+        mock_cache.put_store.assert_not_called()
     
     @patch('backend.main.chat_with_bot')
-    @patch('backend.main.vector_store')
-    def test_chat_endpoint_success(self, mock_vs, mock_chat, fastapi_test_client, mock_groq_api_key):
+    @patch('backend.main.sessions')
+    def test_chat_endpoint_success(self, mock_sessions, mock_chat, fastapi_test_client, mock_groq_api_key):
         """Test chat endpoint with valid request."""
-        mock_vs.return_value = MagicMock()
+        mock_sessions.get.return_value = MagicMock()
         mock_chat.return_value = {
             "answer": "Test answer",
             "context": ["Test context"]
@@ -0,0 +1,79 @@
+"""
+Unit tests for the offset-based chunker.
+"""
+import random
+import pytest
+from langchain_core.documents import Document
+from langchain_text_splitters import RecursiveCharacterTextSplitter
+from backend.chunker import OffsetTextSplitter
+
+
+def contract_text(seed, paragraphs=12):
+    """Realistic page text: numbered lines, paragraphs, no repeated lines."""
+    rng = random.Random(seed)
+    words = ["agreement", "party", "shall", "terms", "liability", "clause", "payment", "notice"]
+    lines = []
+    for p in range(paragraphs):
+        for line in range(rng.randint(1, 8)):
+            lines.append(f"{seed}.{p}.{line} " + " ".join(rng.choice(words) for _ in range(rng.randint(3, 30))))
+        lines.append("")
+    return "\n".join(lines)
+
+
+class TestOffsetTextSplitter:
+    """Test suite for OffsetTextSplitter."""
+
+    @pytest.mark.parametrize("chunk_size,chunk_overlap", [(1000, 200), (300, 50), (120, 0)])
+    def test_matches_recursive_character_splitter(self, chunk_size, chunk_overlap):
+        """Test that chunks and start_index match LangChain's splitter."""
+        reference = RecursiveCharacterTextSplitter(
+            chunk_size=chunk_size, chunk_overlap=chunk_overlap, length_function=len, add_start_index=True
+        )
+        splitter = OffsetTextSplitter(chunk_size=chunk_size, chunk_overlap=chunk_overlap)
+        docs = [Document(page_content=contract_text(seed), metadata={"source": "c.pdf", "page": seed})
+                for seed in range(20)]
+
+        expected = reference.split_documents(docs)
+        actual = splitter.split_documents(docs)
+
+        assert [(c.page_content, c.metadata) for c in actual] == [(c.page_content, c.metadata) for c in expected]
+
+    def test_long_unbroken_runs_match_reference(self):
+        """Test that words longer than chunk_size fall back to character splits like LangChain."""
+        text = "intro line\n" + "x" * 2500 + " tail words here\n\n" + "y" * 40
+        reference = RecursiveCharacterTextSplitter(chunk_size=1000, chunk_overlap=200, length_function=len)
+
+        assert OffsetTextSplitter(1000, 200).split_text(text) == reference.split_text(text)
+
+    def test_start_index_is_true_offset(self):
+        """Test that start_index points at the chunk's position in the page text."""
+        text = contract_text(3, paragraphs=40)
+        doc = Document(page_content=text, metadata={"page": 1})
+
+        for chunk in OffsetTextSplitter(500, 100).split_documents([doc]):
+            start = chunk.metadata["start_index"]
+            assert text[start:start + len(chunk.page_content)] == chunk.page_content
+            assert chunk.metadata["page"] == 1
+
+    def test_empty_and_whitespace_text(self):
+        """Test that blank pages produce no chunks."""
+        splitter = OffsetTextSplitter()
+
+        assert splitter.split_text("") == []
+        assert splitter.split_text(" \n\n \n") == []
+
+    def test_token_budget(self):
+        """Test chunking by a token length function instead of characters."""
+        def count_tokens(text):
+            return len(text.split())
+
+        splitter = OffsetTextSplitter(chunk_size=50, chunk_overlap=10, length_function=count_tokens)
+        chunks = splitter.split_text(contract_text(7, paragraphs=30))
+
+        assert len(chunks) > 1
+        assert all(count_tokens(chunk) <= 50 for chunk in chunks)
+
+    def test_overlap_larger_than_size_rejected(self):
+        """Test that an invalid window configuration is rejected."""
+        with pytest.raises(ValueError):
+            OffsetTextSplitter(chunk_size=100, chunk_overlap=200)
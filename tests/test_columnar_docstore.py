@@ -0,0 +1,179 @@
+"""
+Tests for the memory-mapped columnar docstore.
+"""
+import os
+import pickle
+import pytest
+from unittest.mock import patch
+from langchain_core.documents import Document
+from langchain_core.embeddings import FakeEmbeddings
+from backend import columnar_docstore
+from backend.columnar_docstore import (
+    ColumnarDocstore, load_store, positions_matching, positions_of, positions_where, save_store,
+)
+from backend.ann_index import all_vectors
+from backend.ingest_cache import add_to_store
+
+DIM = 8
+
+DOCUMENTS = [
+    Document(page_content="Première page — café ☕", metadata={"source": "a.pdf", "page": 1, "start_index": 0}),
+    Document(page_content="Second chunk", metadata={"source": "a.pdf", "page": 2, "scanned": True}),
+    Document(page_content="Third chunk", metadata={"source": "b.pdf", "score": 0.5, "tags": ["x", "y"]}),
+    Document(page_content="", metadata={}),
+]
+
+
+class TestColumnarDocstore:
+    """Test suite for save_store/load_store."""
+
+    def test_round_trip(self, tmp_path, make_store):
+        """Test that texts and metadata of every type come back unchanged."""
+        store = make_store(documents=DOCUMENTS, seed=0)
+        vectors = all_vectors(store.index)
+        save_store(store, str(tmp_path))
+
+        loaded = load_store(str(tmp_path), FakeEmbeddings(size=DIM))
+
+        assert loaded.index_to_docstore_id == store.index_to_docstore_id
+        for doc_id, original in zip(store.index_to_docstore_id.values(), DOCUMENTS):
+            doc = loaded.docstore.search(doc_id)
+            assert doc.page_content == original.page_content
+            assert doc.metadata == original.metadata
+            assert type(doc.metadata.get("scanned", False)) is bool
+        for vector in vectors:
+            assert loaded.similarity_search_by_vector(vector, k=2) == store.similarity_search_by_vector(vector, k=2)
+
+    def test_no_pickle(self, tmp_path, make_store):
+        """Test that nothing is pickled on save or unpickled on load."""
+        store = make_store(documents=DOCUMENTS, seed=0)
+        with patch.object(pickle, "dump", side_effect=AssertionError("pickled")):
+            save_store(store, str(tmp_path))
+        assert not os.path.exists(tmp_path / "index.pkl")
+
+        with patch.object(pickle, "load", side_effect=AssertionError("unpickled")), \
+                patch.object(pickle, "loads", side_effect=AssertionError("unpickled")):
+            load_store(str(tmp_path), FakeEmbeddings(size=DIM))
+
+    def test_only_hits_are_decoded(self, tmp_path, make_store):
+        """Test that opening decodes no text and a search decodes only its top-k."""
+        documents = [Document(page_content=f"chunk {i}", metadata={"page": i}) for i in range(50)]
+        store = make_store(documents=documents, seed=0)
+        vectors = all_vectors(store.index)
+        save_store(store, str(tmp_path))
+
+        with patch.object(columnar_docstore.zlib, "decompress", wraps=columnar_docstore.zlib.decompress) as mock:
+            loaded = load_store(str(tmp_path), FakeEmbeddings(size=DIM))
+            assert mock.call_count == 0
+            results = loaded.similarity_search_by_vector(vectors[7], k=3)
+
+        assert mock.call_count == 3
+        assert results[0].page_content == "chunk 7"
+
+    def test_texts_are_compressed(self, tmp_path, make_store):
+        documents = [Document(page_content="The Supplier shall deliver the goods. " * 50, metadata={})] * 20
+        store = make_store(documents=documents, seed=0)
+        save_store(store, str(tmp_path))
+
+        raw = sum(len(doc.page_content.encode("utf-8")) for doc in documents)
+        assert os.path.getsize(tmp_path / columnar_docstore.TEXTS_FILE) < raw / 10
+
+    def test_add_and_delete_after_load(self, tmp_path, make_store):
+        """Test that a loaded store can be modified and saved again."""
+        store = make_store(documents=DOCUMENTS, seed=0)
+        save_store(store, str(tmp_path / "v1"))
+        loaded = load_store(str(tmp_path / "v1"), FakeEmbeddings(size=DIM))
+
+        add_to_store(loaded, [Document(page_content="New chunk", metadata={"source": "c.pdf"})],
+                     [[0.0] * DIM], FakeEmbeddings(size=DIM), ids=["new"])
+        loaded.delete(["id-0-1"])
+        with pytest.raises(ValueError):
+            loaded.docstore.add({"id-0-0": DOCUMENTS[0]})
+        save_store(loaded, str(tmp_path / "v2"))
+
+        reloaded = load_store(str(tmp_path / "v2"), FakeEmbeddings(size=DIM))
+        contents = [reloaded.docstore.search(doc_id).page_content for doc_id in reloaded.index_to_docstore_id.values()]
+        assert contents == ["Première page — café ☕", "Third chunk", "", "New chunk"]
+        assert reloaded.docstore.search("id-0-1") == "ID id-0-1 not found."
+        assert len(reloaded.docstore) == 4
+
+    def test_posting_lists_find_a_document(self, tmp_path, make_store):
+        """Test that the chunks of one source are found without decoding others."""
+        store = make_store(documents=DOCUMENTS, seed=0)
+        save_store(store, str(tmp_path))
+        loaded = load_store(str(tmp_path), FakeEmbeddings(size=DIM))
+        add_to_store(loaded, [Document(page_content="New chunk", metadata={"source": "a.pdf"})],
+                     [[0.0] * DIM], FakeEmbeddings(size=DIM), ids=["new"])
+
+        assert loaded.docstore.rows_where("source", "a.pdf").tolist() == [0, 1]
+        assert loaded.docstore.rows_where("page", 2).tolist() == [1]
+        assert loaded.docstore.rows_where("source", "missing.pdf").tolist() == []
+        with patch.object(ColumnarDocstore, "_read", side_effect=AssertionError("decoded")):
+            assert positions_where(loaded, "source", "b.pdf") == [2]
+            assert positions_of(loaded, ["id-0-2", "id-0-0", "unknown"]) == [0, 2]
+        assert positions_where(loaded, "source", "a.pdf") == [0, 1, 4]
+        assert positions_of(loaded, ["new"]) == [4]
+        # A plain in-memory store gives the same answers from its position index
+        assert positions_where(store, "source", "a.pdf") == [0, 1]
+
+    def test_source_and_page_filters(self, tmp_path, make_store):
+        """Test that filtering the columns finds the same chunks as a scan."""
+        documents = [Document(page_content=f"{source} p{page}", metadata={"source": source, "page": page})
+                     for source in ("a.pdf", "b.pdf", "c.pdf") for page in range(1, 6)]
+        documents.append(Document(page_content="no page", metadata={"source": "a.pdf"}))
+        store = make_store(documents=documents, seed=0)
+        save_store(store, str(tmp_path))
+        loaded = load_store(str(tmp_path), FakeEmbeddings(size=DIM))
+
+        filters = [({"a.pdf"}, None), ({"a.pdf", "c.pdf"}, (2, 3)), (None, (4, None)), (None, (None, 1)),
+                   ({"missing.pdf"}, None), ({"b.pdf"}, (9, 10))]
+        for sources, pages in filters:
+            expected = positions_matching(store, sources, pages)
+            with patch.object(ColumnarDocstore, "_read", side_effect=AssertionError("decoded")):
+                assert positions_matching(loaded, sources, pages) == expected
+        assert positions_matching(loaded, {"a.pdf"}, (2, 3)) == [1, 2]
+        assert positions_matching(loaded, {"a.pdf"}, None) == [0, 1, 2, 3, 4, 15]
+
+    def test_in_memory_filters_are_indexed(self, make_store):
+        """Test that an in-memory store is read once, then filtered from its position index."""
+        documents = [Document(page_content=f"{source} p{page}", metadata={"source": source, "page": page})
+                     for source in ("a.pdf", "b.pdf") for page in range(1, 6)]
+        documents.append(Document(page_content="no page", metadata={"source": "a.pdf"}))
+        store = make_store(documents=documents, seed=0)
+
+        assert positions_matching(store, {"a.pdf"}, (2, 3)) == [1, 2]
+        with patch.object(store.docstore, "search", side_effect=AssertionError("scanned")):
+            assert positions_matching(store, {"a.pdf"}, None) == [0, 1, 2, 3, 4, 10]
+            assert positions_matching(store, None, (5, None)) == [4, 9]
+            assert positions_where(store, "source", "b.pdf") == [5, 6, 7, 8, 9]
+
+        # Added chunks are indexed on the next query, without rereading the others
+        add_to_store(store, [Document(page_content="new", metadata={"source": "b.pdf", "page": 3})],
+                     [[0.0] * DIM], FakeEmbeddings(size=DIM), ids=["new"])
+        with patch.object(store.docstore, "search", wraps=store.docstore.search) as mock:
+            assert positions_matching(store, {"b.pdf"}, (3, 3)) == [7, 11]
+        assert mock.call_count == 1
+
+        # Deleting renumbers the positions
+        store.delete(["id-0-0", "id-0-7"])
+        assert positions_matching(store, {"a.pdf", "b.pdf"}, (3, 3)) == [1, 9]
+        assert positions_where(store, "source", "a.pdf") == [0, 1, 2, 3, 8]
+
+    def test_empty_store(self, tmp_path, make_store):
+        store = make_store(["only"], seed=0)
+        store.delete(list(store.index_to_docstore_id.values()))
+        save_store(store, str(tmp_path))
+
+        loaded = load_store(str(tmp_path), FakeEmbeddings(size=DIM))
+
+        assert loaded.index.ntotal == 0
+        assert len(loaded.docstore) == 0
+
+    def test_unknown_format_is_rejected(self, tmp_path, make_store):
+        store = make_store(documents=DOCUMENTS, seed=0)
+        save_store(store, str(tmp_path))
+        meta = tmp_path / columnar_docstore.META_FILE
+        meta.write_text(meta.read_text().replace('"format": 1', '"format": 99'))
+
+        with pytest.raises(ValueError):
+            ColumnarDocstore(str(tmp_path))
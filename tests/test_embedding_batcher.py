@@ -0,0 +1,123 @@
+"""
+Unit tests for the micro-batching embedding service.
+"""
+import threading
+import time
+import pytest
+from unittest.mock import patch
+from langchain_core.embeddings import Embeddings, FakeEmbeddings
+from backend import embedding_registry as registry_module
+from backend.embedding_batcher import MicroBatchingEmbeddings
+from backend.embedding_registry import EmbeddingRegistry
+
+
+class SlowEmbeddings(Embeddings):
+    """Deterministic model that takes a fixed time per call and records batches."""
+    def __init__(self, delay=0.05):
+        self.delay = delay
+        self.calls = []
+
+    def embed_documents(self, texts):
+        self.calls.append(list(texts))
+        time.sleep(self.delay)
+        return [[float(len(text)), float(sum(map(ord, text)))] for text in texts]
+
+    def embed_query(self, text):
+        return self.embed_documents([text])[0]
+
+
+def run_concurrently(fn, args_list):
+    results = [None] * len(args_list)
+
+    def worker(i, args):
+        results[i] = fn(*args)
+
+    threads = [threading.Thread(target=worker, args=(i, args)) for i, args in enumerate(args_list)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results
+
+
+class TestMicroBatchingEmbeddings:
+    """Test suite for MicroBatchingEmbeddings."""
+
+    def test_concurrent_calls_share_forward_passes(self):
+        """Test that concurrent callers are batched and each gets its own vectors."""
+        model = SlowEmbeddings()
+        batcher = MicroBatchingEmbeddings(model, max_batch_size=64, max_wait_ms=20)
+        queries = [f"question {i}" for i in range(8)]
+
+        vectors = run_concurrently(batcher.embed_query, [(q,) for q in queries])
+        documents = run_concurrently(batcher.embed_documents, [(["a", "bb"],), (["ccc"],), (["dddd", "e"],)])
+
+        assert vectors == [model.embed_query(q) for q in queries]
+        assert documents == [[[1.0, 97.0], [2.0, 196.0]], [[3.0, 297.0]], [[4.0, 400.0], [1.0, 101.0]]]
+        stats = batcher.stats()
+        assert stats["requests"] == 11
+        assert stats["batches"] < 11
+
+    def test_batches_respect_max_size(self):
+        """Test that no forward pass exceeds max_batch_size texts."""
+        model = SlowEmbeddings(delay=0.02)
+        batcher = MicroBatchingEmbeddings(model, max_batch_size=4, max_wait_ms=20)
+
+        run_concurrently(batcher.embed_documents, [([f"t{i}a", f"t{i}b"],) for i in range(6)])
+
+        assert all(len(call) <= 4 for call in model.calls)
+        assert sorted(text for call in model.calls for text in call) == \
+            sorted(f"t{i}{s}" for i in range(6) for s in "ab")
+
+    def test_query_is_served_during_large_document_batch(self):
+        """Test that a query does not wait for a whole ingest batch to be encoded."""
+        model = SlowEmbeddings(delay=0.02)
+        batcher = MicroBatchingEmbeddings(model, max_batch_size=8, max_wait_ms=0)
+        texts = [f"chunk {i}" for i in range(80)]
+        finished = {}
+
+        def ingest():
+            finished["documents"] = (batcher.embed_documents(texts), time.perf_counter())
+
+        thread = threading.Thread(target=ingest)
+        thread.start()
+        time.sleep(0.05)
+        vector = batcher.embed_query("question")
+        finished["query"] = time.perf_counter()
+        thread.join()
+        calls = list(model.calls)
+
+        documents, documents_finished = finished["documents"]
+        assert finished["query"] < documents_finished
+        assert all(len(call) <= 8 for call in calls)
+        assert vector == model.embed_query("question")
+        assert documents == model.embed_documents(texts)
+
+    def test_lone_caller_is_not_delayed(self):
+        """Test that a single request does not wait for the batching window."""
+        batcher = MicroBatchingEmbeddings(SlowEmbeddings(delay=0), max_wait_ms=500)
+        batcher.embed_query("warm")
+
+        start = time.perf_counter()
+        batcher.embed_query("only one")
+        assert time.perf_counter() - start < 0.25
+
+    def test_errors_reach_every_caller_in_batch(self):
+        """Test that a failing forward pass raises in the callers and the service keeps running."""
+        model = SlowEmbeddings(delay=0)
+        batcher = MicroBatchingEmbeddings(model)
+
+        with patch.object(model, "embed_documents", side_effect=RuntimeError("model crashed")):
+            with pytest.raises(RuntimeError, match="model crashed"):
+                batcher.embed_documents(["x"])
+        assert batcher.embed_documents(["x"]) == [[1.0, 120.0]]
+
+    def test_registry_wraps_models_when_enabled(self):
+        """Test that the registry puts the batcher in front of the model and reports its stats."""
+        with patch.object(registry_module, "HuggingFaceEmbeddings", lambda model_name: FakeEmbeddings(size=4)):
+            registry = EmbeddingRegistry(micro_batch_size=16)
+            embeddings = registry.get("mini")
+
+        assert isinstance(embeddings, MicroBatchingEmbeddings)
+        assert len(embeddings.embed_documents(["a", "b"])) == 2
+        assert registry.stats()["models"]["mini"]["micro_batching"]["batches"] == 1
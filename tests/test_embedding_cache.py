@@ -0,0 +1,85 @@
+"""
+Unit tests for the persistent embedding cache.
+"""
+import pytest
+from unittest.mock import patch
+from langchain_core.embeddings import FakeEmbeddings
+from backend import embedding_registry as registry_module
+from backend.embedding_cache import CachedEmbeddings, EmbeddingCache, normalize_text, text_key
+from backend.embedding_registry import EmbeddingRegistry
+
+
+class CountingEmbeddings(FakeEmbeddings):
+    """FakeEmbeddings that records the texts it was asked to embed."""
+    calls: list = []
+
+    def embed_documents(self, texts):
+        self.calls.append(list(texts))
+        return super().embed_documents(texts)
+
+
+@pytest.fixture
+def cache(tmp_path):
+    cache = EmbeddingCache(path=str(tmp_path / "embeddings.sqlite3"))
+    yield cache
+    cache.close()
+
+
+class TestEmbeddingCache:
+    """Test suite for EmbeddingCache and CachedEmbeddings."""
+
+    def test_only_unseen_texts_are_embedded(self, cache):
+        """Test that cached chunks skip the model and duplicates are embedded once."""
+        model = CountingEmbeddings(size=8, calls=[])
+        embeddings = CachedEmbeddings(model, "mini", cache)
+
+        first = embeddings.embed_documents(["boilerplate", "clause 1", "boilerplate"])
+        second = embeddings.embed_documents(["clause 2", "boilerplate"])
+
+        assert model.calls == [["boilerplate", "clause 1"], ["clause 2"]]
+        assert first[0] == first[2] == second[1]
+        stats = cache.stats()
+        assert (stats["hits"], stats["misses"], stats["entries"]) == (1, 4, 3)
+
+    def test_keys_ignore_whitespace_and_separate_models(self):
+        """Test that keys use normalized text and include the model name."""
+        assert normalize_text("  the  party\nshall ") == "the party shall"
+        assert text_key("mini", "the  party\nshall") == text_key("mini", "the party shall")
+        assert text_key("mini", "the party shall") != text_key("other", "the party shall")
+
+    def test_persists_across_instances(self, tmp_path):
+        """Test that vectors written by one cache are read by a new one."""
+        path = str(tmp_path / "embeddings.sqlite3")
+        writer = EmbeddingCache(path=path)
+        writer.put_many([("k1", [0.5, -1.0])])
+        writer.close()
+
+        reader = EmbeddingCache(path=path)
+        assert reader.get_many(["k1", "k2"]) == {"k1": [0.5, -1.0]}
+        reader.close()
+
+    def test_evicts_least_recently_used(self, tmp_path):
+        """Test that the cache stays under its cap, dropping old vectors first."""
+        # Each vector is 4 floats = 16 bytes; room for 4
+        cache = EmbeddingCache(path=str(tmp_path / "embeddings.sqlite3"), max_bytes=64)
+        with patch("backend.embedding_cache.time.time", side_effect=range(100)):
+            cache.put_many([("a", [1.0] * 4), ("b", [2.0] * 4), ("c", [3.0] * 4), ("d", [4.0] * 4)])
+            cache.get_many(["a"])
+            cache.put_many([("e", [5.0] * 4)])
+
+        # Over the cap: the two oldest unused vectors go, down to 90% of it
+        assert set(cache.get_many(["a", "b", "c", "d", "e"])) == {"a", "d", "e"}
+        assert cache.stats()["bytes"] <= 64
+        assert cache.stats()["evictions"] == 2
+        cache.close()
+
+    def test_registry_wraps_models_with_cache(self, cache):
+        """Test that the registry hands out cached embeddings and reports cache stats."""
+        with patch.object(registry_module, "HuggingFaceEmbeddings", lambda model_name: FakeEmbeddings(size=8)):
+            registry = EmbeddingRegistry(cache=cache)
+            embeddings = registry.get("mini")
+
+        assert isinstance(embeddings, CachedEmbeddings)
+        assert len(embeddings.embed_query("what is the term?")) == 8
+        embeddings.embed_documents(["x", "x"])
+        assert registry.stats()["cache"]["entries"] == 1
@@ -0,0 +1,73 @@
+"""
+Unit tests for the process-wide embedding model registry.
+"""
+import threading
+import pytest
+from unittest.mock import patch
+from langchain_core.embeddings import FakeEmbeddings
+from backend import embedding_registry as registry_module
+from backend.embedding_registry import EmbeddingRegistry
+
+
+@pytest.fixture
+def loads():
+    """Patch model loading with FakeEmbeddings and record every load."""
+    calls = []
+
+    def fake_model(model_name, **kwargs):
+        calls.append((model_name, kwargs))
+        return FakeEmbeddings(size=8)
+
+    with patch.object(registry_module, "HuggingFaceEmbeddings", fake_model):
+        yield calls
+
+
+class TestEmbeddingRegistry:
+    """Test suite for EmbeddingRegistry."""
+
+    def test_loads_each_model_once(self, loads):
+        """Test that repeated lookups return the same instance without reloading."""
+        registry = EmbeddingRegistry()
+
+        first = registry.get("model-a", model_kwargs={"device": "cpu"})
+        assert registry.get("model-a") is first
+        registry.get("model-b")
+
+        assert loads == [("model-a", {"model_kwargs": {"device": "cpu"}}), ("model-b", {})]
+
+    def test_concurrent_first_use_loads_once(self, loads):
+        """Test that threads racing on the first lookup share one load."""
+        registry = EmbeddingRegistry()
+        results = []
+        threads = [threading.Thread(target=lambda: results.append(registry.get("model-a"))) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        assert len(loads) == 1
+        assert all(model is results[0] for model in results)
+
+    def test_warm_up_encodes_and_records_stats(self, loads):
+        """Test that warm-up runs a dummy encode and stats report load time and memory."""
+        registry = EmbeddingRegistry()
+        with patch.object(FakeEmbeddings, "embed_query", return_value=[0.0] * 8) as mock_query:
+            registry.warm_up("model-a")
+
+        mock_query.assert_called_once()
+        stats = registry.stats()
+        model_stats = stats["models"]["model-a"]
+        assert model_stats["load_seconds"] >= 0
+        assert model_stats["warmup_seconds"] >= 0
+        assert "memory_bytes" in model_stats
+        assert stats["process_rss_bytes"] is None or stats["process_rss_bytes"] > 0
+
+    def test_diagnostics_endpoint(self, fastapi_test_client):
+        """Test that the backend exposes registry stats."""
+        stats = {"models": {"all-MiniLM-L6-v2": {"load_seconds": 1.5}}, "process_rss_bytes": 1}
+        with patch("backend.main.embedding_registry") as mock_registry:
+            mock_registry.stats.return_value = stats
+            response = fastapi_test_client.get("/diagnostics")
+
+        assert response.status_code == 200
+        assert response.json()["embeddings"] == stats
@@ -0,0 +1,395 @@
+"""
+Tests for versioned index snapshots and the CURRENT pointer.
+"""
+import os
+import numpy as np
+import pytest
+from unittest.mock import patch
+from langchain_core.documents import Document
+from langchain_core.embeddings import FakeEmbeddings
+from langchain_community.vectorstores import FAISS
+from backend import index_snapshots
+from backend.index_snapshots import (
+    CURRENT_FILE, SEGMENTS_DIR, VERSIONS_DIR, collect_snapshots, compact_segments, current_path, current_version,
+    TOMBSTONES_DIR, load_parts, load_snapshot, load_tombstones, read_state, should_compact, write_segment,
+    write_snapshot, write_tombstone,
+)
+from backend.ann_index import rebuild_store_index
+from backend.ingest_cache import add_to_store, merge_stores
+from backend.segmented_store import combine_stores
+
+
+def versions(db_dir):
+    return sorted(os.listdir(os.path.join(db_dir, VERSIONS_DIR)))
+
+
+class TestIndexSnapshots:
+    """Test suite for write_snapshot/load_snapshot."""
+
+    def test_nothing_indexed(self, tmp_path):
+        """Test that an empty directory has no current index."""
+        assert load_snapshot(str(tmp_path), FakeEmbeddings(size=8)) == (None, None)
+        assert current_path(str(tmp_path)) is None
+
+    def test_write_then_load(self, tmp_path, make_store):
+        """Test that a snapshot becomes current and loads back."""
+        db_dir = str(tmp_path)
+        version = write_snapshot(make_store(["alpha", "beta"]), db_dir)
+
+        store, loaded_version = load_snapshot(db_dir, FakeEmbeddings(size=8))
+
+        assert loaded_version == version == current_version(db_dir)
+        assert store.index.ntotal == 2
+        assert versions(db_dir) == [read_state(db_dir)["base"]]
+
+    def test_versions_sort_by_publish_order(self, tmp_path, make_store):
+        """Test that later snapshots have larger version names."""
+        db_dir = str(tmp_path)
+        first = write_snapshot(make_store(["alpha"]), db_dir)
+        second = write_snapshot(make_store(["beta"]), db_dir)
+
+        assert second > first
+        assert current_version(db_dir) == second
+
+    def test_failed_write_keeps_previous_version(self, tmp_path, make_store):
+        """Test that a writer crashing mid-save never changes what readers see."""
+        db_dir = str(tmp_path)
+        version = write_snapshot(make_store(["alpha"]), db_dir)
+
+        broken = make_store(["beta", "gamma"])
+        with patch.object(index_snapshots, "save_store", side_effect=OSError("disk full")):
+            with pytest.raises(OSError):
+                write_snapshot(broken, db_dir)
+
+        store, loaded_version = load_snapshot(db_dir, FakeEmbeddings(size=8))
+        assert loaded_version == version
+        assert store.index.ntotal == 1
+
+    def test_old_versions_are_collected(self, tmp_path, make_store):
+        """Test that only the current and `keep` previous snapshots stay on disk."""
+        db_dir = str(tmp_path)
+        published = []
+        for i in range(4):
+            write_snapshot(make_store([f"doc {i}"]), db_dir, keep=1)
+            published.append(read_state(db_dir)["base"])
+
+        assert versions(db_dir) == published[-2:]
+        assert collect_snapshots(db_dir, keep=0) == [published[-2]]
+        assert versions(db_dir) == published[-1:]
+
+    def test_stale_temp_dirs_are_collected(self, tmp_path, make_store):
+        """Test that leftovers of crashed writers are removed once old."""
+        db_dir = str(tmp_path)
+        write_snapshot(make_store(["alpha"]), db_dir)
+        stale = os.path.join(db_dir, VERSIONS_DIR, ".0-dead.tmp")
+        fresh = os.path.join(db_dir, VERSIONS_DIR, ".1-live.tmp")
+        os.makedirs(stale)
+        os.makedirs(fresh)
+        old = os.path.getmtime(stale) - index_snapshots.STALE_TMP_SECONDS - 1
+        os.utime(stale, (old, old))
+
+        collect_snapshots(db_dir)
+
+        assert not os.path.exists(stale)
+        assert os.path.exists(fresh)
+
+    def test_legacy_layout_is_migrated(self, tmp_path, make_store):
+        """Test that an index saved in db_dir is read, then superseded (not deleted) by the first snapshot."""
+        db_dir = str(tmp_path)
+        make_store(["alpha"]).save_local(db_dir)
+
+        store, version = load_snapshot(db_dir, FakeEmbeddings(size=8))
+        assert version is None
+        assert store.index.ntotal == 1
+
+        write_snapshot(merge_stores(store, make_store(["beta"])), db_dir)
+        collect_snapshots(db_dir, keep=0)
+
+        assert os.path.exists(os.path.join(db_dir, "index.faiss"))
+        assert os.path.exists(os.path.join(db_dir, "index.pkl"))
+        assert current_path(db_dir) != db_dir
+        assert load_snapshot(db_dir, FakeEmbeddings(size=8))[0].index.ntotal == 2
+
+    def test_first_segment_on_legacy_layout_keeps_the_index(self, tmp_path, make_store):
+        """Test that appending to an index saved in db_dir adds to it instead of replacing it."""
+        db_dir = str(tmp_path)
+        make_store(["alpha", "beta", "gamma", "delta"]).save_local(db_dir)
+
+        write_segment(make_store(["upload"]), db_dir)
+        collect_snapshots(db_dir, keep=0)
+
+        state = read_state(db_dir)
+        assert len(state["segments"]) == 1
+        assert os.path.exists(os.path.join(db_dir, "index.faiss"))
+        # The migrated base is re-saved with the columnar docstore: no pickle on later loads
+        assert not os.path.exists(os.path.join(current_path(db_dir), "index.pkl"))
+        with patch.object(FAISS, "load_local") as mock_load_local:
+            assert load_snapshot(db_dir, FakeEmbeddings(size=8))[0].index.ntotal == 5
+        mock_load_local.assert_not_called()
+
+    def test_tombstone_on_legacy_layout(self, tmp_path, make_store):
+        """Test that deleting from an index saved in db_dir migrates it first."""
+        db_dir = str(tmp_path)
+        store = make_store(["alpha", "beta"])
+        store.save_local(db_dir)
+
+        assert write_tombstone(db_dir, [store.index_to_docstore_id[0]], embeddings=FakeEmbeddings(size=8)) is not None
+
+        loaded = load_snapshot(db_dir, FakeEmbeddings(size=8))[0]
+        assert [loaded.docstore.search(doc_id).page_content for doc_id in loaded.index_to_docstore_id.values()] == \
+            ["beta"]
+
+    def test_load_follows_pointer_if_snapshot_was_collected(self, tmp_path, make_store):
+        """Test that a reader racing with garbage collection retries the new version."""
+        db_dir = str(tmp_path)
+        write_snapshot(make_store(["alpha"]), db_dir)
+        real_load = index_snapshots.load_store
+        calls = []
+
+        def racing_load(path, *args, **kwargs):
+            calls.append(path)
+            if len(calls) == 1:
+                # Writers publish and collect the snapshot this reader picked
+                write_snapshot(make_store(["alpha", "beta"]), db_dir, keep=0)
+                raise RuntimeError("could not open index.faiss")
+            return real_load(path, *args, **kwargs)
+
+        with patch.object(index_snapshots, "load_store", side_effect=racing_load):
+            store, version = load_snapshot(db_dir, FakeEmbeddings(size=8))
+
+        assert len(calls) == 2
+        assert version == current_version(db_dir)
+        assert store.index.ntotal == 2
+
+
+def make_vector_store(start, count, dim=8):
+    """Store with known vectors, so search results can be compared exactly."""
+    rng = np.random.default_rng(start)
+    documents = [Document(page_content=f"chunk {i}", metadata={"n": i}) for i in range(start, start + count)]
+    vectors = rng.standard_normal((count, dim)).astype(np.float32).tolist()
+    return add_to_store(None, documents, vectors, FakeEmbeddings(size=dim)), vectors
+
+
+class TestDeltaSegments:
+    """Test suite for write_segment/compact_segments."""
+
+    def test_first_segment_becomes_base(self, tmp_path, make_store):
+        db_dir = str(tmp_path)
+        name = write_segment(make_store(["alpha"]), db_dir)
+
+        assert read_state(db_dir)["base"] == name
+        assert read_state(db_dir)["segments"] == []
+        assert load_snapshot(db_dir, FakeEmbeddings(size=8))[0].index.ntotal == 1
+
+    def test_segment_leaves_base_untouched(self, tmp_path, make_store):
+        """Test that an upload writes only its own files."""
+        db_dir = str(tmp_path)
+        write_snapshot(make_store(["alpha", "beta"]), db_dir)
+        base_file = os.path.join(current_path(db_dir), "index.faiss")
+        before = os.stat(base_file)
+
+        write_segment(make_store(["gamma"]), db_dir)
+        write_segment(make_store(["delta"]), db_dir)
+
+        after = os.stat(base_file)
+        assert (after.st_ino, after.st_mtime_ns) == (before.st_ino, before.st_mtime_ns)
+        state = read_state(db_dir)
+        assert len(state["segments"]) == 2
+        assert sorted(os.listdir(os.path.join(db_dir, SEGMENTS_DIR))) == state["segments"]
+
+        base, segments, _ = load_parts(db_dir, FakeEmbeddings(size=8))
+        assert base.index.ntotal == 2
+        assert [segment.index.ntotal for segment in segments] == [1, 1]
+        assert load_snapshot(db_dir, FakeEmbeddings(size=8))[0].index.ntotal == 4
+
+    def test_segments_published_while_saving_are_kept(self, tmp_path, make_store):
+        """Test that a writer publishing during another's save does not lose either segment."""
+        db_dir = str(tmp_path)
+        write_snapshot(make_store(["alpha"]), db_dir)
+        real_save = index_snapshots.save_store
+        other = []
+
+        def racing_save(vector_store, path):
+            real_save(vector_store, path)
+            if not other:
+                other.append(None)
+                # Another writer (thread or process) publishes meanwhile
+                other[0] = write_segment(make_store(["gamma"]), db_dir)
+
+        with patch.object(index_snapshots, "save_store", side_effect=racing_save):
+            name = write_segment(make_store(["beta"]), db_dir)
+
+        assert read_state(db_dir)["segments"] == other + [name]
+        assert load_snapshot(db_dir, FakeEmbeddings(size=8))[0].index.ntotal == 3
+
+    def test_load_parts_reuses_loaded_parts(self, tmp_path, make_store):
+        db_dir = str(tmp_path)
+        write_snapshot(make_store(["alpha"]), db_dir)
+        loaded = {}
+        base, _, _ = load_parts(db_dir, FakeEmbeddings(size=8), loaded)
+        write_segment(make_store(["beta"]), db_dir)
+
+        with patch.object(index_snapshots, "load_store", wraps=index_snapshots.load_store) as mock_load:
+            again, segments, _ = load_parts(db_dir, FakeEmbeddings(size=8), loaded)
+
+        assert again is base
+        assert mock_load.call_count == 1
+        assert len(segments) == 1
+
+    def test_segmented_search_matches_single_index(self, tmp_path):
+        """Test that base + segments return the same neighbours as one index."""
+        base, base_vectors = make_vector_store(0, 30)
+        first, first_vectors = make_vector_store(30, 10)
+        second, second_vectors = make_vector_store(40, 10)
+        combined = combine_stores(base, [first, second])
+
+        single, _ = make_vector_store(0, 30)
+        for store in (first, second):
+            merge_stores(single, store)
+
+        for query in (base_vectors + first_vectors + second_vectors)[::7]:
+            expected = [doc.metadata["n"] for doc in single.similarity_search_by_vector(query, k=5)]
+            found = [doc.metadata["n"] for doc in combined.similarity_search_by_vector(query, k=5)]
+            assert found == expected
+        assert combine_stores(base, []) is base
+
+    def test_compaction_folds_segments_and_keeps_newer_ones(self, tmp_path, make_store):
+        db_dir = str(tmp_path)
+        write_snapshot(make_store(["alpha"]), db_dir)
+        write_segment(make_store(["beta"]), db_dir)
+        write_segment(make_store(["gamma"]), db_dir)
+        assert should_compact(db_dir, max_segments=2)
+
+        class UploadDuringCompaction:
+            """Lock that lets another upload publish before the pointer flip."""
+            def acquire(self):
+                write_segment(make_store(["delta"]), db_dir)
+
+            def release(self):
+                pass
+
+        assert compact_segments(db_dir, FakeEmbeddings(size=8), lock=UploadDuringCompaction()) is not None
+
+        base, segments, state = load_parts(db_dir, FakeEmbeddings(size=8))
+        assert base.index.ntotal == 3
+        assert [base.docstore.search(base.index_to_docstore_id[i]).page_content for i in range(3)] == [
+            "alpha", "beta", "gamma"]
+        assert len(state["segments"]) == 1
+        assert segments[0].index.ntotal == 1
+        assert not should_compact(db_dir, max_segments=2)
+
+    def test_unreferenced_segments_are_collected(self, tmp_path, make_store):
+        db_dir = str(tmp_path)
+        write_snapshot(make_store(["alpha"]), db_dir)
+        write_segment(make_store(["beta"]), db_dir)
+        compact_segments(db_dir, FakeEmbeddings(size=8))
+        assert len(os.listdir(os.path.join(db_dir, SEGMENTS_DIR))) == 1
+
+        with patch.object(index_snapshots, "SEGMENT_GRACE_SECONDS", -1):
+            collect_snapshots(db_dir)
+
+        assert os.listdir(os.path.join(db_dir, SEGMENTS_DIR)) == []
+        assert load_snapshot(db_dir, FakeEmbeddings(size=8))[0].index.ntotal == 2
+
+    def test_reads_plain_pointer(self, tmp_path, make_store):
+        """Test that a CURRENT file holding just a version still loads."""
+        db_dir = str(tmp_path)
+        write_snapshot(make_store(["alpha"]), db_dir)
+        base = read_state(db_dir)["base"]
+        with open(os.path.join(db_dir, CURRENT_FILE), "w") as f:
+            f.write(base)
+
+        assert read_state(db_dir) == {"version": base, "base": base, "segments": [], "tombstones": []}
+        assert load_snapshot(db_dir, FakeEmbeddings(size=8))[0].index.ntotal == 1
+
+
+class TestTombstones:
+    """Test suite for deleting documents with write_tombstone."""
+
+    def test_deleted_chunks_are_skipped_by_search(self):
+        """Test that tombstoned chunks are excluded inside the index search."""
+        base, vectors = make_vector_store(0, 30)
+        segment, segment_vectors = make_vector_store(30, 10)
+        deleted = [base.index_to_docstore_id[i] for i in range(0, 30, 2)] + [segment.index_to_docstore_id[0]]
+        combined = combine_stores(base, [segment], deleted)
+
+        single, _ = make_vector_store(0, 30)
+        merge_stores(single, segment)
+        deleted_n = set(range(0, 30, 2)) | {30}
+
+        for query in (vectors + segment_vectors)[::3]:
+            nearest = [doc.metadata["n"] for doc in single.similarity_search_by_vector(query, k=40)]
+            expected = [n for n in nearest if n not in deleted_n][:5]
+            found = [doc.metadata["n"] for doc in combined.similarity_search_by_vector(query, k=5)]
+            assert found == expected
+            assert len(found) == 5
+        assert combined.ntotal == 40 - 16
+
+    def test_deleted_chunks_are_skipped_by_hnsw_search(self):
+        """Test that exclusion also works on non-flat indexes."""
+        base, vectors = make_vector_store(0, 50)
+        rebuild_store_index(base, "hnsw")
+        deleted = {base.index_to_docstore_id[i] for i in range(25)}
+        combined = combine_stores(base, [], deleted)
+
+        for query in vectors[:25]:
+            found = [doc.metadata["n"] for doc in combined.similarity_search_by_vector(query, k=5)]
+            assert len(found) == 5
+            assert all(n >= 25 for n in found)
+
+    def test_tombstone_writes_only_ids(self, tmp_path, make_store):
+        """Test that a deletion is published without rewriting index files."""
+        db_dir = str(tmp_path)
+        store = make_store(["alpha", "beta"])
+        write_snapshot(store, db_dir)
+        base_files = sorted(os.listdir(current_path(db_dir)))
+
+        version = write_tombstone(db_dir, [store.index_to_docstore_id[0]], source="alpha.pdf")
+
+        state = read_state(db_dir)
+        assert state["version"] == version
+        assert len(state["tombstones"]) == 1
+        assert sorted(os.listdir(current_path(db_dir))) == base_files
+        assert load_tombstones(db_dir, state) == {store.index_to_docstore_id[0]}
+        # Writers see the index without the deleted chunks
+        reloaded = load_snapshot(db_dir, FakeEmbeddings(size=8))[0]
+        assert [reloaded.docstore.search(i).page_content for i in reloaded.index_to_docstore_id.values()] == ["beta"]
+        assert write_tombstone(str(tmp_path / "empty"), ["x"]) is None
+
+    def test_segments_keep_tombstones(self, tmp_path, make_store):
+        db_dir = str(tmp_path)
+        store = make_store(["alpha"])
+        write_snapshot(store, db_dir)
+        write_tombstone(db_dir, [store.index_to_docstore_id[0]])
+
+        write_segment(make_store(["beta"]), db_dir)
+
+        assert len(read_state(db_dir)["tombstones"]) == 1
+
+    def test_compaction_removes_deleted_chunks(self, tmp_path, make_store):
+        """Test that compaction reclaims tombstoned chunks and keeps newer deletions."""
+        db_dir = str(tmp_path)
+        store = make_store(["alpha", "beta", "gamma"])
+        write_snapshot(store, db_dir)
+        write_tombstone(db_dir, [store.index_to_docstore_id[0]])
+        write_tombstone(db_dir, [store.index_to_docstore_id[1]])
+        assert should_compact(db_dir, max_segments=2)
+
+        class DeleteDuringCompaction:
+            """Lock that lets another deletion publish before the pointer flip."""
+            def acquire(self):
+                write_tombstone(db_dir, [store.index_to_docstore_id[2]])
+
+            def release(self):
+                pass
+
+        assert compact_segments(db_dir, FakeEmbeddings(size=8), lock=DeleteDuringCompaction()) is not None
+
+        base, segments, state = load_parts(db_dir, FakeEmbeddings(size=8))
+        assert [base.docstore.search(i).page_content for i in base.index_to_docstore_id.values()] == ["gamma"]
+        assert len(state["tombstones"]) == 1
+        assert load_tombstones(db_dir, state) == {store.index_to_docstore_id[2]}
+
+        with patch.object(index_snapshots, "SEGMENT_GRACE_SECONDS", -1):
+            collect_snapshots(db_dir)
+        assert os.listdir(os.path.join(db_dir, TOMBSTONES_DIR)) == [f"{state['tombstones'][0]}.json"]
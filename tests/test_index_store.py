@@ -0,0 +1,389 @@
+"""
+Tests for the resident FAISS index shared by the /api/v1 routes.
+"""
+import threading
+from urllib.parse import quote
+import pytest
+from unittest.mock import patch, MagicMock
+from fastapi.testclient import TestClient
+from langchain_core.documents import Document
+from langchain_core.embeddings import FakeEmbeddings
+from langchain_community.vectorstores import FAISS
+import index_snapshots
+from api.index_store import IndexCollections, IndexStore
+from index_snapshots import current_version, write_snapshot
+
+
+@pytest.fixture
+def store(tmp_path):
+    return IndexStore(str(tmp_path / "faiss_index"), lambda: FakeEmbeddings(size=8))
+
+
+class TestIndexStore:
+    """Test suite for IndexStore."""
+
+    def test_empty_until_published(self, store, make_store):
+        """Test that there is no index before the first publish."""
+        assert store.get() is None
+
+        published = make_store(["alpha"])
+        name = store.append(published)
+
+        assert store.get() is published
+        assert index_snapshots.read_state(store.db_dir)["base"] == name
+        assert store.version == current_version(store.db_dir)
+
+    def test_loads_once_and_reuses(self, store, make_store):
+        """Test that repeated reads do not deserialize the index again."""
+        write_snapshot(make_store(["alpha", "beta"]), store.db_dir)
+
+        with patch.object(index_snapshots, "load_store", wraps=index_snapshots.load_store) as mock_load:
+            first = store.get()
+            assert store.get() is first
+            assert store.get() is first
+
+        assert mock_load.call_count == 1
+        assert first.index.ntotal == 2
+
+    def test_swaps_in_new_version_without_blocking(self, store, make_store):
+        """Test that readers keep the old index while a new snapshot loads."""
+        write_snapshot(make_store(["alpha"]), store.db_dir)
+        first = store.get()
+
+        # Another process publishes a new snapshot
+        version = write_snapshot(make_store(["alpha", "beta", "gamma"]), store.db_dir)
+        assert store.get() is first
+
+        store.wait_for_reload(timeout=10)
+        second = store.get()
+
+        assert second is not first
+        assert second.index.ntotal == 3
+        assert store.version == version
+        assert store.stats()["reloads"] == 1
+
+    def test_slow_reload_does_not_block_readers(self, store, make_store):
+        """Test that get() returns immediately while the reload is in progress."""
+        write_snapshot(make_store(["alpha"]), store.db_dir)
+        first = store.get()
+        write_snapshot(make_store(["alpha", "beta"]), store.db_dir)
+
+        release = threading.Event()
+        real_load = index_snapshots.load_store
+
+        def slow_load(*args, **kwargs):
+            release.wait(10)
+            return real_load(*args, **kwargs)
+
+        with patch.object(index_snapshots, "load_store", side_effect=slow_load):
+            for _ in range(5):
+                assert store.get() is first
+            release.set()
+            store.wait_for_reload(timeout=10)
+
+        assert store.get().index.ntotal == 2
+
+    def test_reads_legacy_layout(self, store, make_store):
+        """Test that an index saved directly in db_dir is still loaded."""
+        make_store(["alpha"]).save_local(store.db_dir)
+
+        assert store.get().index.ntotal == 1
+
+
+class TestIndexStoreSegments:
+    """Test suite for appending uploads as delta segments."""
+
+    def test_append_is_searchable_without_reloading(self, store, make_store):
+        store.append(make_store(["alpha", "beta"]))
+        base = store.get()
+
+        with patch.object(index_snapshots, "load_store") as mock_load:
+            name = store.append(make_store(["gamma"]))
+            combined = store.get()
+
+        mock_load.assert_not_called()
+        assert index_snapshots.read_state(store.db_dir)["segments"] == [name]
+        assert combined.base is base
+        assert combined.ntotal == 3
+        assert store.stats()["segments"] == 1
+        assert "gamma" in [doc.page_content for doc in combined.similarity_search("gamma", k=3)]
+
+    def test_first_append_becomes_base(self, store, make_store):
+        store.append(make_store(["alpha"]))
+
+        assert store.get().index.ntotal == 1
+        assert store.stats()["segments"] == 0
+
+    def test_segments_are_compacted_in_background(self, store, make_store):
+        store.append(make_store(["alpha"]))
+        with patch.object(index_snapshots, "INDEX_COMPACT_SEGMENTS", 3):
+            for text in ("beta", "gamma", "delta"):
+                store.append(make_store([text]))
+            store.wait_for_reload(timeout=10)
+
+        compacted = store.get()
+        assert store.stats()["compactions"] == 1
+        assert store.stats()["segments"] == 0
+        assert compacted.index.ntotal == 4
+        assert index_snapshots.read_state(store.db_dir)["segments"] == []
+
+
+def make_document_store(source, texts):
+    documents = [Document(page_content=t, metadata={"source": source, "page": 1}) for t in texts]
+    return FAISS.from_documents(documents, FakeEmbeddings(size=8))
+
+
+def sources(vector_store):
+    return sorted({doc.metadata["source"] for doc in vector_store.similarity_search("query", k=100)})
+
+
+class TestDeleteDocument:
+    """Test suite for IndexStore.delete_document."""
+
+    def test_deleted_document_disappears_from_search(self, store):
+        store.append(make_document_store("a.pdf", ["a1", "a2"]))
+        store.append(make_document_store("b.pdf", ["b1"]))
+        store.append(make_document_store("c.pdf", ["c1", "c2"]))
+
+        with patch.object(index_snapshots, "load_store") as mock_load:
+            assert store.delete_document("a.pdf") == 2
+            assert store.delete_document("c.pdf") == 2
+        mock_load.assert_not_called()
+
+        assert sources(store.get()) == ["b.pdf"]
+        assert store.delete_document("a.pdf") == 0
+        assert store.delete_document("missing.pdf") == 0
+        # Another process sees the same deletions
+        other = IndexStore(store.db_dir, lambda: FakeEmbeddings(size=8))
+        assert sources(other.get()) == ["b.pdf"]
+
+    def test_compaction_reclaims_deleted_chunks(self, store):
+        store.append(make_document_store("a.pdf", ["a1", "a2"]))
+        store.append(make_document_store("b.pdf", ["b1"]))
+
+        with patch.object(index_snapshots, "INDEX_COMPACT_SEGMENTS", 1):
+            store.delete_document("a.pdf")
+            store.wait_for_reload()
+
+        assert store.compactions == 1
+        assert store.get().index.ntotal == 1
+        assert sources(store.get()) == ["b.pdf"]
+
+
+@pytest.fixture
+def shards(tmp_path):
+    return IndexCollections(str(tmp_path / "faiss_index"), str(tmp_path / "collections"),
+                            embeddings=lambda: FakeEmbeddings(size=8))
+
+
+class TestIndexCollections:
+    """Test suite for per-collection shards."""
+
+    def test_collections_are_isolated(self, shards, make_store):
+        shards.append("acme", make_store(["acme contract"]))
+        shards.append("globex", make_store(["globex invoice", "globex memo"]))
+
+        assert shards.get("acme").index.ntotal == 1
+        assert shards.get("globex").index.ntotal == 2
+        assert shards.get() is None
+        assert shards.names() == ["acme", "globex"]
+        assert shards.path("acme") != shards.path("globex")
+        assert shards.path("default") == shards.db_dir
+
+    def test_invalid_names_are_rejected(self, shards):
+        for name in ("", "../etc", "a/b", "x" * 65, ".hidden"):
+            with pytest.raises(ValueError):
+                shards.get(name)
+
+    def test_loaded_lazily(self, shards, make_store):
+        shards.append("acme", make_store(["acme contract"]))
+        fresh = IndexCollections(shards.db_dir, shards.collections_dir, embeddings=shards.embeddings)
+
+        with patch.object(index_snapshots, "load_store", wraps=index_snapshots.load_store) as mock_load:
+            fresh.store("acme")
+            assert mock_load.call_count == 0
+            fresh.get("acme")
+            fresh.get("acme")
+
+        assert mock_load.call_count == 1
+
+    def test_least_recently_used_are_evicted(self, shards, make_store):
+        for name in ("a", "b", "c"):
+            shards.append(name, make_store([f"{name} {i}" for i in range(20)]))
+        one = shards.store("a").memory_bytes()
+        assert one > 0
+
+        # Room for two collections
+        shards.memory_budget = int(one * 2.5)
+        shards.get("a")
+        shards.get("b")
+        shards.get("c")
+
+        loaded = shards.stats()["loaded"]
+        assert sorted(loaded) == ["b", "c"]
+        assert shards.stats()["memory_bytes"] <= shards.memory_budget
+        assert shards.evictions >= 1
+
+        # An evicted collection loads again on its next query
+        assert shards.get("a").index.ntotal == 20
+        assert "a" in shards.stats()["loaded"]
+
+    def test_memory_is_measured_once_per_part(self, shards, make_store):
+        """Test that queries do not re-measure the resident index."""
+        import api.index_store as index_store
+
+        shards.append("acme", make_store(["alpha", "beta"]))
+        with patch.object(index_store, "store_memory_bytes", wraps=index_store.store_memory_bytes) as mock_size:
+            shards.append("acme", make_store(["gamma"]))
+            measured = mock_size.call_count
+            for _ in range(5):
+                shards.get("acme")
+
+        assert measured == 1
+        assert mock_size.call_count == measured
+        assert shards.stats()["memory_bytes"] == shards.store("acme").memory_bytes() > 0
+
+        shards.store("acme").unload()
+        assert shards.stats()["memory_bytes"] == 0
+
+    def test_delete_collection(self, shards, make_store):
+        shards.append("acme", make_store(["acme contract"]))
+        shards.append("globex", make_store(["globex invoice"]))
+
+        assert shards.delete("acme") is True
+        assert shards.delete("acme") is False
+
+        assert shards.get("acme") is None
+        assert shards.names() == ["globex"]
+        assert shards.get("globex").index.ntotal == 1
+
+    def test_default_collection_is_not_deleted(self, shards, make_store):
+        shards.append("default", make_store(["shared"]))
+
+        with pytest.raises(ValueError):
+            shards.delete("default")
+
+        assert shards.get("default").index.ntotal == 1
+
+
+class TestChatUsesResidentIndex:
+    """Test that /api/v1/chat reads the resident index of its collection."""
+
+    def test_chat_does_not_reload_per_request(self, shards, make_store):
+        from api.main import app
+        from api.routes import chat
+
+        shards.append("acme", make_store(["alpha"]))
+        chain = MagicMock()
+        chain.invoke.return_value = {"messages": [MagicMock(content="answer")]}
+
+        with patch.object(chat, "collections", shards), \
+                patch.object(chat, "get_rag_chain", return_value=chain) as mock_chain, \
+                patch.object(index_snapshots, "load_store") as mock_load:
+            client = TestClient(app)
+            for _ in range(3):
+                response = client.post("/api/v1/chat", json={"query": "What is alpha?", "collection": "acme"})
+                assert response.status_code == 200
+                assert response.json()["answer"] == "answer"
+
+        mock_load.assert_not_called()
+        assert all(call.args[0] is shards.get("acme") for call in mock_chain.call_args_list)
+
+    def test_chat_passes_filters(self, shards, make_store):
+        from api.main import app
+        from api.routes import chat
+
+        shards.append("acme", make_store(["alpha"]))
+        chain = MagicMock()
+        chain.invoke.return_value = {"messages": [MagicMock(content="answer")]}
+
+        with patch.object(chat, "collections", shards), \
+                patch.object(chat, "get_rag_chain", return_value=chain) as mock_chain:
+            client = TestClient(app)
+            scoped = client.post("/api/v1/chat", json={"query": "q", "collection": "acme", "sources": ["a.pdf"],
+                                                       "page_from": 2, "page_to": 4})
+            unscoped = client.post("/api/v1/chat", json={"query": "q", "collection": "acme"})
+            reversed_pages = client.post("/api/v1/chat", json={"query": "q", "collection": "acme",
+                                                               "page_from": 4, "page_to": 2})
+
+        assert scoped.status_code == unscoped.status_code == 200
+        assert mock_chain.call_args_list[0].args[1:] == (["a.pdf"], (2, 4))
+        assert mock_chain.call_args_list[1].args[1:] == (None, None)
+        assert reversed_pages.status_code == 400
+
+    def test_chat_without_index_returns_404(self, shards, make_store):
+        from api.main import app
+        from api.routes import chat
+
+        shards.append("acme", make_store(["alpha"]))
+        with patch.object(chat, "collections", shards):
+            client = TestClient(app)
+            missing = client.post("/api/v1/chat", json={"query": "anything", "collection": "globex"})
+            invalid = client.post("/api/v1/chat", json={"query": "anything", "collection": "../acme"})
+
+        assert missing.status_code == 404
+        assert "Knowledge Base not found" in missing.json()["detail"]
+        assert invalid.status_code == 400
+
+    def test_delete_document_endpoint(self, shards, tmp_path):
+        from api.main import app
+        from api.routes import documents, ingest
+
+        shards.append("acme", make_document_store("a.pdf", ["a1"]))
+        shards.append("acme", make_document_store("b.pdf", ["b1"]))
+        uploads = tmp_path / "collections" / "acme" / "uploads"
+        uploads.mkdir(parents=True)
+        (uploads / "a.pdf").write_bytes(b"%PDF")
+
+        with patch.object(documents, "collections", shards), patch.object(ingest, "collections", shards):
+            client = TestClient(app)
+            deleted = client.delete("/api/v1/documents/a.pdf", params={"collection": "acme"})
+            again = client.delete("/api/v1/documents/a.pdf", params={"collection": "acme"})
+            invalid = client.delete("/api/v1/documents/a.pdf", params={"collection": "../acme"})
+
+        assert deleted.status_code == 200
+        assert deleted.json()["chunks_deleted"] == 1
+        assert not (uploads / "a.pdf").exists()
+        assert again.status_code == 404
+        assert invalid.status_code == 400
+        assert sources(shards.get("acme")) == ["b.pdf"]
+
+    def test_delete_document_by_path(self, shards, tmp_path, monkeypatch):
+        """Test that documents ingest.py indexed by their ./docs path can be deleted."""
+        from api.main import app
+        from api.routes import documents, ingest
+
+        monkeypatch.chdir(tmp_path)
+        (tmp_path / "docs" / "reports").mkdir(parents=True)
+        (tmp_path / "docs" / "reports" / "a.pdf").write_bytes(b"%PDF")
+        (tmp_path / "docs" / "a.pdf").write_bytes(b"%PDF")
+        # The source ingest.py gives chunks of ./docs/reports/a.pdf
+        shards.append("default", make_document_store("docs/reports/a.pdf", ["a1"]))
+
+        with patch.object(documents, "collections", shards), patch.object(ingest, "collections", shards):
+            client = TestClient(app)
+            outside = client.delete(f"/api/v1/documents/{quote('../secret.pdf', safe='')}")
+            deleted = client.delete(f"/api/v1/documents/{quote('docs/reports/a.pdf', safe='')}")
+
+        assert outside.status_code == 400
+        assert deleted.status_code == 200
+        assert deleted.json()["chunks_deleted"] == 1
+        assert not (tmp_path / "docs" / "reports" / "a.pdf").exists()
+        assert (tmp_path / "docs" / "a.pdf").exists()
+
+    def test_collection_endpoints(self, shards, make_store):
+        from api.main import app
+        from api.routes import collections as collection_routes
+
+        shards.append("acme", make_store(["alpha"]))
+        with patch.object(collection_routes, "collections", shards):
+            client = TestClient(app)
+            listed = client.get("/api/v1/collections").json()
+            deleted = client.delete("/api/v1/collections/acme")
+            missing = client.delete("/api/v1/collections/acme")
+            default = client.delete("/api/v1/collections/default")
+
+        assert listed["collections"] == ["acme"]
+        assert deleted.status_code == 200
+        assert missing.status_code == 404
+        assert default.status_code == 400
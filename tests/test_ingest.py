@@ -0,0 +1,215 @@
+"""
+Tests for incremental, manifest-based directory ingestion (ingest.py).
+"""
+import os
+import pytest
+from unittest.mock import patch
+from langchain_core.documents import Document
+from langchain_core.embeddings import FakeEmbeddings
+from reportlab.pdfgen import canvas
+from reportlab.lib.pagesizes import letter
+import ingest
+from segmented_store import filtered_search
+
+
+def write_pdf(path, lines):
+    """Write a one-page PDF containing the given lines."""
+    pdf = canvas.Canvas(str(path), pagesize=letter)
+    y = 750
+    for line in lines:
+        pdf.drawString(50, y, line)
+        y -= 16
+    pdf.showPage()
+    pdf.save()
+
+
+@pytest.fixture
+def ingest_env(tmp_path):
+    """Point ingest.py at temporary docs/index directories with fake embeddings."""
+    docs_dir = tmp_path / "docs"
+    docs_dir.mkdir()
+    db_dir = tmp_path / "faiss_index"
+    loads = []
+    real_loader = ingest.PyPDFLoader
+
+    def tracking_loader(path):
+        loads.append(os.path.basename(path))
+        return real_loader(path)
+
+    with patch.object(ingest, "DOCS_DIR", str(docs_dir)), \
+            patch.object(ingest, "DB_DIR", str(db_dir)), \
+            patch.object(ingest, "PyPDFLoader", tracking_loader), \
+            patch.object(ingest, "get_embeddings", lambda model_name: FakeEmbeddings(size=16)):
+        yield docs_dir, db_dir, loads
+
+
+def stored_documents(store):
+    return [store.docstore.search(doc_id) for doc_id in store.index_to_docstore_id.values()]
+
+
+def index_size(db_dir):
+    store = ingest.load_snapshot(str(db_dir), FakeEmbeddings(size=16))[0]
+    return store.index.ntotal
+
+
+class TestIncrementalIngest:
+    """Test suite for manifest-based ingestion."""
+
+    def test_only_new_and_changed_files_are_loaded(self, ingest_env):
+        """Test that unchanged files are skipped and changed files are re-embedded."""
+        docs_dir, db_dir, loads = ingest_env
+        write_pdf(docs_dir / "a.pdf", ["Alpha handbook"])
+        write_pdf(docs_dir / "b.pdf", ["Beta handbook"])
+
+        ingest.ingest_documents()
+        assert sorted(loads) == ["a.pdf", "b.pdf"]
+        manifest = ingest.load_manifest(str(db_dir))
+        assert len(manifest["files"]) == 2
+        assert index_size(db_dir) == 2
+
+        loads.clear()
+        assert ingest.ingest_documents() == "Index is up to date."
+        assert loads == []
+
+        write_pdf(docs_dir / "b.pdf", ["Beta handbook, second edition", "with an extra line"])
+        os.utime(docs_dir / "b.pdf", (1, 1))
+        ingest.ingest_documents()
+        assert loads == ["b.pdf"]
+        assert index_size(db_dir) == 2
+
+    def test_deleted_files_are_removed_from_index(self, ingest_env):
+        """Test that vectors of deleted files are dropped along with their manifest entry."""
+        docs_dir, db_dir, loads = ingest_env
+        write_pdf(docs_dir / "a.pdf", ["Alpha handbook"])
+        write_pdf(docs_dir / "b.pdf", ["Beta handbook"])
+        ingest.ingest_documents()
+
+        os.remove(docs_dir / "a.pdf")
+        loads.clear()
+        ingest.ingest_documents()
+
+        assert loads == []
+        manifest = ingest.load_manifest(str(db_dir))
+        assert [os.path.basename(p) for p in manifest["files"]] == ["b.pdf"]
+        assert index_size(db_dir) == 1
+
+    def test_touched_but_identical_file_is_not_reembedded(self, ingest_env):
+        """Test that an mtime change alone falls back to the content hash."""
+        docs_dir, db_dir, loads = ingest_env
+        write_pdf(docs_dir / "a.pdf", ["Alpha handbook"])
+        ingest.ingest_documents()
+
+        os.utime(docs_dir / "a.pdf", (2, 2))
+        loads.clear()
+
+        assert ingest.ingest_documents() == "Index is up to date."
+        assert loads == []
+        entry = next(iter(ingest.load_manifest(str(db_dir))["files"].values()))
+        assert entry["mtime"] == 2
+
+    def test_rebuild_reingests_everything(self, ingest_env):
+        """Test that rebuild ignores the manifest."""
+        docs_dir, db_dir, loads = ingest_env
+        write_pdf(docs_dir / "a.pdf", ["Alpha handbook"])
+        ingest.ingest_documents()
+        loads.clear()
+
+        ingest.ingest_documents(rebuild=True)
+
+        assert loads == ["a.pdf"]
+        assert index_size(db_dir) == 1
+
+    def test_parallel_workers_match_serial(self, ingest_env, tmp_path, capsys):
+        """Test that --workers produces the same chunks as a serial run and reports throughput."""
+        docs_dir, db_dir, _ = ingest_env
+        for name in ("a", "b", "c"):
+            write_pdf(docs_dir / f"{name}.pdf", [f"{name} handbook line {i}" for i in range(30)])
+
+        ingest.ingest_documents(workers=1)
+        serial = ingest.load_snapshot(str(db_dir), FakeEmbeddings(size=16))[0]
+        ingest.ingest_documents(rebuild=True, workers=2)
+        parallel = ingest.load_snapshot(str(db_dir), FakeEmbeddings(size=16))[0]
+
+        def contents(store):
+            return sorted(doc.page_content for doc in stored_documents(store))
+
+        assert contents(parallel) == contents(serial)
+        manifest = ingest.load_manifest(str(db_dir))
+        assert sorted(parallel.index_to_docstore_id.values()) == \
+            sorted(i for entry in manifest["files"].values() for i in entry["chunk_ids"])
+        output = capsys.readouterr().out
+        assert "pages/sec" in output and "chunks/sec" in output
+
+    def test_chunks_are_pii_scrubbed(self, ingest_env):
+        """Test that ingested chunks have PII redacted."""
+        docs_dir, db_dir, _ = ingest_env
+        write_pdf(docs_dir / "a.pdf", ["Contact john.doe@example.com for details"])
+
+        ingest.ingest_documents()
+        store = ingest.load_snapshot(str(db_dir), FakeEmbeddings(size=16))[0]
+
+        text = " ".join(doc.page_content for doc in stored_documents(store))
+        assert "john.doe@example.com" not in text
+        assert "[REDACTED EMAIL]" in text
+        entry = ingest.load_manifest(str(db_dir))["files"][str(docs_dir / "a.pdf")]
+        assert entry["redactions"] == {"email": 1, "phone": 0, "credit_card": 0}
+
+    def test_pages_are_numbered_from_one(self, ingest_env):
+        """Test that page filters select the same pages in ingest.py and API-built indexes."""
+        docs_dir, db_dir, _ = ingest_env
+        pdf = canvas.Canvas(str(docs_dir / "a.pdf"), pagesize=letter)
+        for number in (1, 2, 3):
+            pdf.drawString(50, 750, f"Handbook page {number}")
+            pdf.showPage()
+        pdf.save()
+
+        ingest.ingest_documents()
+        store = ingest.load_snapshot(str(db_dir), FakeEmbeddings(size=16))[0]
+        query = FakeEmbeddings(size=16).embed_query("handbook")
+        found = filtered_search(store, query, k=4, pages=(3, 3))
+
+        assert sorted(doc.metadata["page"] for doc in stored_documents(store)) == [1, 2, 3]
+        assert [doc.page_content.strip() for doc, _ in found] == ["Handbook page 3"]
+
+    def test_api_uploads_are_not_reingested(self, ingest_env):
+        """Test that files uploaded through the API (indexed, not in the manifest) are adopted."""
+        docs_dir, db_dir, loads = ingest_env
+        write_pdf(docs_dir / "a.pdf", ["Alpha handbook"])
+        ingest.ingest_documents()
+        # What the ingest route does: save into ./docs, index under the filename
+        write_pdf(docs_dir / "b.pdf", ["Beta handbook"])
+        upload = ingest.add_to_store(None, [Document(page_content="Beta handbook", metadata={"source": "b.pdf"})],
+                                     [[0.0] * 16], FakeEmbeddings(size=16))
+        ingest.write_segment(upload, str(db_dir))
+        loads.clear()
+
+        assert ingest.ingest_documents() == "Index is up to date."
+
+        assert loads == []
+        store = ingest.load_snapshot(str(db_dir), FakeEmbeddings(size=16))[0]
+        assert sorted(doc.metadata["source"] for doc in stored_documents(store)) == \
+            sorted(["b.pdf", str(docs_dir / "a.pdf")])
+        entry = ingest.load_manifest(str(db_dir))["files"][str(docs_dir / "b.pdf")]
+        assert entry["chunk_ids"] == [upload.index_to_docstore_id[0]]
+
+    def test_segments_published_during_a_run_are_kept(self, ingest_env):
+        """Test that an incremental run adds to the index as it is when publishing."""
+        docs_dir, db_dir, _ = ingest_env
+        write_pdf(docs_dir / "a.pdf", ["Alpha handbook"])
+        ingest.ingest_documents()
+        write_pdf(docs_dir / "b.pdf", ["Beta handbook"])
+        real_load_and_split = ingest.load_and_split
+
+        def load_and_split_during_upload(path):
+            # An API upload to another folder is published while the run embeds
+            upload = ingest.add_to_store(None, [Document(page_content="Upload", metadata={"source": "c.pdf"})],
+                                         [[0.0] * 16], FakeEmbeddings(size=16))
+            ingest.write_segment(upload, str(db_dir))
+            return real_load_and_split(path)
+
+        with patch.object(ingest, "load_and_split", load_and_split_during_upload):
+            ingest.ingest_documents()
+
+        store = ingest.load_snapshot(str(db_dir), FakeEmbeddings(size=16))[0]
+        assert sorted(os.path.basename(doc.metadata["source"]) for doc in stored_documents(store)) == \
+            ["a.pdf", "b.pdf", "c.pdf"]
@@ -0,0 +1,139 @@
+"""
+Unit tests for the content-addressed ingest cache.
+"""
+import asyncio
+import hashlib
+import io
+import os
+import numpy as np
+from unittest.mock import MagicMock
+from langchain_core.documents import Document
+from backend.ingest_cache import IngestCache, add_to_store, file_digest, spool_upload
+
+MODEL = "all-MiniLM-L6-v2"
+
+
+class TestIngestCache:
+    """Test suite for IngestCache and helpers."""
+
+    def _docs(self, count=3):
+        return [
+            Document(page_content=f"chunk {i}", metadata={"source": "handbook.pdf", "page": i + 1, "start_index": 0})
+            for i in range(count)
+        ]
+
+    def test_file_digest_is_stable_and_rewinds(self, sample_pdf_bytes):
+        """Test that hashing is content-addressed and leaves the stream at 0."""
+        stream = io.BytesIO(sample_pdf_bytes)
+
+        digest = file_digest(stream, block_size=64)
+
+        assert digest == file_digest(io.BytesIO(sample_pdf_bytes))
+        assert stream.tell() == 0
+        assert digest != file_digest(io.BytesIO(sample_pdf_bytes + b"x"))
+
+    def test_round_trip(self, tmp_path):
+        """Test that cached chunks and vectors are returned unchanged."""
+        cache = IngestCache(cache_dir=str(tmp_path))
+        docs = self._docs()
+        vectors = [[float(i)] * 4 for i in range(3)]
+
+        assert cache.get("abc", MODEL) is None
+        cache.put("abc", MODEL, docs, vectors)
+        cached_docs, cached_vectors = cache.get("abc", MODEL)
+
+        assert [d.page_content for d in cached_docs] == [d.page_content for d in docs]
+        assert [d.metadata for d in cached_docs] == [d.metadata for d in docs]
+        np.testing.assert_allclose(cached_vectors, vectors)
+
+    def test_get_overrides_source(self, tmp_path):
+        """Test that a re-upload under a new name gets the new source metadata."""
+        cache = IngestCache(cache_dir=str(tmp_path))
+        cache.put("abc", MODEL, self._docs(), [[0.0] * 4] * 3)
+
+        cached_docs, _ = cache.get("abc", MODEL, source="renamed.pdf")
+
+        assert {d.metadata["source"] for d in cached_docs} == {"renamed.pdf"}
+
+    def test_entries_are_kept_per_model(self, tmp_path):
+        """Test that vectors of another model or backend are never returned."""
+        cache = IngestCache(cache_dir=str(tmp_path))
+        cache.put("abc", MODEL, self._docs(), [[0.0] * 4] * 3)
+
+        assert cache.get("abc", f"{MODEL}@onnx-int8") is None
+        assert cache.get("abc", MODEL) is not None
+
+    def test_lru_eviction_respects_size_cap(self, tmp_path):
+        """Test that the least recently used entry is evicted first."""
+        cache = IngestCache(cache_dir=str(tmp_path), max_bytes=10 ** 9)
+        vectors = np.zeros((50, 384))
+        cache.put("first", MODEL, self._docs(1), vectors[:1])
+        cache.put("second", MODEL, self._docs(1), vectors[:1])
+        entry_size = os.path.getsize(cache._path("first", MODEL))
+
+        # Make "first" the most recently used entry, then shrink the cap
+        os.utime(cache._path("second", MODEL), (1, 1))
+        cache.get("first", MODEL)
+        cache.max_bytes = int(entry_size * 2.5)
+        cache.put("third", MODEL, self._docs(1), vectors[:1])
+
+        assert cache.get("second", MODEL) is None
+        assert cache.get("first", MODEL) is not None
+        assert cache.get("third", MODEL) is not None
+
+    def test_unreadable_entry_is_dropped(self, tmp_path):
+        """Test that a corrupt entry counts as a miss and is removed."""
+        cache = IngestCache(cache_dir=str(tmp_path))
+        with open(cache._path("bad", MODEL), "wb") as f:
+            f.write(b"not a cache entry")
+
+        assert cache.get("bad", MODEL) is None
+        assert not os.path.exists(cache._path("bad", MODEL))
+
+    def test_add_to_store_uses_precomputed_vectors(self):
+        """Test that adding cached vectors never calls the embedding model."""
+        embeddings = MagicMock()
+        docs = self._docs(2)
+        vectors = [[1.0, 0.0, 0.0], [0.0, 1.0, 0.0]]
+
+        store = add_to_store(None, docs, vectors, embeddings)
+        store = add_to_store(store, self._docs(1), [[0.0, 0.0, 1.0]], embeddings)
+
+        assert store.index.ntotal == 3
+        embeddings.embed_documents.assert_not_called()
+        embeddings.embed_query.assert_not_called()
+
+    def test_put_store_caches_the_indexed_chunks(self, tmp_path):
+        """Test that an entry written from a store built batch by batch matches the batches."""
+        cache = IngestCache(cache_dir=str(tmp_path))
+        docs = self._docs(3)
+        vectors = [[1.0, 0.0, 0.0], [0.0, 1.0, 0.0], [0.0, 0.0, 1.0]]
+        store = add_to_store(None, docs[:2], vectors[:2], MagicMock())
+        store = add_to_store(store, docs[2:], vectors[2:], MagicMock())
+
+        cache.put_store("abc", MODEL, store)
+        cached_docs, cached_vectors = cache.get("abc", MODEL)
+
+        assert [d.page_content for d in cached_docs] == [d.page_content for d in docs]
+        assert [d.metadata for d in cached_docs] == [d.metadata for d in docs]
+        np.testing.assert_allclose(cached_vectors, vectors)
+
+    def test_spool_upload_streams_and_hashes(self, sample_pdf_bytes, tmp_path):
+        """Test that uploads are written in bounded blocks and hashed on the way."""
+        upload = MagicMock()
+        source = io.BytesIO(sample_pdf_bytes)
+        read_sizes = []
+
+        async def read(size):
+            read_sizes.append(size)
+            return source.read(size)
+
+        upload.read = read
+        dest = tmp_path / "upload.pdf"
+
+        size, digest = asyncio.run(spool_upload(upload, str(dest), block_size=256))
+
+        assert size == len(sample_pdf_bytes)
+        assert digest == hashlib.sha256(sample_pdf_bytes).hexdigest()
+        assert dest.read_bytes() == sample_pdf_bytes
+        assert set(read_sizes) == {256}
@@ -0,0 +1,141 @@
+"""
+Tests for the background ingestion job queue and the /api/v1 job endpoints.
+"""
+import io
+import threading
+import time
+import pytest
+from unittest.mock import patch
+from fastapi.testclient import TestClient
+from langchain_core.embeddings import FakeEmbeddings
+from api.jobs import JobQueue, QueueFullError
+
+
+def wait_for(job_queue, job_id, timeout=30):
+    """Poll a job until it leaves the queued/running states."""
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        job = job_queue.get(job_id)
+        if job.status in ("done", "failed"):
+            return job
+        time.sleep(0.02)
+    raise AssertionError(f"Job {job_id} did not finish")
+
+
+class TestJobQueue:
+    """Test suite for JobQueue."""
+
+    def test_job_runs_and_reports_stages(self):
+        """Test that a job records per-stage progress and its result."""
+        queue = JobQueue(workers=1)
+
+        def work(job, value):
+            job.start_stage("extract", pages=0)
+            job.update_stage("extract", pages=3)
+            job.finish_stage("extract")
+            return {"value": value}
+
+        job = queue.submit("doc.pdf", ["extract", "index"], work, 42)
+        job = wait_for(queue, job.id)
+        status = job.to_dict()
+
+        assert status["status"] == "done"
+        assert status["result"] == {"value": 42}
+        assert status["stages"]["extract"] == {"status": "done", "pages": 3}
+        assert status["stages"]["index"] == {"status": "pending"}
+
+    def test_failed_job_records_error(self):
+        """Test that an exception marks the job and its current stage as failed."""
+        queue = JobQueue(workers=1)
+
+        def work(job):
+            job.start_stage("extract")
+            raise ValueError("No text extracted from PDF.")
+
+        job = wait_for(queue, queue.submit("doc.pdf", ["extract"], work).id)
+
+        assert job.status == "failed"
+        assert job.error == "No text extracted from PDF."
+        assert job.stages["extract"]["status"] == "failed"
+
+    def test_queue_rejects_when_full(self):
+        """Test that submissions beyond max_pending are rejected."""
+        queue = JobQueue(workers=1, max_pending=1)
+        release = threading.Event()
+
+        queue.submit("a.pdf", [], lambda job: release.wait(5))
+        with pytest.raises(QueueFullError):
+            queue.submit("b.pdf", [], lambda job: None)
+        release.set()
+
+    def test_history_is_bounded(self):
+        """Test that old finished jobs are dropped from the history."""
+        queue = JobQueue(workers=1, history=2)
+        job_ids = []
+        for i in range(4):
+            job_ids.append(wait_for(queue, queue.submit(f"{i}.pdf", [], lambda job: None).id).id)
+        queue.submit("last.pdf", [], lambda job: None)
+
+        assert queue.get(job_ids[0]) is None
+        assert len(queue.jobs) <= 3
+
+
+class TestIngestJobEndpoints:
+    """Test suite for the asynchronous /api/v1/ingest flow."""
+
+    @pytest.fixture
+    def client(self, tmp_path):
+        from api.main import app
+        from api.routes import ingest
+        from ingest_cache import IngestCache
+        from api.index_store import IndexCollections
+
+        docs_dir = tmp_path / "docs"
+        docs_dir.mkdir()
+        with patch.object(ingest, "DOCS_DIR", str(docs_dir)), \
+                patch.object(ingest, "collections", IndexCollections(str(tmp_path / "faiss_index"),
+                                                                     str(tmp_path / "collections"),
+                                                                     embeddings=lambda: FakeEmbeddings(size=16))), \
+                patch.object(ingest, "ingest_cache", IngestCache(cache_dir=str(tmp_path / "cache"))), \
+                patch.object(ingest, "ingest_jobs", JobQueue(workers=1)), \
+                patch.object(ingest, "get_embeddings", lambda model_name: FakeEmbeddings(size=16)):
+            yield TestClient(app), ingest
+
+    def test_ingest_returns_job_and_indexes_in_background(self, client, multi_page_pdf_bytes):
+        """Test that ingest returns a job ID right away and the job completes."""
+        test_client, ingest = client
+        files = {"file": ("contract.pdf", io.BytesIO(multi_page_pdf_bytes), "application/pdf")}
+
+        response = test_client.post("/api/v1/ingest", files=files)
+
+        assert response.status_code == 202
+        job_id = response.json()["job_id"]
+        wait_for(ingest.ingest_jobs, job_id)
+        status = test_client.get(f"/api/v1/jobs/{job_id}").json()
+        assert status["status"] == "done"
+        assert status["stages"]["extract"]["pages"] == 5
+        assert status["stages"]["index"]["status"] == "done"
+        assert status["result"]["chunks_added"] == status["stages"]["embed"]["chunks"]
+
+    def test_ingest_into_collection(self, client, multi_page_pdf_bytes):
+        """Test that ?collection= indexes into that collection only."""
+        test_client, ingest = client
+        files = {"file": ("contract.pdf", io.BytesIO(multi_page_pdf_bytes), "application/pdf")}
+
+        response = test_client.post("/api/v1/ingest?collection=acme", files=files)
+        invalid = test_client.post("/api/v1/ingest?collection=../acme", files=files)
+
+        assert response.status_code == 202
+        assert invalid.status_code == 400
+        job_id = response.json()["job_id"]
+        assert wait_for(ingest.ingest_jobs, job_id).result["collection"] == "acme"
+        assert ingest.collections.get("acme").index.ntotal > 0
+        assert ingest.collections.get() is None
+
+    def test_unknown_job_returns_404(self, client):
+        """Test polling a job ID that does not exist."""
+        test_client, _ = client
+
+        response = test_client.get("/api/v1/jobs/does-not-exist")
+
+        assert response.status_code == 404
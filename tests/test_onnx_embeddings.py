@@ -0,0 +1,95 @@
+"""
+Unit tests for the ONNX embedding backend.
+"""
+import numpy as np
+import pytest
+from unittest.mock import patch
+from langchain_core.embeddings import Embeddings, FakeEmbeddings
+from backend import embedding_registry as registry_module
+from backend.embedding_registry import EmbeddingRegistry
+from backend.onnx_embeddings import OnnxEmbeddings, cosine_parity, mean_pool
+
+
+class FixedEmbeddings(Embeddings):
+    """Returns pre-computed vectors."""
+    def __init__(self, vectors):
+        self.vectors = vectors
+
+    def embed_documents(self, texts):
+        return self.vectors[:len(texts)]
+
+    def embed_query(self, text):
+        return self.vectors[0]
+
+
+class TestOnnxEmbeddings:
+    """Test suite for the ONNX backend helpers and selection."""
+
+    def test_mean_pool_ignores_padding_and_normalizes(self):
+        """Test that pooling averages real tokens only and returns unit vectors."""
+        tokens = np.array([[[1.0, 0.0], [3.0, 0.0], [100.0, 100.0]],
+                           [[0.0, 2.0], [0.0, 4.0], [0.0, 6.0]]], dtype=np.float32)
+        mask = np.array([[1, 1, 0], [1, 1, 1]])
+
+        pooled = mean_pool(tokens, mask)
+
+        np.testing.assert_allclose(pooled, [[1.0, 0.0], [0.0, 1.0]], atol=1e-6)
+
+    def test_cosine_parity(self):
+        """Test that parity ignores vector scale and drops for a different model."""
+        texts = ["clause one", "clause two", "payment terms"]
+        vectors = FakeEmbeddings(size=8).embed_documents(texts)
+        reference = FixedEmbeddings(vectors)
+
+        scaled = FixedEmbeddings([[2 * x for x in v] for v in vectors])
+        assert cosine_parity(scaled, reference, texts)["min"] == pytest.approx(1.0)
+        assert cosine_parity(FakeEmbeddings(size=8), reference, texts)["mean"] < 0.9
+
+    def test_missing_model_files_raise(self, tmp_path):
+        """Test that a missing export is reported (so the registry can fall back)."""
+        pytest.importorskip("onnxruntime")
+        pytest.importorskip("tokenizers")
+        with pytest.raises(FileNotFoundError):
+            OnnxEmbeddings(model_dir=str(tmp_path))
+
+    def test_registry_falls_back_to_huggingface(self, tmp_path):
+        """Test that backend="onnx" uses HuggingFace when the ONNX model cannot be loaded."""
+        with patch.object(registry_module, "HuggingFaceEmbeddings", lambda model_name: FakeEmbeddings(size=4)):
+            registry = EmbeddingRegistry(backend="onnx", onnx_model_dir=str(tmp_path / "missing"))
+            embeddings = registry.get("mini")
+
+        assert isinstance(embeddings, FakeEmbeddings)
+        assert registry.stats()["models"]["mini"]["backend"] == "hf"
+
+    def test_registry_uses_onnx_when_available(self):
+        """Test that backend="onnx" serves the ONNX model and records it."""
+        with patch.object(registry_module, "OnnxEmbeddings", lambda model_dir, model_name: FakeEmbeddings(size=4)):
+            registry = EmbeddingRegistry(backend="onnx")
+            registry.get("mini")
+
+        assert registry.stats()["models"]["mini"]["backend"] == "onnx-int8"
+
+    def test_registry_falls_back_when_onnx_model_fails(self):
+        """Test that an export that loads but fails to encode falls back to HuggingFace."""
+        class BrokenExport(FakeEmbeddings):
+            def embed_query(self, text):
+                raise ValueError("Required inputs (['token_type_ids']) are missing")
+
+        with patch.object(registry_module, "OnnxEmbeddings", lambda model_dir, model_name: BrokenExport(size=4)), \
+                patch.object(registry_module, "HuggingFaceEmbeddings", lambda model_name: FakeEmbeddings(size=4)):
+            registry = EmbeddingRegistry(backend="onnx")
+            embeddings = registry.get("mini")
+
+        assert not isinstance(embeddings, BrokenExport)
+        assert registry.stats()["models"]["mini"]["backend"] == "hf"
+        assert registry.cache_name("mini") == "mini"
+
+    def test_cache_name_follows_the_serving_backend(self):
+        """Test that vectors of the ONNX backend are cached under their own name."""
+        with patch.object(registry_module, "OnnxEmbeddings", lambda model_dir, model_name: FakeEmbeddings(size=4)):
+            registry = EmbeddingRegistry(backend="onnx")
+            assert registry.cache_name("mini") == "mini@onnx-int8"
+            registry.get("mini")
+
+        assert registry.cache_name("mini") == "mini@onnx-int8"
+        assert EmbeddingRegistry().cache_name("mini") == "mini"
@@ -3,7 +3,9 @@ Unit tests for PDF processor module.
 """
 import pytest
 import io
-from backend.pdf_processor import PDFProcessor
+import pdfplumber
+from unittest.mock import patch
+from backend.pdf_processor import PDFProcessor, _page_ranges, batched, map_pdf
 
 
 class TestPDFProcessor:
@@ -68,3 +70,116 @@ class TestPDFProcessor:
             assert len(chunk.page_content) > 0
             # Chunks should not be excessively large (default is 1000 chars)
             assert len(chunk.page_content) <= 2000
+
+    def test_process_pdf_extracts_each_page_once(self, multi_page_pdf_bytes):
+        """Test that every page is extracted and scrubbed exactly once."""
+        processor = PDFProcessor(workers=1)
+        original_extract = pdfplumber.page.Page.extract_text
+        extracted_pages = []
+
+        def counting_extract(page, *args, **kwargs):
+            extracted_pages.append(page.page_number)
+            return original_extract(page, *args, **kwargs)
+
+        with patch.object(pdfplumber.page.Page, "extract_text", counting_extract), \
+                patch.object(processor.scrubber, "scrub", wraps=processor.scrubber.scrub) as mock_scrub:
+            chunks = processor.process_pdf(io.BytesIO(multi_page_pdf_bytes), "contract.pdf")
+
+        assert sorted(extracted_pages) == [1, 2, 3, 4, 5]
+        assert mock_scrub.call_count == 5
+        assert {chunk.metadata["page"] for chunk in chunks} == {1, 2, 3, 4, 5}
+
+    def test_process_pdf_chunks_are_page_tagged(self, multi_page_pdf_bytes):
+        """Test that chunks carry source, page and start_index metadata."""
+        processor = PDFProcessor()
+
+        chunks = processor.process_pdf(io.BytesIO(multi_page_pdf_bytes), "contract.pdf")
+
+        pages = [chunk.metadata["page"] for chunk in chunks]
+        assert pages == sorted(pages)
+        for chunk in chunks:
+            assert chunk.metadata["source"] == "contract.pdf"
+            assert "start_index" in chunk.metadata
+            assert f"Page {chunk.metadata['page']} clause" in chunk.page_content
+
+    def test_parallel_matches_serial(self, multi_page_pdf_bytes):
+        """Test that the process-pool path yields the same chunks as the serial path."""
+        serial = PDFProcessor(workers=1)
+        parallel = PDFProcessor(workers=2, parallel_min_pages=1)
+
+        serial_chunks = serial.process_pdf(io.BytesIO(multi_page_pdf_bytes), "contract.pdf")
+        parallel_chunks = parallel.process_pdf(io.BytesIO(multi_page_pdf_bytes), "contract.pdf")
+
+        assert [(c.page_content, c.metadata) for c in parallel_chunks] == \
+            [(c.page_content, c.metadata) for c in serial_chunks]
+
+    def test_parallel_reads_from_file_path(self, multi_page_pdf_bytes, tmp_path):
+        """Test that workers open the file by path when the stream is a real file."""
+        pdf_path = tmp_path / "contract.pdf"
+        pdf_path.write_bytes(multi_page_pdf_bytes)
+        processor = PDFProcessor(workers=3, parallel_min_pages=1)
+
+        with open(pdf_path, "rb") as f:
+            assert processor._worker_source(f) == str(pdf_path)
+            chunks = processor.process_pdf(f, "contract.pdf")
+
+        assert {chunk.metadata["page"] for chunk in chunks} == {1, 2, 3, 4, 5}
+
+    def test_small_documents_fall_back_to_serial(self, sample_pdf_bytes):
+        """Test that tiny documents never spin up a process pool."""
+        processor = PDFProcessor(workers=4, parallel_min_pages=32)
+
+        with patch("backend.pdf_processor.ProcessPoolExecutor") as mock_pool:
+            chunks = processor.process_pdf(io.BytesIO(sample_pdf_bytes), "test.pdf")
+
+        mock_pool.assert_not_called()
+        assert len(chunks) > 0
+
+    def test_page_ranges_cover_all_pages_in_order(self):
+        """Test that page ranges are contiguous and cover every page."""
+        ranges = _page_ranges(10, 3)
+
+        assert ranges == [(0, 4), (4, 7), (7, 10)]
+        assert _page_ranges(2, 8) == [(0, 1), (1, 2)]
+
+    def test_iter_chunks_is_lazy(self, multi_page_pdf_bytes):
+        """Test that iter_chunks yields first-page chunks before later pages are read."""
+        processor = PDFProcessor(workers=1)
+        original_extract = pdfplumber.page.Page.extract_text
+        extracted_pages = []
+
+        def counting_extract(page, *args, **kwargs):
+            extracted_pages.append(page.page_number)
+            return original_extract(page, *args, **kwargs)
+
+        with patch.object(pdfplumber.page.Page, "extract_text", counting_extract):
+            chunks = processor.iter_chunks(io.BytesIO(multi_page_pdf_bytes), "contract.pdf")
+            first = next(chunks)
+            assert first.metadata["page"] == 1
+            assert extracted_pages == [1]
+            rest = list(chunks)
+
+        assert extracted_pages == [1, 2, 3, 4, 5]
+        full = processor.process_pdf(io.BytesIO(multi_page_pdf_bytes), "contract.pdf")
+        assert [c.page_content for c in [first] + rest] == [c.page_content for c in full]
+
+    def test_batched_bounds_batch_size(self):
+        """Test that batched groups items without exceeding the batch size."""
+        batches = list(batched(range(7), 3))
+
+        assert batches == [[0, 1, 2], [3, 4, 5], [6]]
+        assert list(batched([], 3)) == []
+
+    def test_process_memory_mapped_pdf(self, multi_page_pdf_bytes, tmp_path):
+        """Test that a memory-mapped PDF gives the same chunks as an in-memory stream."""
+        pdf_path = tmp_path / "contract.pdf"
+        pdf_path.write_bytes(multi_page_pdf_bytes)
+        processor = PDFProcessor(workers=1)
+
+        with map_pdf(str(pdf_path)) as pdf_view:
+            assert processor._worker_source(pdf_view) == str(pdf_path)
+            mapped_chunks = processor.process_pdf(pdf_view, "contract.pdf")
+        expected = processor.process_pdf(io.BytesIO(multi_page_pdf_bytes), "contract.pdf")
+
+        assert pdf_view.closed
+        assert [c.page_content for c in mapped_chunks] == [c.page_content for c in expected]
@@ -0,0 +1,104 @@
+"""
+Unit tests for the query embedding cache and cached retriever.
+"""
+from unittest.mock import patch
+from langchain_core.documents import Document
+from langchain_core.embeddings import FakeEmbeddings
+from langchain_community.vectorstores import FAISS
+from backend.query_cache import CachedQueryRetriever, QueryEmbeddingCache
+from backend.segmented_store import combine_stores
+
+
+class CountingEmbeddings(FakeEmbeddings):
+    """Deterministic fake embeddings that count query encodes."""
+    query_calls: int = 0
+
+    def embed_query(self, text):
+        self.query_calls += 1
+        return self.embed_documents([text])[0]
+
+    def embed_documents(self, texts):
+        return [[float(len(text)), float(text.count("a")), 1.0, 0.5] for text in texts]
+
+
+class TestQueryEmbeddingCache:
+    """Test suite for QueryEmbeddingCache."""
+
+    def test_repeated_query_hits_cache(self):
+        """Test that a repeated query is embedded once and counted as a hit."""
+        cache = QueryEmbeddingCache(max_size=10, ttl=60)
+        embeddings = CountingEmbeddings(size=4)
+
+        first = cache.embed_query(embeddings, "What is the notice period?")
+        second = cache.embed_query(embeddings, "What is the notice period?")
+
+        assert first == second
+        assert embeddings.query_calls == 1
+        stats = cache.stats()
+        assert (stats["hits"], stats["misses"], stats["hit_rate"]) == (1, 1, 0.5)
+
+    def test_evicts_least_recently_used(self):
+        """Test that the cache keeps at most max_size queries, dropping the oldest."""
+        cache = QueryEmbeddingCache(max_size=2, ttl=60)
+        embeddings = CountingEmbeddings(size=4)
+
+        for query in ["q1", "q2", "q1", "q3"]:
+            cache.embed_query(embeddings, query)
+        assert cache.stats()["entries"] == 2
+
+        embeddings.query_calls = 0
+        cache.embed_query(embeddings, "q1")
+        cache.embed_query(embeddings, "q2")
+        assert embeddings.query_calls == 1
+
+    def test_entries_expire_after_ttl(self):
+        """Test that entries older than the TTL are embedded again."""
+        cache = QueryEmbeddingCache(max_size=10, ttl=30)
+        embeddings = CountingEmbeddings(size=4)
+
+        with patch("backend.query_cache.time.monotonic", side_effect=[0, 10, 45]):
+            cache.embed_query(embeddings, "q")
+            cache.embed_query(embeddings, "q")
+            cache.embed_query(embeddings, "q")
+
+        assert embeddings.query_calls == 2
+        assert cache.stats()["expired"] == 1
+
+
+class TestCachedQueryRetriever:
+    """Test suite for CachedQueryRetriever."""
+
+    def test_matches_vector_store_retriever(self):
+        """Test that results match as_retriever() and repeat queries skip the model."""
+        embeddings = CountingEmbeddings(size=4)
+        docs = [Document(page_content=text, metadata={"page": i})
+                for i, text in enumerate(["alpha", "a banana", "contract terms", "payment", "aaa"])]
+        store = FAISS.from_documents(docs, embeddings)
+        retriever = CachedQueryRetriever(vector_store=store, k=2, cache=QueryEmbeddingCache())
+
+        expected = store.as_retriever(search_kwargs={"k": 2}).invoke("banana")
+        embeddings.query_calls = 0
+        assert retriever.invoke("banana") == expected
+        assert retriever.invoke("banana") == expected
+        assert embeddings.query_calls == 1
+
+    def test_filters_restrict_results(self):
+        """Test that sources/pages only return matching chunks, nearest first."""
+        embeddings = CountingEmbeddings(size=4)
+        texts = ["alpha", "a banana", "contract terms", "payment", "aaa", "banana split"]
+        docs = [Document(page_content=text, metadata={"source": f"{i % 2}.pdf", "page": i})
+                for i, text in enumerate(texts)]
+        base = FAISS.from_documents(docs[:4], embeddings)
+        segment = FAISS.from_documents(docs[4:], embeddings)
+        deleted = [doc_id for doc_id in segment.index_to_docstore_id.values()
+                   if segment.docstore.search(doc_id).page_content == "banana split"]
+        store = combine_stores(base, [segment], deleted)
+
+        everything = CachedQueryRetriever(vector_store=store, k=6, cache=QueryEmbeddingCache()).invoke("banana")
+        only_odd = CachedQueryRetriever(vector_store=store, k=6, sources=["1.pdf"]).invoke("banana")
+        early_even = CachedQueryRetriever(vector_store=base, k=6, sources=["0.pdf"], pages=(0, 2)).invoke("banana")
+
+        assert [doc.page_content for doc in only_odd] == [
+            doc.page_content for doc in everything if doc.metadata["source"] == "1.pdf"]
+        assert [doc.page_content for doc in only_odd] == ["a banana", "payment"]
+        assert sorted(doc.metadata["page"] for doc in early_even) == [0, 2]
@@ -0,0 +1,123 @@
+"""
+Unit tests for the PII scrubber.
+"""
+import random
+import re
+import time
+import pytest
+from langchain_core.documents import Document
+from backend.security_layer import PIIScrubber, clean_document_content, scrub_batch
+
+
+def reference_scrub(text):
+    """The original scrubber: one re.sub per pattern, in order."""
+    for pii_type, pattern in PIIScrubber().patterns.items():
+        text = re.sub(pattern, f"[REDACTED {pii_type.upper()}]", text)
+    return text
+
+
+class TestPIIScrubber:
+    """Test suite for PIIScrubber."""
+
+    @pytest.mark.parametrize("text,expected", [
+        ("Contact me at john.doe@example.com or call 555-019-9123.",
+         "Contact me at [REDACTED EMAIL] or call [REDACTED PHONE]."),
+        ("Card: 4111 1111 1111 1111.", "Card: [REDACTED CREDIT_CARD]."),
+        ("Call 555.123.4567 today", "Call [REDACTED PHONE] today"),
+        ("No PII here.", "No PII here."),
+    ])
+    def test_redacts_each_type(self, text, expected):
+        """Test that emails, phones and card numbers are redacted."""
+        assert PIIScrubber().scrub(text) == expected
+
+    @pytest.mark.parametrize("text", [
+        # Email wins over an overlapping phone number
+        "(555)123-4567.x@y.com",
+        # Phone wins over a card number spanning it
+        "1234 555-123-4567 890",
+        # Card number stops at the first boundary after 13 digits
+        ".4111 1111 1111 11111-0(",
+        "..john@x.com(555) 123-4567",
+        "a@b.com.x@c.org and mail|me@x.co|uk",
+        "é1@x.com _a@b.co 1@2.3.com",
+    ])
+    def test_matches_reference_on_overlaps(self, text):
+        """Test that overlapping matches resolve exactly as the sequential scrubber did."""
+        assert PIIScrubber().scrub(text) == reference_scrub(text)
+
+    def test_matches_reference_fuzz(self):
+        """Test identical output to the sequential scrubber on random text."""
+        rng = random.Random(0)
+        alphabet = list("0123456789") * 3 + list("-- ..@@()+|_é\n\tabxyz") + [
+            "com", "555", "1234", "@mail.com", "john.doe", "(555) 123-4567", "+1 ", "4111 1111 1111 1111"]
+        scrubber = PIIScrubber()
+        for _ in range(3000):
+            text = "".join(rng.choice(alphabet) for _ in range(rng.randint(0, 60)))
+            assert scrubber.scrub(text) == reference_scrub(text), text
+
+    def test_find_pii_spans(self):
+        """Test that find_pii returns sorted, typed spans."""
+        text = "mail a@b.com, call 555-123-4567"
+        spans = PIIScrubber().find_pii(text)
+
+        assert [(text[start:end], pii_type) for start, end, pii_type in spans] == [
+            ("a@b.com", "email"), ("555-123-4567", "phone")]
+
+    @pytest.mark.parametrize("unit", ["a.", "1-", "b.", "abc.def-"])
+    def test_linear_time_on_pathological_input(self, unit):
+        """Test that long runs that used to backtrack quadratically scrub quickly."""
+        scrubber = PIIScrubber()
+        text = "x@" + unit * (200000 // len(unit))
+
+        start = time.perf_counter()
+        scrubber.scrub(text)
+        # The original patterns took minutes here
+        assert time.perf_counter() - start < 1.0
+
+
+class TestScrubBatch:
+    """Test suite for scrub_batch."""
+
+    @staticmethod
+    def make_docs(count):
+        return [Document(page_content=f"Doc {i}: mail user{i}@example.com or call 555-123-{i:04d}",
+                         metadata={"source": "batch.pdf", "page": i}) for i in range(count)]
+
+    def test_returns_scrubbed_copies(self):
+        """Test that documents are scrubbed into new objects, leaving inputs untouched."""
+        docs = self.make_docs(3)
+        cleaned = scrub_batch(docs)
+
+        assert [doc.page_content for doc in cleaned] == [
+            f"Doc {i}: mail [REDACTED EMAIL] or call [REDACTED PHONE]" for i in range(3)]
+        assert [doc.metadata for doc in cleaned] == [doc.metadata for doc in docs]
+        assert "user0@example.com" in docs[0].page_content
+        assert cleaned[0].metadata is not docs[0].metadata
+
+    def test_parallel_matches_serial_order(self):
+        """Test that chunked process-pool scrubbing returns results in input order."""
+        docs = self.make_docs(50)
+
+        serial = scrub_batch(docs, workers=1)
+        parallel = scrub_batch(docs, workers=2, chunk_size=7)
+
+        assert [(d.page_content, d.metadata) for d in parallel] == [(d.page_content, d.metadata) for d in serial]
+
+    def test_returns_counts_per_document(self):
+        """Test that redaction counts per type are returned for each document."""
+        docs = [Document(page_content="a@b.com, c@d.org and 4111 1111 1111 1111"),
+                Document(page_content="nothing to see")]
+
+        cleaned, counts = scrub_batch(docs, return_counts=True)
+
+        assert counts == [{"email": 2, "phone": 0, "credit_card": 1},
+                          {"email": 0, "phone": 0, "credit_card": 0}]
+        assert cleaned[1].page_content == "nothing to see"
+
+    def test_clean_document_content_does_not_mutate(self):
+        """Test that clean_document_content returns copies."""
+        docs = self.make_docs(1)
+        cleaned = clean_document_content(docs)
+
+        assert "[REDACTED EMAIL]" in cleaned[0].page_content
+        assert "user0@example.com" in docs[0].page_content
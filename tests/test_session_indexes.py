@@ -0,0 +1,176 @@
+"""
+Tests for the per-session vector stores of backend/main.py.
+"""
+import os
+import threading
+import time
+import pytest
+from unittest.mock import patch
+from fastapi.testclient import TestClient
+from langchain_core.documents import Document
+from langchain_core.embeddings import FakeEmbeddings
+from backend import session_indexes
+from backend.session_indexes import SessionIndexes
+
+EMBEDDINGS = FakeEmbeddings(size=8)
+
+
+def texts(vector_store):
+    return sorted(doc.page_content for doc in vector_store.similarity_search("query", k=100))
+
+
+class TestSessionIndexes:
+    """Test suite for SessionIndexes."""
+
+    def test_sessions_are_isolated(self, make_store):
+        """Test that each session only sees its own chunks."""
+        sessions = SessionIndexes(ttl=0, memory_budget=0)
+        sessions.put("alice", make_store(["alice lease"]))
+        sessions.add("bob", [Document(page_content="bob invoice")], EMBEDDINGS.embed_documents(["bob invoice"]),
+                     EMBEDDINGS)
+        sessions.add("alice", [Document(page_content="alice addendum")],
+                     EMBEDDINGS.embed_documents(["alice addendum"]), EMBEDDINGS)
+
+        assert texts(sessions.get("alice")) == ["alice addendum", "alice lease"]
+        assert texts(sessions.get("bob")) == ["bob invoice"]
+        assert sessions.get("carol") is None
+
+    def test_idle_sessions_expire(self, make_store):
+        """Test that sessions idle for longer than the TTL are dropped."""
+        sessions = SessionIndexes(ttl=60, memory_budget=0)
+        with patch.object(session_indexes.time, "monotonic", return_value=1000):
+            sessions.put("alice", make_store(["alice"]))
+            sessions.put("bob", make_store(["bob"]))
+        with patch.object(session_indexes.time, "monotonic", return_value=1050):
+            assert sessions.get("bob") is not None
+        with patch.object(session_indexes.time, "monotonic", return_value=1100):
+            assert sessions.get("alice") is None
+            assert sessions.get("bob") is not None
+            assert sessions.stats()["expired"] == 1
+
+    def test_least_recently_used_are_evicted(self, make_store):
+        """Test that the memory cap drops the least recently used sessions."""
+        one = session_indexes.store_memory_bytes(make_store(["a"] * 10))
+        sessions = SessionIndexes(ttl=0, memory_budget=int(one * 2.5), spill_dir="")
+        for name in ("a", "b", "c"):
+            sessions.put(name, make_store([name] * 10))
+            sessions.get("a")
+
+        assert sessions.get("b") is None
+        assert sessions.get("a") is not None
+        stats = sessions.stats()
+        assert stats["in_memory"] == 2
+        assert stats["evictions"] == 1
+        assert stats["memory_bytes"] <= sessions.memory_budget
+
+    def test_evicted_sessions_spill_to_disk(self, tmp_path, make_store):
+        """Test that with a spill dir, evicted sessions are reloaded on their next request."""
+        one = session_indexes.store_memory_bytes(make_store(["a"] * 10))
+        spill_dir = str(tmp_path / "spill")
+        sessions = SessionIndexes(ttl=0, memory_budget=int(one * 1.5), spill_dir=spill_dir)
+        sessions.put("alice", make_store([f"alice {i}" for i in range(10)]))
+        sessions.put("bob", make_store([f"bob {i}" for i in range(10)]))
+
+        stats = sessions.stats()
+        assert (stats["sessions"], stats["in_memory"], stats["spilled"]) == (2, 1, 1)
+        [spilled] = os.listdir(spill_dir)
+        assert spilled.startswith(os.path.basename(sessions.spill_path("alice")))
+
+        assert texts(sessions.get("alice")) == [f"alice {i}" for i in range(10)]
+        # Loading alice back pushed bob out
+        assert sessions.stats()["spills"] == 2
+        assert texts(sessions.get("bob")) == [f"bob {i}" for i in range(10)]
+
+    def test_reloading_a_session_does_not_block_others(self, tmp_path, make_store):
+        """Test that while one session is read back from disk, other sessions are still served."""
+        one = session_indexes.store_memory_bytes(make_store(["a"] * 10))
+        sessions = SessionIndexes(ttl=0, memory_budget=int(one * 1.5), spill_dir=str(tmp_path / "spill"))
+        sessions.put("alice", make_store([f"alice {i}" for i in range(10)]))
+        sessions.put("bob", make_store([f"bob {i}" for i in range(10)]))
+        loading, release = threading.Event(), threading.Event()
+        real_load_store = session_indexes.load_store
+
+        def slow_load_store(path, embeddings):
+            loading.set()
+            release.wait(10)
+            return real_load_store(path, embeddings)
+
+        with patch.object(session_indexes, "load_store", slow_load_store):
+            reload = threading.Thread(target=sessions.get, args=("alice",))
+            reload.start()
+            assert loading.wait(10)
+            started = time.monotonic()
+            assert texts(sessions.get("bob")) == [f"bob {i}" for i in range(10)]
+            assert sessions.stats()["sessions"] == 2
+            assert time.monotonic() - started < 5
+            release.set()
+            reload.join(10)
+
+        assert texts(sessions.get("alice")) == [f"alice {i}" for i in range(10)]
+
+    def test_spill_path_does_not_use_session_id(self, tmp_path):
+        """Test that client-provided session ids cannot escape the spill dir."""
+        sessions = SessionIndexes(spill_dir=str(tmp_path))
+
+        path = sessions.spill_path("../../etc")
+
+        assert os.path.dirname(path) == str(tmp_path)
+
+    def test_delete_removes_spilled_files(self, tmp_path, make_store):
+        """Test that deleting a spilled session removes its files."""
+        spill_dir = str(tmp_path / "spill")
+        sessions = SessionIndexes(ttl=0, memory_budget=1, spill_dir=spill_dir)
+        sessions.put("alice", make_store(["alice"]))
+        sessions.put("bob", make_store(["bob"]))
+
+        assert sessions.delete("alice") is True
+        assert sessions.delete("alice") is False
+        assert os.listdir(spill_dir) == []
+
+
+class TestSessionEndpoints:
+    """Test that backend/main.py keeps one index per session_id."""
+
+    @pytest.fixture
+    def client(self, tmp_path):
+        from backend import main
+
+        with patch.object(main, "sessions", SessionIndexes(ttl=0, memory_budget=0)), \
+                patch.object(main, "DB_DIR", str(tmp_path / "db")), \
+                patch.object(main, "ingest_cache", main.IngestCache(cache_dir=str(tmp_path / "cache"))), \
+                patch.object(main, "get_embeddings", lambda model_name: EMBEDDINGS), \
+                patch.object(main, "chat_with_bot",
+                             side_effect=lambda message, store, *filters: {"answer": texts(store)}):
+            yield TestClient(main.app), main
+
+    def test_upload_and_chat_per_session(self, client, sample_pdf_bytes, tmp_path):
+        test_client, main = client
+        files = {"file": ("test.pdf", sample_pdf_bytes, "application/pdf")}
+
+        response = test_client.post("/upload", files=files, data={"session_id": "alice"})
+        assert response.status_code == 200
+
+        alice = test_client.post("/chat", json={"message": "What is this?", "session_id": "alice"})
+        bob = test_client.post("/chat", json={"message": "What is this?", "session_id": "bob"})
+
+        assert alice.status_code == 200
+        assert alice.json()["answer"]
+        assert bob.status_code == 400
+        # Only the default session is saved on disk
+        assert not os.path.exists(tmp_path / "db")
+
+        assert test_client.delete("/session", params={"session_id": "alice"}).status_code == 200
+        assert test_client.post("/chat", json={"message": "Again?", "session_id": "alice"}).status_code == 400
+
+    def test_default_session_is_loaded_from_disk(self, client, sample_pdf_bytes):
+        test_client, main = client
+        files = {"file": ("test.pdf", sample_pdf_bytes, "application/pdf")}
+
+        assert test_client.post("/upload", files=files).status_code == 200
+        # Expired or restarted: the default session comes back from DB_DIR
+        main.sessions.delete("default")
+
+        response = test_client.post("/chat", json={"message": "What is this?", "session_id": "default"})
+
+        assert response.status_code == 200
+        assert response.json()["answer"]